@@ -0,0 +1,29 @@
+"""Dice roll history index
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset pagination of roll history: WHERE chronicle_id = ? AND (created_at, id) < cursor
+    op.create_index(
+        'ix_dice_rolls_chronicle_created_id',
+        'dice_rolls',
+        ['chronicle_id', 'created_at', 'id'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_dice_rolls_chronicle_created_id', table_name='dice_rolls')
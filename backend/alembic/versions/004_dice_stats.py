@@ -0,0 +1,48 @@
+"""Dice stats aggregates and roll session
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Session the roll was made in (from the active session registry)
+    op.add_column(
+        'dice_rolls',
+        sa.Column('session_id', sa.String(36), sa.ForeignKey('game_sessions.id', ondelete='SET NULL'), nullable=True),
+    )
+
+    # Running stats per chronicle / character / session, maintained by the dice roll writer.
+    # Existing history can be folded in with: python -m scripts.rebuild_dice_stats
+    op.create_table(
+        'dice_stats',
+        sa.Column('key', sa.String(120), primary_key=True),
+        sa.Column('chronicle_id', sa.String(36), sa.ForeignKey('chronicles.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('character_id', sa.String(36), sa.ForeignKey('characters.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('session_id', sa.String(36), sa.ForeignKey('game_sessions.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('rolls', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('successes', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('hunger_dice', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('results', sa.JSON, nullable=False),
+        sa.Column('histogram', sa.JSON, nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_dice_stats_chronicle_id', 'dice_stats', ['chronicle_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_dice_stats_chronicle_id', table_name='dice_stats')
+    op.drop_table('dice_stats')
+    op.drop_column('dice_rolls', 'session_id')
@@ -9,9 +9,9 @@ from ..database import get_db
 from ..models.chat_message import ChatMessage
 from ..models.chronicle import Chronicle, ChronicleMember
 from ..models.character import Character
-from ..models.game_session import GameSession
 from ..models.user import User
 from ..schemas.chat import ChatMessageCreate, ChatMessageResponse
+from ..services.session_registry import session_registry
 from .deps import get_current_user
 
 router = APIRouter()
@@ -99,12 +99,7 @@ async def get_recent_messages(
     await verify_chronicle_access(db, chronicle_id, current_user.id)
 
     # Get active session if any
-    session_result = await db.execute(
-        select(GameSession)
-        .where(GameSession.chronicle_id == chronicle_id)
-        .where(GameSession.is_active == True)
-    )
-    active_session = session_result.scalar_one_or_none()
+    active_session_id = session_registry.session_id(chronicle_id)
 
     query = (
         select(ChatMessage)
@@ -119,10 +114,10 @@ async def get_recent_messages(
     )
 
     # If there's an active session, prefer messages from it
-    if active_session:
+    if active_session_id:
         query = query.where(
             or_(
-                ChatMessage.session_id == active_session.id,
+                ChatMessage.session_id == active_session_id,
                 ChatMessage.session_id == None
             )
         )
@@ -170,19 +165,11 @@ async def send_message(
         if character and character.owner_id == current_user.id:
             character_name = character.name
 
-    # Get active session
-    session_result = await db.execute(
-        select(GameSession)
-        .where(GameSession.chronicle_id == chronicle_id)
-        .where(GameSession.is_active == True)
-    )
-    active_session = session_result.scalar_one_or_none()
-
     # Create message
     message = ChatMessage(
         id=str(uuid.uuid4()),
         chronicle_id=chronicle_id,
-        session_id=active_session.id if active_session else None,
+        session_id=session_registry.session_id(chronicle_id),
         user_id=current_user.id,
         character_id=data.character_id,
         message_type=data.message_type,
@@ -1,12 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
-from pydantic import BaseModel
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import selectinload
+from typing import Annotated, List, Literal, Optional, Tuple
+from datetime import datetime
+from pydantic import BaseModel, Field
+import base64
+import uuid
 
 from ..database import get_db
+from ..models.character import Character
+from ..models.chronicle import Chronicle
+from ..models.dice_roll import DiceRoll
+from ..models.user import User
 from .deps import get_current_user
+from ..core.entropy import DiceSource, dice_sources
+from ..core.expressions import ExpressionError
 from ..core.v5.dice import V5DiceRoller
+from ..core.v5.odds import MAX_HUNGER, MAX_POOL, v5_odds
+from ..core.v5.willpower import best_reroll
 from ..core.v20.dice import V20DiceRoller
+from ..core.v20.odds import v20_odds
+from ..config import settings
+from ..services.dice_service import dice_service
+from ..services.dice_stats import dice_stats
+from ..services.session_registry import session_registry
+from ..services.simulation import simulation_service
+from ..services.write_behind import dice_writer
+from ..utils import dumps_json
 
 router = APIRouter()
 
@@ -19,6 +41,7 @@ class V5RollRequest(BaseModel):
     chronicle_id: Optional[str] = None
     character_id: Optional[str] = None
     is_secret: bool = False
+    compact: bool = False  # Face counts instead of the individual dice
 
 
 class V20RollRequest(BaseModel):
@@ -29,6 +52,7 @@ class V20RollRequest(BaseModel):
     chronicle_id: Optional[str] = None
     character_id: Optional[str] = None
     is_secret: bool = False
+    compact: bool = False  # Face counts instead of the individual dice
 
 
 class RouseCheckRequest(BaseModel):
@@ -52,6 +76,56 @@ class RemorseCheckRequest(BaseModel):
     character_id: Optional[str] = None
 
 
+Face = Annotated[int, Field(ge=1, le=10)]
+
+
+class WillpowerRerollRequest(BaseModel):
+    """A V5 roll result (extra fields are ignored) and what the reroll should aim for"""
+    regular_dice: List[Face] = Field(default_factory=list, max_length=MAX_POOL)
+    hunger_dice: List[Face] = Field(default_factory=list, max_length=MAX_HUNGER)
+    difficulty: int = Field(default=1, ge=0, le=2 * MAX_POOL)
+    goal: Literal["success", "critical"] = "success"
+
+
+class BatchRollSpec(BaseModel):
+    game_version: Literal["v5", "v20"] = "v5"
+    pool: int = Field(default=1, ge=1, le=MAX_POOL)
+    hunger: int = Field(default=0, ge=0, le=MAX_HUNGER)
+    difficulty: Optional[int] = Field(default=None, ge=0, le=10)  # Defaults: 1 (V5), 6 (V20)
+    specialty: bool = False
+    willpower: bool = False
+    expression: Optional[str] = Field(default=None, max_length=200)  # Resolved from character_id's sheet
+    character_id: Optional[str] = None
+    description: Optional[str] = Field(default=None, max_length=500)
+
+
+class BatchRollRequest(BaseModel):
+    rolls: List[BatchRollSpec] = Field(..., min_length=1)
+    chronicle_id: Optional[str] = None
+    persist: bool = False
+    is_secret: bool = False
+    compact: bool = False  # Face counts instead of the individual dice, also in the saved rows
+
+
+class SimulationRequest(BaseModel):
+    scenario: Literal["v20_extended", "v20_resisted", "v5_contested"]
+    trials: int = Field(default=100_000, ge=1000)
+    seed: Optional[int] = Field(default=None, ge=0)
+    # v20_extended
+    pool: int = Field(default=5, ge=1, le=MAX_POOL)
+    target_successes: int = Field(default=5, ge=1, le=100)
+    max_rolls: int = Field(default=10, ge=1, le=50)
+    specialty: bool = False
+    # v20_resisted / v5_contested
+    attacker_pool: int = Field(default=5, ge=1, le=MAX_POOL)
+    defender_pool: int = Field(default=5, ge=1, le=MAX_POOL)
+    attacker_hunger: int = Field(default=0, ge=0, le=MAX_HUNGER)
+    defender_hunger: int = Field(default=0, ge=0, le=MAX_HUNGER)
+    attacker_specialty: bool = False
+    defender_specialty: bool = False
+    difficulty: int = Field(default=6, ge=2, le=10)
+
+
 @router.post("/v5/roll")
 async def roll_v5(
     roll_request: V5RollRequest,
@@ -63,25 +137,41 @@ async def roll_v5(
         pool=roll_request.pool,
         hunger=roll_request.hunger,
         difficulty=roll_request.difficulty,
+        source=await chronicle_source(db, roll_request.chronicle_id, current_user.id),
+        compact=roll_request.compact,
     )
 
-    # TODO: Save to database and broadcast via WebSocket
+    # Table rolls that should be shared and saved go through the WebSocket roll_request
 
     return {
-        "regular_dice": result.regular_dice,
-        "hunger_dice": result.hunger_dice,
-        "difficulty": result.difficulty,
-        "successes": result.successes,
-        "regular_tens": result.regular_tens,
-        "hunger_tens": result.hunger_tens,
-        "hunger_ones": result.hunger_ones,
-        "critical_pairs": result.critical_pairs,
-        "result_type": result.result_type.value,
-        "margin": result.margin,
+        **dice_service.v5_result(result),
         "description": roll_request.description,
     }
 
 
+@router.get("/v5/odds")
+async def get_v5_odds(
+    pool: int = Query(..., ge=1, le=MAX_POOL),
+    hunger: int = Query(0, ge=0, le=MAX_HUNGER),
+    difficulty: int = Query(1, ge=0, le=2 * MAX_POOL),
+    current_user: User = Depends(get_current_user),
+):
+    """Exact probabilities of a V5 roll: successes distribution and result types"""
+    return v5_odds(pool, min(hunger, pool), difficulty).to_dict()
+
+
+@router.post("/v5/willpower")
+async def willpower_reroll(
+    request: WillpowerRerollRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Which regular dice (up to three) to reroll with Willpower, and the
+    exact chances after that reroll. Answered from precomputed tables.
+    """
+    return best_reroll(request.regular_dice, request.hunger_dice, request.difficulty, request.goal).to_dict()
+
+
 @router.post("/v5/rouse")
 async def rouse_check(
     request: RouseCheckRequest,
@@ -89,7 +179,10 @@ async def rouse_check(
     db: AsyncSession = Depends(get_db),
 ):
     """Perform a Rouse Check"""
-    success, dice = V5DiceRoller.rouse_check(reroll=request.reroll)
+    success, dice = V5DiceRoller.rouse_check(
+        reroll=request.reroll,
+        source=await chronicle_source(db, request.chronicle_id, current_user.id),
+    )
 
     return {
         "success": success,
@@ -151,26 +244,321 @@ async def roll_v20(
         pool=roll_request.pool,
         difficulty=roll_request.difficulty,
         specialty=roll_request.specialty,
+        source=await chronicle_source(db, roll_request.chronicle_id, current_user.id),
+        compact=roll_request.compact,
     )
 
     return {
-        "dice": result.dice,
-        "difficulty": result.difficulty,
-        "successes": result.successes,
-        "ones": result.ones,
-        "tens": result.tens,
-        "result_type": result.result_type.value,
+        **dice_service.v20_result(result),
         "description": roll_request.description,
     }
 
 
+def encode_cursor(roll: DiceRoll) -> str:
+    """Opaque cursor pointing just past a roll in newest-first order"""
+    raw = f"{roll.created_at.isoformat()}|{roll.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, roll_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), roll_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+
+
+async def verify_chronicle_access(db: AsyncSession, chronicle_id: str, user_id: str) -> Chronicle:
+    """Verify user has access to chronicle"""
+    result = await db.execute(
+        select(Chronicle)
+        .where(Chronicle.id == chronicle_id)
+        .options(selectinload(Chronicle.members))
+    )
+    chronicle = result.scalar_one_or_none()
+
+    if not chronicle:
+        raise HTTPException(status_code=404, detail="Cronica nao encontrada")
+
+    is_storyteller = chronicle.storyteller_id == user_id
+    is_member = any(m.user_id == user_id for m in chronicle.members)
+
+    if not is_storyteller and not is_member:
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+    return chronicle
+
+
+async def chronicle_source(db: AsyncSession, chronicle_id: Optional[str], user_id: str) -> DiceSource:
+    """Dice source for a roll; a chronicle's (possibly seeded) stream only serves its members"""
+    if chronicle_id:
+        await verify_chronicle_access(db, chronicle_id, user_id)
+    return dice_sources.for_chronicle(chronicle_id)
+
+
+@router.get("/v20/odds")
+async def get_v20_odds(
+    pool: int = Query(..., ge=1, le=MAX_POOL),
+    difficulty: int = Query(6, ge=2, le=10),
+    specialty: bool = False,
+    willpower: bool = False,
+    current_user: User = Depends(get_current_user),
+):
+    """Exact probabilities of a V20 roll: net successes, botch and exceptional chances"""
+    return v20_odds(pool, difficulty, specialty, willpower).to_dict()
+
+
+@router.post("/batch")
+async def roll_batch(
+    request: BatchRollRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Roll a list of V5/V20 pools in one request (e.g. every NPC in a brawl).
+
+    All pools go through the batch roller at once; results come back in
+    request order. With persist, rows are saved with one bulk insert.
+    """
+    if len(request.rolls) > settings.DICE_BATCH_MAX_ROLLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maximo de {settings.DICE_BATCH_MAX_ROLLS} rolagens por lote",
+        )
+    if request.persist and not request.chronicle_id:
+        raise HTTPException(status_code=400, detail="Informe a cronica para salvar as rolagens")
+    is_storyteller = False
+    if request.chronicle_id:
+        chronicle = await verify_chronicle_access(db, request.chronicle_id, current_user.id)
+        is_storyteller = chronicle.storyteller_id == current_user.id
+
+    specs = [spec.model_dump() for spec in request.rolls]
+    breakdowns = [None] * len(specs)
+
+    if any(spec["expression"] and not spec["character_id"] for spec in specs):
+        raise HTTPException(status_code=400, detail="Expressao sem personagem")
+
+    # Every character named, in one query: they must belong to the chronicle
+    # (or to the caller, outside a chronicle)
+    wanted = {spec["character_id"] for spec in specs if spec["character_id"]}
+    characters = {}
+    if wanted:
+        result = await db.execute(select(Character).where(Character.id.in_(wanted)))
+        characters = {
+            c.id: c for c in result.scalars()
+            if (c.chronicle_id == request.chronicle_id if request.chronicle_id else c.owner_id == current_user.id)
+        }
+        if wanted - characters.keys():
+            raise HTTPException(status_code=404, detail="Personagem nao encontrado")
+
+    def own(spec):
+        return spec["character_id"] and characters[spec["character_id"]].owner_id == current_user.id
+
+    if not is_storyteller:
+        # Expressions return sheet values in the breakdown, saved or not
+        if not all(own(spec) for spec in specs if spec["expression"]):
+            raise HTTPException(status_code=403, detail="Voce so pode rolar com sua propria ficha")
+        # Players may only save rolls of their own characters; NPC rolls are the storyteller's
+        if request.persist and not all(own(spec) for spec in specs):
+            raise HTTPException(status_code=403, detail="Apenas o narrador pode salvar rolagens de outros personagens")
+
+    for i, spec in enumerate(specs):
+        if not spec["expression"]:
+            continue
+        character = characters[spec["character_id"]]
+        try:
+            resolved = dice_service.resolve_expression(spec["expression"], character.sheet, character.game_version)
+        except ExpressionError as e:
+            raise HTTPException(status_code=400, detail=f"Rolagem {i + 1}: {e}")
+        spec.update(game_version=character.game_version, pool=min(resolved.pool, MAX_POOL), hunger=resolved.hunger)
+        breakdowns[i] = resolved.to_dict()["breakdown"]
+
+    outcomes = dice_service.roll_many(
+        specs, compact=request.compact, source=dice_sources.for_chronicle(request.chronicle_id),
+    )
+
+    now = datetime.utcnow()
+    session_id = session_registry.session_id(request.chronicle_id) if request.chronicle_id else None
+    results, rows = [], []
+    for spec, outcome, breakdown in zip(specs, outcomes, breakdowns):
+        roll_id = str(uuid.uuid4())
+        entry = {
+            "id": roll_id,
+            "game_version": outcome.game_version,
+            "pool": outcome.pool,
+            "hunger": outcome.hunger,
+            "character_id": spec["character_id"],
+            "description": spec["description"],
+            **outcome.result,
+        }
+        if breakdown is not None:
+            entry["expression"] = spec["expression"]
+            entry["breakdown"] = breakdown
+        results.append(entry)
+        if request.persist:
+            rows.append(dice_service.to_row(
+                outcome,
+                roll_id=roll_id,
+                chronicle_id=request.chronicle_id,
+                roller_id=current_user.id,
+                character_id=spec["character_id"],
+                session_id=session_id,
+                description=spec["description"],
+                is_secret=request.is_secret,
+                created_at=now,
+            ))
+
+    if rows:
+        await dice_writer.insert(db, rows)
+
+    return {"rolls": results, "persisted": bool(rows)}
+
+
+@router.post("/simulate")
+async def simulate(
+    request: SimulationRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Monte Carlo estimate of an extended, resisted or contested roll.
+
+    Streams NDJSON: one "progress" line per finished chunk with running
+    estimates and 95% confidence intervals, then a final "result" line.
+    """
+    if request.trials > settings.SIMULATION_MAX_TRIALS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maximo de {settings.SIMULATION_MAX_TRIALS} simulacoes por pedido",
+        )
+
+    params = request.model_dump(exclude={"scenario", "trials", "seed"})
+
+    async def lines():
+        async for update in simulation_service.run(request.scenario, params, request.trials, request.seed):
+            yield dumps_json(update) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/expression")
+async def resolve_expression(
+    expression: str = Query(..., max_length=200),
+    character_id: str = Query(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Pool and Hunger a dice expression ("forca+briga+2, fome") gives for a character"""
+    character = await db.get(Character, character_id)
+    if not character:
+        raise HTTPException(status_code=404, detail="Personagem nao encontrado")
+    # The breakdown shows sheet values: same rule as reading the sheet itself
+    if character.owner_id != current_user.id:
+        chronicle = await db.get(Chronicle, character.chronicle_id) if character.chronicle_id else None
+        if chronicle is None or chronicle.storyteller_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Voce so pode ver sua propria ficha")
+
+    try:
+        resolved = dice_service.resolve_expression(expression, character.sheet, character.game_version)
+    except ExpressionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "expression": expression,
+        "character_id": character.id,
+        "game_version": character.game_version,
+        **resolved.to_dict(),
+    }
+
+
+@router.get("/stats/{chronicle_id}")
+async def get_roll_stats(
+    chronicle_id: str,
+    character_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Roll statistics of a chronicle, a character and/or a session: counts per
+    result type, successes histogram and rates (messy criticals, bestial
+    failures, botches). Read from running aggregates; secret rolls are not counted.
+    """
+    await verify_chronicle_access(db, chronicle_id, current_user.id)
+    return await dice_stats.get(db, chronicle_id, character_id, session_id)
+
+
 @router.get("/history/{chronicle_id}")
 async def get_roll_history(
     chronicle_id: str,
-    limit: int = 50,
-    current_user: dict = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    character_id: Optional[str] = None,
+    roller_id: Optional[str] = None,
+    roll_type: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Get roll history for a chronicle"""
-    # TODO: Implement
-    return []
+    """
+    Get roll history for a chronicle, newest first.
+
+    Pages are keyset-paginated on (created_at, id): pass the returned
+    next_cursor to get the following page. Secret rolls are only visible
+    to the roller and the storyteller.
+    """
+    chronicle = await verify_chronicle_access(db, chronicle_id, current_user.id)
+
+    query = select(DiceRoll).where(DiceRoll.chronicle_id == chronicle_id)
+
+    if chronicle.storyteller_id != current_user.id:
+        query = query.where(or_(DiceRoll.is_secret == False, DiceRoll.roller_id == current_user.id))
+
+    if character_id:
+        query = query.where(DiceRoll.character_id == character_id)
+    if roller_id:
+        query = query.where(DiceRoll.roller_id == roller_id)
+    if roll_type:
+        query = query.where(DiceRoll.roll_type == roll_type)
+
+    if cursor:
+        created_at, roll_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                DiceRoll.created_at < created_at,
+                and_(DiceRoll.created_at == created_at, DiceRoll.id < roll_id),
+            )
+        )
+
+    # One extra row tells us whether there is a next page
+    query = query.order_by(DiceRoll.created_at.desc(), DiceRoll.id.desc()).limit(limit + 1)
+    result = await db.execute(query)
+    rolls = result.scalars().all()
+    has_more = len(rolls) > limit
+    rolls = rolls[:limit]
+
+    return {
+        "rolls": [
+            {
+                "id": r.id,
+                "chronicle_id": r.chronicle_id,
+                "character_id": r.character_id,
+                "roller_id": r.roller_id,
+                "game_version": r.game_version,
+                "roll_type": r.roll_type,
+                "description": r.description,
+                "pool": r.pool,
+                "difficulty": r.difficulty,
+                "hunger": r.hunger,
+                "result": r.result,
+                "successes": r.successes,
+                "is_critical": r.is_critical,
+                "is_messy_critical": r.is_messy_critical,
+                "is_bestial_failure": r.is_bestial_failure,
+                "is_botch": r.is_botch,
+                "is_secret": r.is_secret,
+                "created_at": r.created_at,
+            }
+            for r in rolls
+        ],
+        "next_cursor": encode_cursor(rolls[-1]) if has_more else None,
+    }
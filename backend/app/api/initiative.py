@@ -5,9 +5,9 @@ from sqlalchemy.orm import selectinload
 from typing import Optional
 from datetime import datetime
 import uuid
-import random
 
 from ..database import get_db
+from ..core.entropy import dice_sources
 from ..models.initiative import InitiativeOrder, InitiativeEntry
 from ..models.game_session import GameSession
 from ..models.chronicle import Chronicle
@@ -300,11 +300,12 @@ async def roll_all_initiative(
     if not order:
         raise HTTPException(status_code=404, detail="Ordem de iniciativa nao encontrada")
 
-    await verify_storyteller(db, order.session_id, current_user.id)
+    session = await verify_storyteller(db, order.session_id, current_user.id)
+    source = dice_sources.for_chronicle(session.chronicle_id)
 
     # Roll for each entry: 1d10 + modifier
     for entry in order.entries:
-        roll = random.randint(1, 10)
+        roll = source.d10()
         entry.initiative_value = roll + entry.initiative_modifier
         entry.has_acted = False
 
@@ -14,6 +14,7 @@ from ..models.chronicle import Chronicle, ChronicleMember
 from ..models.character import Character
 from ..models.xp_log import XPLog
 from ..models.user import User
+from ..services.session_registry import session_registry
 from ..schemas.session import (
     SessionStart, SessionEnd, SessionJoin,
     SessionResponse, SessionListResponse, SessionParticipantResponse
@@ -94,6 +95,7 @@ async def start_session(
     db.add(session)
     await db.commit()
     await db.refresh(session)
+    await session_registry.activate(chronicle_id, session.id, session.active_scene_id)
 
     return {
         "id": session.id,
@@ -174,6 +176,7 @@ async def end_session(
                     db.add(xp_log)
 
     await db.commit()
+    await session_registry.deactivate(session.chronicle_id, session.id)
 
     return {
         "message": "Sessao encerrada",
@@ -474,6 +477,7 @@ async def set_active_scene(
 
     session.active_scene_id = scene_id
     await db.commit()
+    await session_registry.set_scene(session.chronicle_id, session.id, scene_id)
 
     return {
         "message": "Cena ativa definida",
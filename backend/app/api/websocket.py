@@ -1,402 +1,917 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import Dict, Set, Optional
-import json
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Deque, Dict, Iterable, Set, Optional, Tuple, Union
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+import asyncio
 from datetime import datetime
 import uuid
 
-from ..database import get_async_session
-from ..models.chat_message import ChatMessage
+from ..config import settings
+from ..database import async_session_maker, get_db
+from ..core.entropy import dice_sources
+from ..core.expressions import ExpressionError
 from ..models.character import Character
-from ..models.game_session import GameSession
+from ..models.chronicle import Chronicle, ChronicleMember
+from ..models.user import User
+from .deps import get_current_user, get_current_user_optional
+from ..services.backplane import Backplane, create_backplane
+from ..services.coalescer import Coalescer, merge_character_updates
+from ..services.event_log import EventLog
+from ..services.presence import PresenceTracker
+from ..services.ws_dispatch import MessageDispatcher, error_frame
+from ..schemas.websocket import (
+    WSMessage, WSEvent, WSChatMessage, WSSceneChange, WSCharacterUpdate,
+    WSTyping, WSUpdateCharacter, WSSubscription, WSResume, WSRollRequest,
+)
+from ..services.session_registry import session_registry
+from ..services.dice_service import dice_service
+from ..services.write_behind import chat_writer, dice_writer
+from ..utils.serialization import dumps_json, dumps_msgpack
 
 router = APIRouter()
 
 
+class OverflowPolicy(str, Enum):
+    """What to do when a connection's outgoing queue is full"""
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+class WireProtocol(str, Enum):
+    """Frame encoding negotiated through the WebSocket subprotocol"""
+    JSON = "json"
+    MSGPACK = "msgpack"
+
+
+def negotiate_protocol(offered: Iterable[str]) -> Optional[WireProtocol]:
+    """First subprotocol the client offered that we speak, in the client's order"""
+    for name in offered:
+        try:
+            return WireProtocol(name.strip().lower())
+        except ValueError:
+            continue
+    return None
+
+
+def encode_frame(message: dict, protocol: WireProtocol) -> Union[str, bytes]:
+    """Encode a message as a text (JSON) or binary (MessagePack) frame"""
+    if protocol == WireProtocol.MSGPACK:
+        return dumps_msgpack(message)
+    return dumps_json(message)
+
+
+# Broadcasts that are not worth replaying after a reconnect: typing is
+# transient and presence has its own versioned snapshot/delta protocol
+UNSEQUENCED_TYPES = frozenset({"typing", "user_joined", "user_left", "user_character_changed"})
+
+# Broadcast types a client can opt out of, by topic. Types not listed here
+# (scene, session and character events) carry shared table state and always go out.
+TOPIC_BY_TYPE = {
+    "chat_message": "chat",
+    "dice_roll": "dice",
+    "combat_started": "combat",
+    "combat_ended": "combat",
+    "initiative_updated": "combat",
+    "turn_advanced": "combat",
+    "xp_request_created": "xp",
+    "xp_request_updated": "xp",
+    "xp_awarded": "xp",
+    "user_joined": "presence",
+    "user_left": "presence",
+    "user_character_changed": "presence",
+    "typing": "typing",
+}
+TOPICS = frozenset(TOPIC_BY_TYPE.values())
+
+
+def parse_topics(topics) -> Set[str]:
+    """Known topics from a list or comma-separated string; unknown names are ignored"""
+    if isinstance(topics, str):
+        topics = topics.split(",")
+    return {topic.strip() for topic in topics or [] if isinstance(topic, str)} & TOPICS
+
+
 class UserConnection:
     """Represents a user's WebSocket connection"""
-    def __init__(self, websocket: WebSocket, user_id: str, username: str, character_id: str = None, character_name: str = None):
+    __slots__ = (
+        "websocket", "user_id", "username", "character_id", "character_name", "connected_at", "id",
+        "outbox", "queue_size", "overflow_policy", "dropped", "closed", "topics", "protocol", "last_seq",
+        "_ready", "_writer",
+    )
+
+    def __init__(self, websocket: WebSocket, user_id: str, username: str, character_id: str = None, character_name: str = None,
+                 queue_size: int = 256, overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                 protocol: WireProtocol = WireProtocol.JSON):
         self.websocket = websocket
         self.user_id = user_id
         self.username = username
         self.character_id = character_id
         self.character_name = character_name
         self.connected_at = datetime.utcnow()
+        self.id = uuid.uuid4().hex
+
+        # Outgoing (coalesce key, encoded frame) pairs, drained by a dedicated writer task
+        self.outbox: Deque[Tuple[tuple, Union[str, bytes]]] = deque()
+        self.protocol = protocol
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.dropped = 0
+        self.closed = False
+        # Topics this client shows; everything by default
+        self.topics: Set[str] = set(TOPICS)
+        # Seq of the last sequenced frame queued here, sent as the next frame's prev_seq
+        self.last_seq = 0
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    def presence(self) -> dict:
+        """Roster entry for this connection"""
+        return {
+            "connection_id": self.id,
+            "user_id": self.user_id,
+            "username": self.username,
+            "character_id": self.character_id,
+            "character_name": self.character_name
+        }
+
+    def wants(self, message: dict) -> bool:
+        """Whether this client subscribed to the message's topic"""
+        topic = TOPIC_BY_TYPE.get(message.get("type"))
+        return topic is None or topic in self.topics
+
+    def start(self):
+        """Start the writer task for this connection"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def stop(self):
+        """Stop the writer task, discarding anything still queued"""
+        self.closed = True
+        self.outbox.clear()
+        if self._writer and not self._writer.done():
+            self._writer.cancel()
+
+    async def close(self, code: int = 1013, timeout: float = 1.0):
+        """Stop writing and close the socket without waiting on a stalled peer"""
+        self.stop()
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), timeout=timeout)
+        except Exception:
+            pass
 
+    def enqueue(self, message: dict, frame: Union[str, bytes] = None) -> bool:
+        """
+        Queue a message for the writer task without waiting on the socket.
+
+        `frame` is the already-encoded message, so broadcasts encode once
+        for all recipients. Returns False if the connection is dead or its
+        queue overflowed under the "disconnect" policy, so the caller should
+        drop it.
+        """
+        if self.closed:
+            return False
+
+        key = (message.get("type"), message.get("user_id"))
+        if frame is None:
+            frame = encode_frame(message, self.protocol)
+
+        if len(self.outbox) >= self.queue_size:
+            if self.overflow_policy == OverflowPolicy.DISCONNECT:
+                return False
+            if self.overflow_policy == OverflowPolicy.COALESCE and self._coalesce(key, frame):
+                return True
+            self.outbox.popleft()
+            self.dropped += 1
+
+        self.outbox.append((key, frame))
+        self._ready.set()
+        return True
+
+    def _coalesce(self, key: tuple, frame: Union[str, bytes]) -> bool:
+        """Replace a pending frame of the same type and sender, if any"""
+        for index, (pending_key, _) in enumerate(self.outbox):
+            if pending_key == key:
+                del self.outbox[index]
+                self.outbox.append((key, frame))
+                self.dropped += 1
+                return True
+        return False
+
+    async def _write_loop(self):
+        try:
+            while True:
+                await self._ready.wait()
+                while self.outbox:
+                    _, frame = self.outbox.popleft()
+                    if isinstance(frame, bytes):
+                        await self.websocket.send_bytes(frame)
+                    else:
+                        await self.websocket.send_text(frame)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket is gone; the next enqueue reports it to the manager
+            self.closed = True
+            self.outbox.clear()
 
-class ConnectionManager:
-    """Manages WebSocket connections for chronicles"""
 
-    def __init__(self):
-        # chronicle_id -> set of UserConnection
-        self.active_connections: Dict[str, Set[UserConnection]] = {}
+class ConnectionManager:
+    """
+    Manages WebSocket connections for chronicles.
+
+    Sockets are local to this worker; broadcasts, targeted messages and the
+    presence roster go through the backplane so every worker sees them.
+    """
+
+    def __init__(self, queue_size: int = None, overflow_policy: str = None, backplane: Backplane = None,
+                 replay_buffer: int = None, replay_grace: float = None, coalesce_window: float = None):
+        # chronicle_id -> user_id -> set of UserConnection (local to this worker, one per tab/device)
+        self.active_connections: Dict[str, Dict[str, Set[UserConnection]]] = {}
+        # chronicle_id -> recent sequenced broadcasts, kept while this worker is subscribed
+        self.event_logs: Dict[str, EventLog] = {}
+        self.replay_buffer = replay_buffer or settings.WS_REPLAY_BUFFER_SIZE
+        self.replay_grace = settings.WS_REPLAY_GRACE_SECONDS if replay_grace is None else replay_grace
+        self._unsubscribing: Dict[str, asyncio.Task] = {}
+        # Folds typing and character_update bursts into one broadcast per window
+        self.coalescer = Coalescer(
+            self.broadcast,
+            settings.WS_COALESCE_WINDOW if coalesce_window is None else coalesce_window,
+        )
+        self.queue_size = queue_size or settings.WS_SEND_QUEUE_SIZE
+        self.overflow_policy = OverflowPolicy(overflow_policy or settings.WS_OVERFLOW_POLICY)
+        self.backplane = backplane or create_backplane(settings.WS_BACKPLANE, settings.redis_url)
+        self.backplane.attach(self._deliver)
+        self.presence = PresenceTracker(self.backplane)
+        self._closing: Set[asyncio.Task] = set()
+        # Fan-out counters for /ws/metrics
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    async def start(self):
+        await self.backplane.start()
+
+    async def stop(self):
+        for task in self._unsubscribing.values():
+            task.cancel()
+        self._unsubscribing.clear()
+        await self.coalescer.flush_all()
+        await self.backplane.stop()
 
     async def connect(self, websocket: WebSocket, chronicle_id: str, user_id: str, username: str,
-                      character_id: str = None, character_name: str = None) -> UserConnection:
-        await websocket.accept()
-        if chronicle_id not in self.active_connections:
-            self.active_connections[chronicle_id] = set()
+                      character_id: str = None, character_name: str = None,
+                      topics: Set[str] = None, protocol: WireProtocol = None) -> UserConnection:
+        # Echo the negotiated subprotocol; clients that offered none get plain JSON
+        await websocket.accept(subprotocol=protocol.value if protocol else None)
+        pending = self._unsubscribing.pop(chronicle_id, None)
+        if pending:
+            pending.cancel()
+        self.active_connections.setdefault(chronicle_id, {})
+        if chronicle_id not in self.event_logs:
+            await self.backplane.subscribe(chronicle_id)
+            floor = await self.backplane.current_sequence(chronicle_id)
+            self.event_logs[chronicle_id] = EventLog(self.replay_buffer, floor)
+
+        user_conn = UserConnection(
+            websocket, user_id, username, character_id, character_name,
+            queue_size=self.queue_size, overflow_policy=self.overflow_policy,
+            protocol=protocol or WireProtocol.JSON,
+        )
+        user_conn.last_seq = await self.backplane.current_sequence(chronicle_id)
+        if topics is not None:
+            user_conn.topics = set(topics)
+        self.active_connections[chronicle_id].setdefault(user_id, set()).add(user_conn)
+        user_conn.start()
 
-        user_conn = UserConnection(websocket, user_id, username, character_id, character_name)
-        self.active_connections[chronicle_id].add(user_conn)
+        # Notify others that user joined
+        joined = await self.presence.join(chronicle_id, user_conn.presence())
+        await self.broadcast(chronicle_id, joined, exclude=user_conn)
         return user_conn
 
-    def disconnect(self, user_conn: UserConnection, chronicle_id: str):
-        if chronicle_id in self.active_connections:
-            self.active_connections[chronicle_id].discard(user_conn)
-            if not self.active_connections[chronicle_id]:
+    async def disconnect(self, user_conn: UserConnection, chronicle_id: str):
+        if self._detach(user_conn, chronicle_id):
+            await self._release(user_conn, chronicle_id)
+
+    async def update_presence(self, user_conn: UserConnection, chronicle_id: str):
+        """Publish a connection's changed character to the shared roster"""
+        changed = await self.presence.update(chronicle_id, user_conn.presence())
+        await self.broadcast(chronicle_id, changed)
+
+    def _detach(self, user_conn: UserConnection, chronicle_id: str) -> bool:
+        """Forget a local connection; returns False if it was already gone"""
+        user_conn.stop()
+        users = self.active_connections.get(chronicle_id)
+        connections = users.get(user_conn.user_id) if users else None
+        if connections is None or user_conn not in connections:
+            return False
+        connections.discard(user_conn)
+        if not connections:
+            del users[user_conn.user_id]
+            if not users:
                 del self.active_connections[chronicle_id]
+        return True
 
-    def get_online_users(self, chronicle_id: str) -> list:
-        """Get list of online users in a chronicle"""
+    async def _release(self, user_conn: UserConnection, chronicle_id: str):
+        """Remove a detached connection from the shared roster and subscriptions"""
         if chronicle_id not in self.active_connections:
-            return []
-        return [
-            {
-                "user_id": conn.user_id,
-                "username": conn.username,
-                "character_id": conn.character_id,
-                "character_name": conn.character_name
-            }
-            for conn in self.active_connections[chronicle_id]
-        ]
-
-    def get_user_connection(self, chronicle_id: str, user_id: str) -> Optional[UserConnection]:
-        """Get a specific user's connection"""
-        if chronicle_id not in self.active_connections:
-            return None
-        for conn in self.active_connections[chronicle_id]:
-            if conn.user_id == user_id:
-                return conn
-        return None
+            if self.replay_grace > 0:
+                self._schedule_unsubscribe(chronicle_id)
+            else:
+                await self._unsubscribe(chronicle_id)
+        left = await self.presence.leave(chronicle_id, user_conn.presence())
+        await self.broadcast(chronicle_id, left)
+
+    def _schedule_unsubscribe(self, chronicle_id: str):
+        """Stay subscribed for a while so a quick reconnect can still replay what it missed"""
+        async def unsubscribe_later():
+            await asyncio.sleep(self.replay_grace)
+            self._unsubscribing.pop(chronicle_id, None)
+            if chronicle_id not in self.active_connections:
+                await self._unsubscribe(chronicle_id)
+
+        if chronicle_id not in self._unsubscribing:
+            self._unsubscribing[chronicle_id] = asyncio.create_task(unsubscribe_later())
+
+    async def _unsubscribe(self, chronicle_id: str):
+        self.event_logs.pop(chronicle_id, None)
+        await self.backplane.unsubscribe(chronicle_id)
+
+    def _drop(self, user_conn: UserConnection, chronicle_id: str):
+        """Remove a slow or dead connection and close its socket in the background"""
+        if not self._detach(user_conn, chronicle_id):
+            return
 
-    async def broadcast(self, chronicle_id: str, message: dict, exclude: UserConnection = None):
-        """Broadcast message to all connections in a chronicle"""
-        if chronicle_id not in self.active_connections:
+        async def drop():
+            await self._release(user_conn, chronicle_id)
+            await user_conn.close()
+
+        task = asyncio.create_task(drop())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def get_online_users(self, chronicle_id: str) -> list:
+        """Get list of online users in a chronicle, across all workers"""
+        _, entries = await self.backplane.get_presence(chronicle_id)
+        return entries
+
+    async def presence_snapshot(self, chronicle_id: str) -> dict:
+        """Versioned roster snapshot for a chronicle"""
+        return await self.presence.snapshot(chronicle_id)
+
+    async def current_seq(self, chronicle_id: str) -> int:
+        """Sequence number of the chronicle's latest replayable broadcast"""
+        return await self.backplane.current_sequence(chronicle_id)
+
+    async def replay(self, user_conn: UserConnection, chronicle_id: str, last_seq: int):
+        """
+        Send a reconnecting client the broadcasts it missed since last_seq.
+
+        Answers with "resumed" after the missed frames, or with
+        "resync_required" when the gap is no longer buffered on this worker
+        and the client has to reload its state over REST. A last_seq ahead
+        of the server (sequences reset by a restart or a Redis flush) also
+        needs a resync, since the client would skip the reused numbers.
+        Clients must ignore frames whose seq they already applied, since
+        live broadcasts can interleave with the replay.
+
+        Every sequenced frame also carries prev_seq, the seq of the previous
+        frame sent to this connection. Frames skipped by topic or sent by
+        this client do not count, so prev_seq greater than the last seq the
+        client applied means frames were really lost and it should resume.
+        """
+        current = await self.current_seq(chronicle_id)
+        log = self.event_logs.get(chronicle_id)
+        missed = log.since(last_seq) if log is not None and last_seq <= current else None
+        if missed is None:
+            user_conn.enqueue({"type": "resync_required", "chronicle_id": chronicle_id, "seq": current})
             return
 
-        disconnected = set()
-        for conn in self.active_connections[chronicle_id]:
-            if exclude and conn == exclude:
-                continue
-            try:
-                await conn.websocket.send_json(message)
-            except:
-                disconnected.add(conn)
+        prev_seq = last_seq
+        for event in missed:
+            if user_conn.wants(event):
+                user_conn.enqueue({**event, "prev_seq": prev_seq})
+                prev_seq = event["seq"]
+        user_conn.last_seq = max(user_conn.last_seq, prev_seq)
+        user_conn.enqueue({"type": "resumed", "chronicle_id": chronicle_id, "replayed": len(missed), "seq": current})
+
+    def get_user_connections(self, chronicle_id: str, user_id: str) -> Set[UserConnection]:
+        """Get all of a user's connections (tabs/devices) on this worker"""
+        return self.active_connections.get(chronicle_id, {}).get(user_id, set())
+
+    def connection_counts(self) -> Dict[str, dict]:
+        """Connections and distinct users per chronicle on this worker, for metrics"""
+        return {
+            chronicle_id: {
+                "connections": sum(len(connections) for connections in users.values()),
+                "users": len(users),
+            }
+            for chronicle_id, users in self.active_connections.items()
+        }
 
-        # Clean up disconnected clients
-        for conn in disconnected:
-            self.active_connections[chronicle_id].discard(conn)
+    async def broadcast(self, chronicle_id: str, message: dict, exclude: UserConnection = None):
+        """Queue a message for every connection in a chronicle (never waits on a socket)"""
+        if message.get("type") not in UNSEQUENCED_TYPES:
+            message = {**message, "seq": await self.backplane.next_sequence(chronicle_id)}
+        await self.backplane.publish(chronicle_id, {
+            "message": message,
+            "exclude": exclude.id if exclude else None,
+        })
 
     async def send_personal(self, user_conn: UserConnection, message: dict):
         """Send message to a specific connection"""
-        try:
-            await user_conn.websocket.send_json(message)
-        except:
-            pass
+        user_conn.enqueue(message)
 
     async def send_to_user(self, chronicle_id: str, user_id: str, message: dict):
-        """Send message to a specific user in a chronicle"""
-        conn = self.get_user_connection(chronicle_id, user_id)
-        if conn:
-            await self.send_personal(conn, message)
+        """Send message to every connection of a user in a chronicle, on whichever worker holds them"""
+        await self.backplane.publish(chronicle_id, {
+            "message": message,
+            "user_id": user_id,
+        })
+
+    async def _deliver(self, chronicle_id: str, envelope: dict):
+        """Fan an envelope from the backplane out to this worker's connections"""
+        message = envelope["message"]
+        log = self.event_logs.get(chronicle_id)
+        if log is not None and "seq" in message and envelope.get("user_id") is None:
+            log.append(message)
+
+        users = self.active_connections.get(chronicle_id)
+        if not users:
+            return
+
+        target = envelope.get("user_id")
+        if target is not None:
+            connections = users.get(target)
+            if not connections:
+                return
+        else:
+            # Broadcasts only go to connections subscribed to their topic
+            exclude = envelope.get("exclude")
+            candidates = [
+                conn for user_conns in users.values() for conn in user_conns if conn.id != exclude
+            ]
+            connections = [conn for conn in candidates if conn.wants(message)]
+            self.frames_skipped += len(candidates) - len(connections)
+            if not connections:
+                return
+
+        # Encode once per protocol and prev_seq in use, not once per recipient;
+        # connections that got the same frames so far share one prev_seq
+        sequenced = "seq" in message and target is None
+        frames: Dict[Tuple[WireProtocol, int], Tuple[dict, Union[str, bytes]]] = {}
+        overflowed = []
+        for conn in connections:
+            group = (conn.protocol, conn.last_seq if sequenced else None)
+            entry = frames.get(group)
+            if entry is None:
+                outgoing = {**message, "prev_seq": conn.last_seq} if sequenced else message
+                entry = frames[group] = (outgoing, encode_frame(outgoing, conn.protocol))
+            if sequenced:
+                # The Redis backplane can deliver seqs out of order; never move back
+                conn.last_seq = max(conn.last_seq, message["seq"])
+            if not conn.enqueue(*entry):
+                overflowed.append(conn)
+        self.frames_sent += len(connections)
+
+        # Clean up dead or hopelessly slow clients
+        for conn in overflowed:
+            self._drop(conn, chronicle_id)
 
 
 manager = ConnectionManager()
 
 
+@router.get("/metrics")
+async def websocket_metrics(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Connection totals, fan-out counters and handler timings on this worker.
+    Per-chronicle counts are only listed for the caller's own chronicles
+    (as storyteller), so live chronicle ids are not exposed.
+    """
+    counts = manager.connection_counts()
+    own = set()
+    if counts:
+        result = await db.execute(
+            select(Chronicle.id).where(Chronicle.id.in_(counts.keys()), Chronicle.storyteller_id == current_user.id)
+        )
+        own = set(result.scalars())
+    return {
+        "totals": {
+            "chronicles": len(counts),
+            "connections": sum(c["connections"] for c in counts.values()),
+            "users": sum(c["users"] for c in counts.values()),
+        },
+        "chronicles": {chronicle_id: c for chronicle_id, c in counts.items() if chronicle_id in own},
+        "frames": {"sent": manager.frames_sent, "skipped_by_topic": manager.frames_skipped},
+        **dispatcher.metrics(),
+    }
+
+
+@dataclass
+class WSContext:
+    """Per-connection state handed to every message handler"""
+    chronicle_id: str
+    user_conn: UserConnection
+    user_id: str
+    username: str
+    # Character from the connection URL; update_character only changes the presence entry
+    character_id: Optional[str]
+    character_name: Optional[str]
+    now: datetime = None
+    # user_id came from a valid token of a chronicle member, not just the query string
+    authenticated: bool = False
+
+    @property
+    def timestamp(self) -> str:
+        return self.now.isoformat()
+
+    def event(self, message_type: str, data: dict, with_sender: bool = True) -> dict:
+        """Relay frame for a generic table event"""
+        message = {"type": message_type, "data": data}
+        if with_sender:
+            message["user_id"] = self.user_id
+            message["username"] = self.username
+        message["timestamp"] = self.timestamp
+        return message
+
+
+dispatcher = MessageDispatcher(settings.WS_MAX_FRAME_SIZE)
+
+
+# ============== CHAT MESSAGES ==============
+@dispatcher.register("chat_message", schema=WSChatMessage)
+async def handle_chat_message(ctx: WSContext, payload: WSChatMessage):
+    msg_data = payload.data
+    content = msg_data.content if msg_data.content is not None else payload.message
+    msg_type = msg_data.message_type
+    recipient_id = msg_data.recipient_id
+    char_id = msg_data.character_id or ctx.character_id
+    char_name = msg_data.character_name or ctx.character_name
+
+    message_id = str(uuid.uuid4())
+    response = {
+        "type": "chat_message",
+        "data": {
+            "id": message_id,
+            "content": content,
+            "message_type": msg_type,
+            "character_id": char_id,
+            "character_name": char_name,
+            "recipient_id": recipient_id,
+        },
+        "user_id": ctx.user_id,
+        "username": ctx.username,
+        "timestamp": ctx.timestamp
+    }
+
+    if msg_type == "whisper" and recipient_id:
+        # Send only to sender and recipient (all of their devices)
+        await manager.send_to_user(ctx.chronicle_id, ctx.user_id, response)
+        if recipient_id != ctx.user_id:
+            await manager.send_to_user(ctx.chronicle_id, recipient_id, response)
+    else:
+        # Broadcast to everyone
+        await manager.broadcast(ctx.chronicle_id, response)
+
+    # Persisted in the background in micro-batches
+    await chat_writer.submit({
+        "id": message_id,
+        "chronicle_id": ctx.chronicle_id,
+        "session_id": session_registry.session_id(ctx.chronicle_id),
+        "user_id": ctx.user_id,
+        "character_id": char_id,
+        "message_type": msg_type,
+        "content": content,
+        "recipient_id": recipient_id,
+        "sender_name": ctx.username,
+        "character_name": char_name,
+        "created_at": ctx.now,
+    })
+
+
+# ============== DICE ROLLS ==============
+@dispatcher.register("dice_roll", schema=WSEvent)
+async def handle_dice_roll(ctx: WSContext, payload: WSEvent):
+    roll_data = payload.data
+    is_secret = bool(roll_data.get("is_secret", False))
+
+    response = {
+        "type": "dice_roll",
+        "data": roll_data,
+        "user_id": ctx.user_id,
+        "username": ctx.username,
+        "character_id": ctx.character_id,
+        "character_name": ctx.character_name,
+        "is_secret": is_secret,
+        "timestamp": ctx.timestamp
+    }
+
+    if is_secret:
+        # Secret roll - only send to roller (and storyteller in future)
+        await manager.send_personal(ctx.user_conn, response)
+    else:
+        # Public roll - broadcast to everyone
+        await manager.broadcast(ctx.chronicle_id, response)
+
+
+@dispatcher.register("roll_request", schema=WSRollRequest)
+async def handle_roll_request(ctx: WSContext, payload: WSRollRequest):
+    # Rolled here, so the result is authoritative and arrives in one hop
+    char_id = payload.character_id or ctx.character_id
+    char_name = payload.character_name or ctx.character_name
+    breakdown = None
+    if payload.expression:
+        # Pool and Hunger come from the character sheet instead of the client
+        async with async_session_maker() as db:
+            character = await db.get(Character, char_id) if char_id else None
+            chronicle = await db.get(Chronicle, ctx.chronicle_id)
+        if not character or character.chronicle_id != ctx.chronicle_id:
+            await manager.send_personal(
+                ctx.user_conn, error_frame("invalid_expression", "Personagem nao encontrado", payload.type)
+            )
+            return
+        # The roll reveals sheet values: only the owner or the storyteller, on a verified connection
+        storyteller_id = chronicle.storyteller_id if chronicle else None
+        if not ctx.authenticated or ctx.user_id not in (character.owner_id, storyteller_id):
+            await manager.send_personal(ctx.user_conn, error_frame(
+                "invalid_expression", "Voce so pode rolar com sua propria ficha", payload.type,
+            ))
+            return
+        try:
+            resolved = dice_service.resolve_expression(payload.expression, character.sheet, character.game_version)
+        except ExpressionError as e:
+            await manager.send_personal(ctx.user_conn, error_frame("invalid_expression", str(e), payload.type))
+            return
+        payload = payload.model_copy(update={
+            "game_version": character.game_version,
+            "pool": min(resolved.pool, 30),
+            "hunger": resolved.hunger,
+        })
+        char_name = char_name or character.name
+        breakdown = resolved.to_dict()["breakdown"]
+
+    source = dice_sources.for_chronicle(ctx.chronicle_id)
+    if payload.game_version == "v20":
+        outcome = dice_service.roll_v20(
+            payload.pool,
+            difficulty=6 if payload.difficulty is None else payload.difficulty,
+            specialty=payload.specialty,
+            willpower=payload.willpower,
+            source=source,
+            compact=payload.compact,
+        )
+    elif payload.roll_type == "rouse":
+        outcome = dice_service.rouse_check(reroll=payload.reroll, source=source)
+    else:
+        outcome = dice_service.roll_v5(
+            payload.pool,
+            hunger=payload.hunger,
+            difficulty=1 if payload.difficulty is None else payload.difficulty,
+            source=source,
+            compact=payload.compact,
+        )
+
+    roll_id = str(uuid.uuid4())
+    response = {
+        "type": "dice_roll",
+        "data": {
+            "id": roll_id,
+            "game_version": outcome.game_version,
+            "roll_type": outcome.roll_type,
+            "pool": outcome.pool,
+            "hunger": outcome.hunger,
+            "description": payload.description,
+            **outcome.result,
+        },
+        "request_id": payload.request_id,
+        "user_id": ctx.user_id,
+        "username": ctx.username,
+        "character_id": char_id,
+        "character_name": char_name,
+        "is_secret": payload.is_secret,
+        "timestamp": ctx.timestamp
+    }
+    if breakdown is not None:
+        response["data"]["expression"] = payload.expression
+        response["data"]["breakdown"] = breakdown
+
+    if payload.is_secret:
+        # Secret roll - only the roller's devices (and storyteller in future)
+        await manager.send_to_user(ctx.chronicle_id, ctx.user_id, response)
+    else:
+        await manager.broadcast(ctx.chronicle_id, response)
+
+    # Persisted in the background in micro-batches; a claimed user_id is not enough
+    # to write someone's roll history and stats
+    if not ctx.authenticated:
+        return
+    await dice_writer.submit(dice_service.to_row(
+        outcome,
+        roll_id=roll_id,
+        chronicle_id=ctx.chronicle_id,
+        roller_id=ctx.user_id,
+        character_id=char_id,
+        session_id=session_registry.session_id(ctx.chronicle_id),
+        description=payload.description,
+        is_secret=payload.is_secret,
+        created_at=ctx.now,
+    ))
+
+
+# ============== SESSION, XP AND INITIATIVE EVENTS ==============
+@dispatcher.register(
+    "session_started", "session_ended", "participant_joined", "participant_left",
+    "xp_request_created", "xp_awarded", "combat_started", "combat_ended",
+    schema=WSEvent,
+)
+async def handle_table_event(ctx: WSContext, payload: WSEvent):
+    await manager.broadcast(ctx.chronicle_id, ctx.event(payload.type, payload.data))
+
+
+@dispatcher.register("initiative_updated", "turn_advanced", "scene_updated", schema=WSEvent)
+async def handle_anonymous_event(ctx: WSContext, payload: WSEvent):
+    await manager.broadcast(ctx.chronicle_id, ctx.event(payload.type, payload.data, with_sender=False))
+
+
+@dispatcher.register("xp_request_updated", schema=WSEvent)
+async def handle_xp_request_updated(ctx: WSContext, payload: WSEvent):
+    request_data = payload.data
+    requester_id = request_data.get("requester_id")
+    # Notify the requester specifically
+    if requester_id:
+        await manager.send_to_user(ctx.chronicle_id, requester_id, {
+            "type": "xp_request_updated",
+            "data": request_data,
+            "timestamp": ctx.timestamp
+        })
+    # Also broadcast to storyteller view
+    await manager.broadcast(ctx.chronicle_id, ctx.event("xp_request_updated", request_data, with_sender=False))
+
+
+# ============== SCENE EVENTS ==============
+@dispatcher.register("scene_change", schema=WSSceneChange)
+async def handle_scene_change(ctx: WSContext, payload: WSSceneChange):
+    await manager.broadcast(ctx.chronicle_id, {
+        "type": "scene_change",
+        "scene_id": payload.scene_id,
+        "scene_name": payload.scene_name,
+        "user_id": ctx.user_id,
+        "username": ctx.username,
+        "timestamp": ctx.timestamp
+    })
+
+
+# ============== CHARACTER EVENTS ==============
+@dispatcher.register("character_update", schema=WSCharacterUpdate)
+async def handle_character_update(ctx: WSContext, payload: WSCharacterUpdate):
+    # Slider drags send many partial updates; merge them per window
+    await manager.coalescer.submit(ctx.chronicle_id, (ctx.user_id, payload.type, payload.character_id), {
+        "type": "character_update",
+        "character_id": payload.character_id,
+        "character_name": payload.character_name,
+        "data": payload.data,
+        "timestamp": ctx.timestamp
+    }, merge=merge_character_updates)
+
+
+# ============== UTILITY ==============
+@dispatcher.register("typing", schema=WSTyping)
+async def handle_typing(ctx: WSContext, payload: WSTyping):
+    # Only the latest typing state of a burst is worth sending
+    await manager.coalescer.submit(ctx.chronicle_id, (ctx.user_id, payload.type), {
+        "type": "typing",
+        "user_id": ctx.user_id,
+        "username": ctx.username,
+        "character_name": ctx.character_name,
+        "is_typing": payload.is_typing
+    }, exclude=ctx.user_conn)
+
+
+@dispatcher.register("ping", schema=WSMessage)
+async def handle_ping(ctx: WSContext, payload: WSMessage):
+    await manager.send_personal(ctx.user_conn, {"type": "pong"})
+
+
+@dispatcher.register("update_character", schema=WSUpdateCharacter)
+async def handle_update_character(ctx: WSContext, payload: WSUpdateCharacter):
+    # Update user's active character (broadcast as a presence delta)
+    ctx.user_conn.character_id = payload.character_id
+    ctx.user_conn.character_name = payload.character_name
+    await manager.update_presence(ctx.user_conn, ctx.chronicle_id)
+
+
+@dispatcher.register("subscribe", "unsubscribe", schema=WSSubscription)
+async def handle_subscription(ctx: WSContext, payload: WSSubscription):
+    # Client opened or closed panels; only route the topics it shows
+    requested = parse_topics(payload.topics)
+    if payload.type == "subscribe":
+        ctx.user_conn.topics |= requested
+    else:
+        ctx.user_conn.topics -= requested
+    await manager.send_personal(ctx.user_conn, {
+        "type": "subscriptions",
+        "topics": sorted(ctx.user_conn.topics)
+    })
+
+
+@dispatcher.register("resume", schema=WSResume)
+async def handle_resume(ctx: WSContext, payload: WSResume):
+    # Client noticed a seq gap on a live connection
+    await manager.replay(ctx.user_conn, ctx.chronicle_id, payload.last_seq)
+
+
+@dispatcher.register("presence_sync", schema=WSMessage)
+async def handle_presence_sync(ctx: WSContext, payload: WSMessage):
+    # Client saw a presence_version gap and wants the full roster
+    await manager.send_personal(ctx.user_conn, {
+        "type": "presence_snapshot",
+        "chronicle_id": ctx.chronicle_id,
+        **await manager.presence_snapshot(ctx.chronicle_id)
+    })
+
+
+async def authenticate_socket(token: Optional[str], chronicle_id: str) -> Optional[User]:
+    """The token's user, if the token is valid and the user is the chronicle's storyteller or a member"""
+    if not token:
+        return None
+    async with async_session_maker() as db:
+        user = await get_current_user_optional(token, db)
+        if user is None:
+            return None
+        chronicle = await db.get(Chronicle, chronicle_id)
+        if chronicle is None:
+            return None
+        if chronicle.storyteller_id == user.id:
+            return user
+        member = await db.scalar(
+            select(ChronicleMember.user_id)
+            .where(ChronicleMember.chronicle_id == chronicle_id, ChronicleMember.user_id == user.id)
+        )
+        return user if member else None
+
+
 @router.websocket("/chronicle/{chronicle_id}")
 async def chronicle_websocket(websocket: WebSocket, chronicle_id: str):
     """WebSocket endpoint for real-time chronicle updates"""
 
-    # Get user info from query params
+    # Get user info from query params; a valid token overrides the claimed identity
     user_id = websocket.query_params.get("user_id", "unknown")
     username = websocket.query_params.get("username", "Anonimo")
+    user = await authenticate_socket(websocket.query_params.get("token"), chronicle_id)
+    if user is not None:
+        user_id, username = user.id, user.username
     character_id = websocket.query_params.get("character_id")
     character_name = websocket.query_params.get("character_name")
-
-    user_conn = await manager.connect(websocket, chronicle_id, user_id, username, character_id, character_name)
+    # Last broadcast seq a reconnecting client applied, to replay what it missed
+    last_seq = websocket.query_params.get("last_seq")
+    # Optional comma-separated topic list; omitted means every topic
+    topics = websocket.query_params.get("topics")
+
+    user_conn = await manager.connect(
+        websocket, chronicle_id, user_id, username, character_id, character_name,
+        topics=parse_topics(topics) if topics is not None else None,
+        protocol=negotiate_protocol(websocket.scope.get("subprotocols", [])),
+    )
+    ctx = WSContext(
+        chronicle_id, user_conn, user_id, username, character_id, character_name, authenticated=user is not None,
+    )
 
     try:
-        # Send connection confirmation with online users
+        # Send connection confirmation with a full roster snapshot; the next
+        # sequenced frame's prev_seq is this seq
+        snapshot = await manager.presence_snapshot(chronicle_id)
         await manager.send_personal(user_conn, {
             "type": "connected",
             "chronicle_id": chronicle_id,
-            "online_users": manager.get_online_users(chronicle_id)
+            "seq": user_conn.last_seq,
+            **snapshot
         })
-
-        # Notify others that user joined
-        await manager.broadcast(chronicle_id, {
-            "type": "user_joined",
-            "user_id": user_id,
-            "username": username,
-            "character_id": character_id,
-            "character_name": character_name,
-            "online_users": manager.get_online_users(chronicle_id)
-        }, exclude=user_conn)
+        if last_seq is not None and last_seq.isdigit():
+            await manager.replay(user_conn, chronicle_id, int(last_seq))
 
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            message_type = message.get("type")
-            timestamp = datetime.utcnow().isoformat()
-
-            # ============== CHAT MESSAGES ==============
-            if message_type == "chat_message":
-                msg_data = message.get("data", {})
-                content = msg_data.get("content", message.get("message", ""))
-                msg_type = msg_data.get("message_type", "chat")
-                recipient_id = msg_data.get("recipient_id")
-                char_id = msg_data.get("character_id", character_id)
-                char_name = msg_data.get("character_name", character_name)
-
-                # Save to database
-                async for db in get_async_session():
-                    # Get active session if any
-                    session_result = await db.execute(
-                        select(GameSession)
-                        .where(GameSession.chronicle_id == chronicle_id)
-                        .where(GameSession.is_active == True)
-                    )
-                    active_session = session_result.scalar_one_or_none()
-
-                    chat_msg = ChatMessage(
-                        id=str(uuid.uuid4()),
-                        chronicle_id=chronicle_id,
-                        session_id=active_session.id if active_session else None,
-                        user_id=user_id,
-                        character_id=char_id,
-                        message_type=msg_type,
-                        content=content,
-                        recipient_id=recipient_id,
-                        sender_name=username,
-                        character_name=char_name,
-                    )
-                    db.add(chat_msg)
-                    await db.commit()
-                    await db.refresh(chat_msg)
-
-                    response = {
-                        "type": "chat_message",
-                        "data": {
-                            "id": chat_msg.id,
-                            "content": content,
-                            "message_type": msg_type,
-                            "character_id": char_id,
-                            "character_name": char_name,
-                            "recipient_id": recipient_id,
-                        },
-                        "user_id": user_id,
-                        "username": username,
-                        "timestamp": timestamp
-                    }
-
-                    if msg_type == "whisper" and recipient_id:
-                        # Send only to sender and recipient
-                        await manager.send_personal(user_conn, response)
-                        await manager.send_to_user(chronicle_id, recipient_id, response)
-                    else:
-                        # Broadcast to everyone
-                        await manager.broadcast(chronicle_id, response)
-                    break
-
-            # ============== DICE ROLLS ==============
-            elif message_type == "dice_roll":
-                roll_data = message.get("data", {})
-                is_secret = roll_data.get("is_secret", False)
-
-                response = {
-                    "type": "dice_roll",
-                    "data": roll_data,
-                    "user_id": user_id,
-                    "username": username,
-                    "character_id": character_id,
-                    "character_name": character_name,
-                    "is_secret": is_secret,
-                    "timestamp": timestamp
-                }
-
-                if is_secret:
-                    # Secret roll - only send to roller (and storyteller in future)
-                    await manager.send_personal(user_conn, response)
-                else:
-                    # Public roll - broadcast to everyone
-                    await manager.broadcast(chronicle_id, response)
-
-            # ============== SESSION EVENTS ==============
-            elif message_type == "session_started":
-                await manager.broadcast(chronicle_id, {
-                    "type": "session_started",
-                    "data": message.get("data", {}),
-                    "user_id": user_id,
-                    "username": username,
-                    "timestamp": timestamp
-                })
-
-            elif message_type == "session_ended":
-                await manager.broadcast(chronicle_id, {
-                    "type": "session_ended",
-                    "data": message.get("data", {}),
-                    "user_id": user_id,
-                    "username": username,
-                    "timestamp": timestamp
-                })
-
-            elif message_type == "participant_joined":
-                await manager.broadcast(chronicle_id, {
-                    "type": "participant_joined",
-                    "data": message.get("data", {}),
-                    "user_id": user_id,
-                    "username": username,
-                    "timestamp": timestamp
-                })
-
-            elif message_type == "participant_left":
-                await manager.broadcast(chronicle_id, {
-                    "type": "participant_left",
-                    "data": message.get("data", {}),
-                    "user_id": user_id,
-                    "username": username,
-                    "timestamp": timestamp
-                })
-
-            # ============== XP EVENTS ==============
-            elif message_type == "xp_request_created":
-                await manager.broadcast(chronicle_id, {
-                    "type": "xp_request_created",
-                    "data": message.get("data", {}),
-                    "user_id": user_id,
-                    "username": username,
-                    "timestamp": timestamp
-                })
-
-            elif message_type == "xp_request_updated":
-                request_data = message.get("data", {})
-                requester_id = request_data.get("requester_id")
-                # Notify the requester specifically
-                if requester_id:
-                    await manager.send_to_user(chronicle_id, requester_id, {
-                        "type": "xp_request_updated",
-                        "data": request_data,
-                        "timestamp": timestamp
-                    })
-                # Also broadcast to storyteller view
-                await manager.broadcast(chronicle_id, {
-                    "type": "xp_request_updated",
-                    "data": request_data,
-                    "timestamp": timestamp
-                })
-
-            elif message_type == "xp_awarded":
-                await manager.broadcast(chronicle_id, {
-                    "type": "xp_awarded",
-                    "data": message.get("data", {}),
-                    "user_id": user_id,
-                    "username": username,
-                    "timestamp": timestamp
-                })
-
-            # ============== INITIATIVE EVENTS ==============
-            elif message_type == "combat_started":
-                await manager.broadcast(chronicle_id, {
-                    "type": "combat_started",
-                    "data": message.get("data", {}),
-                    "user_id": user_id,
-                    "username": username,
-                    "timestamp": timestamp
-                })
-
-            elif message_type == "combat_ended":
-                await manager.broadcast(chronicle_id, {
-                    "type": "combat_ended",
-                    "data": message.get("data", {}),
-                    "user_id": user_id,
-                    "username": username,
-                    "timestamp": timestamp
-                })
-
-            elif message_type == "initiative_updated":
-                await manager.broadcast(chronicle_id, {
-                    "type": "initiative_updated",
-                    "data": message.get("data", {}),
-                    "timestamp": timestamp
-                })
-
-            elif message_type == "turn_advanced":
-                await manager.broadcast(chronicle_id, {
-                    "type": "turn_advanced",
-                    "data": message.get("data", {}),
-                    "timestamp": timestamp
-                })
-
-            # ============== SCENE EVENTS ==============
-            elif message_type == "scene_change":
-                await manager.broadcast(chronicle_id, {
-                    "type": "scene_change",
-                    "scene_id": message.get("scene_id"),
-                    "scene_name": message.get("scene_name"),
-                    "user_id": user_id,
-                    "username": username,
-                    "timestamp": timestamp
-                })
-
-            elif message_type == "scene_updated":
-                await manager.broadcast(chronicle_id, {
-                    "type": "scene_updated",
-                    "data": message.get("data", {}),
-                    "timestamp": timestamp
-                })
-
-            # ============== CHARACTER EVENTS ==============
-            elif message_type == "character_update":
-                await manager.broadcast(chronicle_id, {
-                    "type": "character_update",
-                    "character_id": message.get("character_id"),
-                    "character_name": message.get("character_name"),
-                    "data": message.get("data"),
-                    "timestamp": timestamp
-                })
-
-            # ============== UTILITY ==============
-            elif message_type == "typing":
-                await manager.broadcast(chronicle_id, {
-                    "type": "typing",
-                    "user_id": user_id,
-                    "username": username,
-                    "character_name": character_name,
-                    "is_typing": message.get("is_typing", False)
-                }, exclude=user_conn)
-
-            elif message_type == "ping":
-                await manager.send_personal(user_conn, {"type": "pong"})
-
-            elif message_type == "update_character":
-                # Update user's active character
-                user_conn.character_id = message.get("character_id")
-                user_conn.character_name = message.get("character_name")
-                await manager.broadcast(chronicle_id, {
-                    "type": "user_character_changed",
-                    "user_id": user_id,
-                    "username": username,
-                    "character_id": user_conn.character_id,
-                    "character_name": user_conn.character_name,
-                    "online_users": manager.get_online_users(chronicle_id)
-                })
+            # Text frames carry JSON, binary frames MessagePack, whatever was negotiated
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", 1000))
+            data = received.get("text")
+            if data is None:
+                data = received.get("bytes") or b""
+            ctx.now = datetime.utcnow()
+            # Malformed frames get an error reply; the connection stays up
+            error = await dispatcher.dispatch(ctx, data)
+            if error is not None:
+                await manager.send_personal(user_conn, error)
 
     except WebSocketDisconnect:
-        manager.disconnect(user_conn, chronicle_id)
-        await manager.broadcast(chronicle_id, {
-            "type": "user_left",
-            "user_id": user_id,
-            "username": username,
-            "online_users": manager.get_online_users(chronicle_id)
-        })
+        # user_left is broadcast by the manager
+        await manager.disconnect(user_conn, chronicle_id)
     except Exception as e:
-        manager.disconnect(user_conn, chronicle_id)
-        await manager.broadcast(chronicle_id, {
-            "type": "user_left",
-            "user_id": user_id,
-            "username": username,
-            "online_users": manager.get_online_users(chronicle_id)
-        })
+        await manager.disconnect(user_conn, chronicle_id)
@@ -22,6 +22,31 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
 
+    # WebSocket fan-out
+    WS_BACKPLANE: str = "memory"  # "memory" (single worker) or "redis" (multiple workers)
+    WS_SEND_QUEUE_SIZE: int = 256  # Pending frames per connection
+    WS_OVERFLOW_POLICY: str = "drop_oldest"  # "drop_oldest", "coalesce" or "disconnect"
+    WS_REPLAY_BUFFER_SIZE: int = 500  # Recent broadcasts kept per chronicle for reconnect replay
+    WS_REPLAY_GRACE_SECONDS: float = 120  # Keep a chronicle's replay buffer this long after its last local connection
+    WS_COALESCE_WINDOW: float = 0.25  # Seconds to fold typing/character_update bursts into one frame (0 disables)
+    WS_MAX_FRAME_SIZE: int = 64 * 1024  # Inbound frames larger than this are rejected before parsing
+
+    # Dice odds
+    DICE_ODDS_PRECOMPUTE_POOL: int = 20  # Exact odds tables built at startup for pools up to this size
+
+    # Batch rolls (storyteller NPC rolls)
+    DICE_BATCH_MAX_ROLLS: int = 200  # Roll specs accepted per /api/dice/batch request
+
+    # Monte Carlo simulation (extended, resisted and contested rolls)
+    SIMULATION_WORKERS: int = 0  # Worker processes; 0 = one per CPU
+    SIMULATION_MAX_TRIALS: int = 5_000_000  # Upper bound on trials per request
+    SIMULATION_CACHE_SIZE: int = 256  # Finished results kept per parameter tuple
+
+    # Write-behind persistence (chat messages, dice rolls)
+    WRITE_BEHIND_BATCH_SIZE: int = 100  # Rows per bulk insert
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 0.2  # Max seconds a row waits in memory
+    WRITE_BEHIND_QUEUE_SIZE: int = 5000  # Pending rows before senders are back-pressured
+
     # Discord OAuth
     DISCORD_CLIENT_ID: Optional[str] = None
     DISCORD_CLIENT_SECRET: Optional[str] = None
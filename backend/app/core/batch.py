@@ -0,0 +1,275 @@
+"""
+Vectorized dice engine for many pools at once (NPC mass rolls, simulations).
+
+All dice of all pools are drawn in a single NumPy call and tallied per pool
+with bincount, instead of one randint and several Python passes per pool.
+Dice come from a DiceSource (the shared CSPRNG source unless a chronicle's
+seeded stream is passed), or from a NumPy Generator for simulations.
+`tally_v5`/`tally_v20` return plain arrays for code that only needs the
+numbers; `roll_v5_batch`/`roll_v20_batch` wrap them into the same
+V5DiceRoll/V20DiceRoll results the scalar rollers produce, or with
+compact=True into V5CompactRoll/V20CompactRoll face counts, which skips
+building a Python list per pool.
+"""
+from typing import List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+from .entropy import DiceSource, dice_sources
+from .v5.dice import V5CompactRoll, V5DiceRoll, V5RollResult
+from .v20.dice import V20CompactRoll, V20DiceRoll, V20RollResult
+
+IntArg = Union[int, Sequence[int], np.ndarray]
+BoolArg = Union[bool, Sequence[bool], np.ndarray]
+
+# Index = result code in the tally arrays
+V5_RESULTS = (
+    V5RollResult.BESTIAL_FAILURE,
+    V5RollResult.FAILURE,
+    V5RollResult.SUCCESS,
+    V5RollResult.CRITICAL,
+    V5RollResult.MESSY_CRITICAL,
+)
+V20_RESULTS = (
+    V20RollResult.BOTCH,
+    V20RollResult.FAILURE,
+    V20RollResult.SUCCESS,
+    V20RollResult.EXCEPTIONAL,
+)
+
+
+class V5Tallies(NamedTuple):
+    """Per-pool V5 counts; every field has one entry per pool"""
+    pools: np.ndarray
+    hunger: np.ndarray
+    difficulty: np.ndarray
+    faces: np.ndarray  # All dice, pool after pool; regular dice first, then hunger dice
+    offsets: np.ndarray  # Start of each pool in `faces`
+    successes: np.ndarray
+    regular_tens: np.ndarray
+    hunger_tens: np.ndarray
+    hunger_ones: np.ndarray
+    critical_pairs: np.ndarray
+    margin: np.ndarray
+    result: np.ndarray  # Index into V5_RESULTS
+
+
+class V20Tallies(NamedTuple):
+    """Per-pool V20 counts; every field has one entry per pool"""
+    pools: np.ndarray
+    difficulty: np.ndarray
+    faces: np.ndarray
+    offsets: np.ndarray
+    reroll_faces: np.ndarray  # Specialty rerolls, pool after pool
+    reroll_offsets: np.ndarray
+    successes: np.ndarray  # Net successes, 0 on failure or botch
+    ones: np.ndarray
+    tens: np.ndarray
+    result: np.ndarray  # Index into V20_RESULTS
+
+
+def _per_pool(value, count: int) -> np.ndarray:
+    """Broadcast a scalar or per-pool argument to one int64 entry per pool"""
+    return np.broadcast_to(np.asarray(value, dtype=np.int64), (count,)).copy()
+
+
+def _draw(counts: np.ndarray, source: Optional[DiceSource], rng: Optional[np.random.Generator]):
+    """Faces for `counts[i]` dice per pool, the owning pool of each die, and pool offsets"""
+    offsets = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=offsets[1:])
+    total = int(counts.sum())
+    if rng is not None:
+        faces = rng.integers(1, 11, size=total, dtype=np.int8)
+    else:
+        faces = (source or dice_sources.default).faces(total)
+    owner = np.repeat(np.arange(len(counts)), counts)
+    return faces, owner, offsets
+
+
+def _face_counts(faces: np.ndarray, owner: np.ndarray, count: int, kinds: int = 1) -> np.ndarray:
+    """
+    counts[pool, kind, face - 1]: how many dice of each pool rolled each face.
+    `owner` holds pool * kinds + kind per die.
+    """
+    counts = np.bincount(owner * 10 + faces.astype(np.int64) - 1, minlength=count * kinds * 10)
+    return counts.reshape(count, kinds, 10)
+
+
+def tally_v5(pools: IntArg, hunger: IntArg = 0, difficulty: IntArg = 1,
+             rng: Optional[np.random.Generator] = None, source: Optional[DiceSource] = None) -> V5Tallies:
+    """Roll and score V5 pools with the same rules as V5DiceRoller.roll"""
+    pools = np.maximum(np.atleast_1d(np.asarray(pools, dtype=np.int64)), 1)
+    count = len(pools)
+    hunger = np.clip(_per_pool(hunger, count), 0, pools)
+    difficulty = _per_pool(difficulty, count)
+
+    faces, owner, offsets = _draw(pools, source, rng)
+    is_hunger = (np.arange(len(faces)) - offsets[owner]) >= (pools - hunger)[owner]
+
+    def tally(mask):
+        return np.bincount(owner[mask], minlength=count)
+
+    tens = faces == 10
+    regular_tens = tally(tens & ~is_hunger)
+    hunger_tens = tally(tens & is_hunger)
+    hunger_ones = tally((faces == 1) & is_hunger)
+    critical_pairs = (regular_tens + hunger_tens) // 2
+    successes = tally(faces >= 6) + critical_pairs * 2
+    margin = successes - difficulty
+
+    passed = margin >= 0
+    critical = passed & (critical_pairs > 0)
+    result = np.select(
+        [critical & (hunger_tens > 0), critical, passed, hunger_ones > 0],
+        [4, 3, 2, 0],
+        default=1,
+    )
+    return V5Tallies(pools, hunger, difficulty, faces, offsets, successes,
+                     regular_tens, hunger_tens, hunger_ones, critical_pairs, margin, result)
+
+
+def tally_v20(pools: IntArg, difficulty: IntArg = 6, specialty: BoolArg = False, willpower: BoolArg = False,
+              rng: Optional[np.random.Generator] = None, source: Optional[DiceSource] = None) -> V20Tallies:
+    """Roll and score V20 pools with the same rules as V20DiceRoller.roll"""
+    pools = np.maximum(np.atleast_1d(np.asarray(pools, dtype=np.int64)), 1)
+    count = len(pools)
+    difficulty = np.clip(_per_pool(difficulty, count), 2, 10)
+    specialty = _per_pool(specialty, count).astype(bool)
+    willpower = _per_pool(willpower, count)
+
+    faces, owner, offsets = _draw(pools, source, rng)
+    ones = np.bincount(owner[faces == 1], minlength=count)
+    tens = np.bincount(owner[faces == 10], minlength=count)
+    successes = np.bincount(owner[faces >= difficulty[owner]], minlength=count)
+
+    # Specialty: every 10 is rerolled once; the reroll can add a success or a 1
+    reroll_faces, reroll_owner, reroll_offsets = _draw(np.where(specialty, tens, 0), source, rng)
+    successes += np.bincount(reroll_owner[reroll_faces >= difficulty[reroll_owner]], minlength=count)
+    ones += np.bincount(reroll_owner[reroll_faces == 1], minlength=count)
+
+    successes += willpower
+    net = successes - ones
+    failed = net <= 0
+    botch = failed & (ones > 0) & (successes == 0)
+    result = np.select([botch, failed, net >= 5], [0, 1, 3], default=2)
+    net = np.where(failed, 0, net)
+    return V20Tallies(pools, difficulty, faces, offsets, reroll_faces, reroll_offsets, net, ones, tens, result)
+
+
+def roll_v5_batch(pools: IntArg, hunger: IntArg = 0, difficulty: IntArg = 1,
+                  rng: Optional[np.random.Generator] = None, compact: bool = False,
+                  source: Optional[DiceSource] = None) -> List[V5DiceRoll]:
+    """
+    Roll many V5 pools in one call.
+
+    Args:
+        pools: Pool size per roll
+        hunger: Hunger dice, one value for all rolls or one per roll
+        difficulty: Successes needed, one value for all rolls or one per roll
+        rng: NumPy generator, for seeded simulations
+        compact: Return V5CompactRoll face counts instead of the individual dice
+        source: Dice source (defaults to the shared one); ignored when rng is given
+
+    Returns:
+        One V5DiceRoll (V5CompactRoll if compact) per pool, in order
+    """
+    t = tally_v5(pools, hunger, difficulty, rng, source)
+    if compact:
+        return _compact_v5(t)
+    faces = t.faces.tolist()
+    rolls = []
+    for start, pool, hunger_count, difficulty_, successes, regular_tens, hunger_tens, hunger_ones, pairs, margin, result in zip(
+        t.offsets.tolist(), t.pools.tolist(), t.hunger.tolist(), t.difficulty.tolist(), t.successes.tolist(),
+        t.regular_tens.tolist(), t.hunger_tens.tolist(), t.hunger_ones.tolist(), t.critical_pairs.tolist(),
+        t.margin.tolist(), t.result.tolist(),
+    ):
+        split = start + pool - hunger_count
+        rolls.append(V5DiceRoll(
+            regular_dice=faces[start:split],
+            hunger_dice=faces[split:start + pool],
+            difficulty=difficulty_,
+            successes=successes,
+            regular_tens=regular_tens,
+            hunger_tens=hunger_tens,
+            hunger_ones=hunger_ones,
+            critical_pairs=pairs,
+            result_type=V5_RESULTS[result],
+            margin=margin,
+        ))
+    return rolls
+
+
+def roll_v20_batch(pools: IntArg, difficulty: IntArg = 6, specialty: BoolArg = False, willpower: BoolArg = False,
+                   rng: Optional[np.random.Generator] = None, compact: bool = False,
+                   source: Optional[DiceSource] = None) -> List[V20DiceRoll]:
+    """
+    Roll many V20 pools in one call.
+
+    Args:
+        pools: Pool size per roll
+        difficulty: Target number, one value for all rolls or one per roll
+        specialty: Whether 10s are rerolled, one value for all rolls or one per roll
+        willpower: Whether Willpower adds a success, one value for all rolls or one per roll
+        rng: NumPy generator, for seeded simulations
+        compact: Return V20CompactRoll face counts instead of the individual dice
+        source: Dice source (defaults to the shared one); ignored when rng is given
+
+    Returns:
+        One V20DiceRoll (V20CompactRoll if compact) per pool, in order
+    """
+    t = tally_v20(pools, difficulty, specialty, willpower, rng, source)
+    if compact:
+        return _compact_v20(t)
+    faces = t.faces.tolist()
+    reroll_faces = t.reroll_faces.tolist()
+    reroll_ends = np.append(t.reroll_offsets[1:], len(reroll_faces)).tolist()
+    rolls = []
+    for start, pool, reroll_start, reroll_end, difficulty_, successes, ones, tens, result in zip(
+        t.offsets.tolist(), t.pools.tolist(), t.reroll_offsets.tolist(), reroll_ends, t.difficulty.tolist(),
+        t.successes.tolist(), t.ones.tolist(), t.tens.tolist(), t.result.tolist(),
+    ):
+        rolls.append(V20DiceRoll(
+            dice=faces[start:start + pool],
+            difficulty=difficulty_,
+            successes=successes,
+            ones=ones,
+            tens=tens,
+            specialty_rerolls=reroll_faces[reroll_start:reroll_end],
+            result_type=V20_RESULTS[result],
+        ))
+    return rolls
+
+
+def _owners(offsets: np.ndarray, total: int) -> np.ndarray:
+    """Pool index of every die, from the pool offsets"""
+    return np.repeat(np.arange(len(offsets)), np.diff(offsets, append=total))
+
+
+def _compact_v5(t: V5Tallies) -> List[V5CompactRoll]:
+    count = len(t.pools)
+    owner = _owners(t.offsets, len(t.faces))
+    is_hunger = (np.arange(len(t.faces)) - t.offsets[owner]) >= (t.pools - t.hunger)[owner]
+    counts = _face_counts(t.faces, owner * 2 + is_hunger, count, kinds=2).tolist()
+    return [
+        V5CompactRoll(tuple(regular), tuple(hungry), difficulty_, successes, regular_tens, hunger_tens,
+                      hunger_ones, pairs, V5_RESULTS[result], margin)
+        for (regular, hungry), difficulty_, successes, regular_tens, hunger_tens, hunger_ones, pairs, margin, result
+        in zip(
+            counts, t.difficulty.tolist(), t.successes.tolist(), t.regular_tens.tolist(),
+            t.hunger_tens.tolist(), t.hunger_ones.tolist(), t.critical_pairs.tolist(), t.margin.tolist(),
+            t.result.tolist(),
+        )
+    ]
+
+
+def _compact_v20(t: V20Tallies) -> List[V20CompactRoll]:
+    count = len(t.pools)
+    counts = _face_counts(t.faces, _owners(t.offsets, len(t.faces)), count)[:, 0].tolist()
+    reroll_counts = _face_counts(t.reroll_faces, _owners(t.reroll_offsets, len(t.reroll_faces)), count)[:, 0].tolist()
+    return [
+        V20CompactRoll(tuple(counts_), tuple(rerolls), difficulty_, successes, ones, tens, V20_RESULTS[result])
+        for counts_, rerolls, difficulty_, successes, ones, tens, result in zip(
+            counts, reroll_counts, t.difficulty.tolist(), t.successes.tolist(), t.ones.tolist(),
+            t.tens.tolist(), t.result.tolist(),
+        )
+    ]
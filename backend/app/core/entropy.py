@@ -0,0 +1,120 @@
+"""
+Buffered d10 entropy for every dice roller.
+
+Instead of one `random.randint` call per die, a DiceSource draws a large
+block of d10 faces at once and hands dice out of it:
+
+- unseeded sources read the OS CSPRNG (os.urandom), turning each byte
+  below 250 into a face so all ten faces stay equally likely
+- seeded sources use a NumPy Generator, so a chronicle seeded for a test
+  replays the same dice in the same order
+
+Sources are not thread-safe; they are used from the event loop.
+"""
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+BUFFER_SIZE = 4096
+# Largest multiple of 10 that fits in a byte; higher bytes are rejected
+_BYTE_LIMIT = 250
+
+
+def _csprng_faces(count: int) -> np.ndarray:
+    """`count` d10 faces from os.urandom, without modulo bias"""
+    faces = np.empty(0, dtype=np.uint8)
+    while len(faces) < count:
+        # ~2.4% of bytes are rejected; ask for a little extra up front
+        raw = np.frombuffer(os.urandom((count - len(faces)) * 41 // 40 + 16), dtype=np.uint8)
+        faces = np.concatenate((faces, raw[raw < _BYTE_LIMIT]))
+    return faces[:count] % 10 + 1
+
+
+class DiceSource:
+    """Serves d10 faces from a buffer refilled in bulk"""
+
+    __slots__ = ("seed", "buffer_size", "_rng", "_buffer", "_pos")
+
+    def __init__(self, seed: Optional[int] = None, buffer_size: int = BUFFER_SIZE):
+        self.seed = seed
+        self.buffer_size = buffer_size
+        self._rng = np.random.default_rng(seed) if seed is not None else None
+        self._buffer: List[int] = []
+        self._pos = 0
+
+    def _blocks(self, needed: int) -> np.ndarray:
+        """Whole buffer blocks covering at least `needed` fresh faces"""
+        blocks = -(-needed // self.buffer_size)
+        if self._rng is None:
+            return _csprng_faces(blocks * self.buffer_size)
+        # One draw per block, so a seeded stream does not depend on the pool sizes read from it
+        return np.concatenate([
+            self._rng.integers(1, 11, size=self.buffer_size, dtype=np.int8) for _ in range(blocks)
+        ])
+
+    def _fill(self, needed: int):
+        # Keep the unread tail so seeded streams never skip dice
+        self._buffer = self._buffer[self._pos:] + self._blocks(needed).tolist()
+        self._pos = 0
+
+    def d10(self) -> int:
+        """Roll a single d10"""
+        if self._pos >= len(self._buffer):
+            self._fill(1)
+        face = self._buffer[self._pos]
+        self._pos += 1
+        return face
+
+    def roll(self, count: int) -> List[int]:
+        """Roll `count` d10s"""
+        missing = self._pos + count - len(self._buffer)
+        if missing > 0:
+            self._fill(missing)
+        faces = self._buffer[self._pos:self._pos + count]
+        self._pos += count
+        return faces
+
+    def faces(self, count: int) -> np.ndarray:
+        """
+        Roll `count` d10s as an int8 array, for the vectorized batch engine.
+
+        Reads the same stream as d10/roll: buffered dice first, then fresh
+        blocks whose unread tail is kept for the next call.
+        """
+        buffered = min(count, len(self._buffer) - self._pos)
+        head = np.asarray(self._buffer[self._pos:self._pos + buffered], dtype=np.int8)
+        self._pos += buffered
+        missing = count - buffered
+        if missing <= 0:
+            return head
+        fresh = self._blocks(missing)
+        self._buffer = fresh[missing:].tolist()
+        self._pos = 0
+        return np.concatenate((head, fresh[:missing].astype(np.int8)))
+
+
+class DiceSources:
+    """The shared CSPRNG source plus optional seeded streams per chronicle"""
+
+    def __init__(self):
+        self.default = DiceSource()
+        self._seeded: Dict[str, DiceSource] = {}
+
+    def for_chronicle(self, chronicle_id: Optional[str]) -> DiceSource:
+        """The chronicle's seeded stream, or the shared source"""
+        if chronicle_id is None:
+            return self.default
+        return self._seeded.get(chronicle_id, self.default)
+
+    def seed(self, chronicle_id: str, seed: int) -> DiceSource:
+        """Give a chronicle its own reproducible stream (reseeding restarts it)"""
+        source = self._seeded[chronicle_id] = DiceSource(seed)
+        return source
+
+    def release(self, chronicle_id: str):
+        """Return a chronicle to the shared source"""
+        self._seeded.pop(chronicle_id, None)
+
+
+dice_sources = DiceSources()
@@ -0,0 +1,282 @@
+"""
+Dice pool expressions resolved against a character sheet.
+
+An expression is a pool and, optionally, a Hunger part separated by a
+comma:
+
+    "forca + briga + 2"
+    "destreza+armasDeFogo-1, fome"
+    "atributos.mentais.raciocinio + disciplinas.auspicios"
+
+Terms are integers, trait names or dotted sheet paths, joined by + or -.
+Names are matched without case or accents ("Força" == "forca") against
+the sheet layout of each edition; a name that is not an attribute, skill
+or sheet stat is looked up among the character's Disciplines. Layout
+traits missing from a sheet count as 0, but a Discipline the character
+does not have, or a dotted path the sheet does not hold, is an error.
+
+Compiling parses the text once and maps every name to where it lives in
+the sheet; the resulting DicePlan is cached per (expression, edition
+layout) and resolves a sheet in a single pass.
+"""
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+Path = Tuple[str, ...]
+
+_ATTRIBUTES = {
+    "v5": {
+        "fisicos": ("forca", "destreza", "vigor"),
+        "sociais": ("carisma", "manipulacao", "autocontrole"),
+        "mentais": ("inteligencia", "raciocinio", "determinacao"),
+    },
+    "v20": {
+        "fisicos": ("forca", "destreza", "vigor"),
+        "sociais": ("carisma", "manipulacao", "aparencia"),
+        "mentais": ("percepcao", "inteligencia", "raciocinio"),
+    },
+}
+
+_V5_SKILLS = (
+    "armasBrancas", "armasDeFogo", "atletismo", "briga", "conducao", "furtividade", "ladroagem", "oficios",
+    "sobrevivencia", "empatiaComAnimais", "etiqueta", "intimidacao", "lideranca", "manha", "performance",
+    "persuasao", "sagacidade", "labia", "ciencia", "erudicao", "financas", "investigacao", "medicina",
+    "ocultismo", "percepcao", "politica", "tecnologia",
+)
+
+# V5 keys renamed by scripts/migrate_sheet_keys.py: current path -> path on sheets not migrated yet.
+# The old names are accepted in expressions too.
+_V5_LEGACY: Dict[Path, Path] = {
+    ("atributos", "sociais", "autocontrole"): ("atributos", "sociais", "compostura"),
+    ("habilidades", "ladroagem"): ("habilidades", "furto"),
+    ("habilidades", "sagacidade"): ("habilidades", "perspicacia"),
+    ("habilidades", "erudicao"): ("habilidades", "academicos"),
+    ("habilidades", "percepcao"): ("habilidades", "consciencia"),
+    ("habilidades", "oficios"): ("habilidades", "oficio"),
+}
+
+_V20_SKILLS = {
+    "talentos": (
+        "prontidao", "atletismo", "briga", "consciencia", "empatia", "expressao", "intimidacao",
+        "lideranca", "manha", "labia",
+    ),
+    "pericias": (
+        "empatiaComAnimais", "oficios", "conducao", "etiqueta", "armasDeFogo", "armasBrancas",
+        "performance", "seguranca", "furtividade", "sobrevivencia",
+    ),
+    "conhecimentos": (
+        "academicos", "computador", "financas", "investigacao", "direito", "linguistica", "medicina",
+        "ocultismo", "politica", "ciencia",
+    ),
+}
+
+_TOKEN = re.compile(r"\s*(?:(\d+)|([^\W\d][\w.]*)|([+-]))", re.UNICODE)
+
+
+class ExpressionError(ValueError):
+    """The expression cannot be parsed or does not fit the edition"""
+
+
+def normalize(name: str) -> str:
+    """Lowercase without accents, so sheet keys and typed names compare equal"""
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def _layout(game_version: str) -> Dict[str, Path]:
+    """Normalized trait name -> sheet path for one edition"""
+    paths: Dict[str, Path] = {}
+    for group, names in _ATTRIBUTES[game_version].items():
+        for name in names:
+            paths[name] = ("atributos", group, name)
+    if game_version == "v5":
+        for name in _V5_SKILLS:
+            paths[normalize(name)] = ("habilidades", name)
+        paths.update({
+            "fome": ("fome",),
+            "humanidade": ("humanidade",),
+            "potenciadesangue": ("potenciaDeSangue",),
+            "forcadevontade": ("forcaDeVontade", "max"),
+        })
+        for current, legacy in _V5_LEGACY.items():
+            paths.setdefault(normalize(legacy[-1]), current)
+    else:
+        for group, names in _V20_SKILLS.items():
+            for name in names:
+                paths[normalize(name)] = ("habilidades", group, name)
+        for virtue in ("consciencia", "autocontrole", "coragem"):
+            # Consciencia is also a talent; the virtue needs its full path
+            paths.setdefault(virtue, ("virtudes", virtue))
+        paths.update({
+            "humanidade": ("humanidade",),
+            "forcadevontade": ("forcaDeVontade", "permanente"),
+            "sangue": ("pontoDeSangue", "atual"),
+        })
+    return paths
+
+
+LAYOUTS: Dict[str, Dict[str, Path]] = {version: _layout(version) for version in ("v5", "v20")}
+
+
+def _as_int(value: Any) -> int:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    return 0
+
+
+@dataclass(frozen=True)
+class Term:
+    label: str
+    sign: int
+    path: Optional[Path] = None  # None: a Discipline looked up by name
+
+    dotted: bool = False  # The path was typed, not taken from the layout
+
+    def value(self, sheet: dict) -> int:
+        if self.path is None:
+            level = _discipline_level(sheet, self.label)
+            if level is None:
+                raise ExpressionError(f"Caracteristica ou disciplina desconhecida: '{self.label}'")
+            return level
+        node = _lookup(sheet, self.path)
+        if node is None and self.path in _V5_LEGACY:
+            node = _lookup(sheet, _V5_LEGACY[self.path])
+        if node is None and self.dotted:
+            raise ExpressionError(f"Caminho inexistente na ficha: '{self.label}'")
+        return _as_int(node)
+
+
+def _lookup(sheet: dict, path: Path) -> Any:
+    node: Any = sheet
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
+def _discipline_level(sheet: dict, name: str) -> Optional[int]:
+    """
+    Discipline rating by name, None if the character does not have it.
+    Sheets store Disciplines either as {"potencia": 2} or as slots
+    {"disciplina1": {"nome": "Potencia", "nivel": 2}}.
+    """
+    disciplines = sheet.get("disciplinas")
+    if not isinstance(disciplines, dict):
+        return None
+    for key, entry in disciplines.items():
+        if isinstance(entry, dict):
+            if normalize(str(entry.get("nome", ""))) == name:
+                return _as_int(entry.get("nivel"))
+        elif normalize(key) == name:
+            return _as_int(entry)
+    return None
+
+
+@dataclass(frozen=True)
+class PoolPlan:
+    """A compiled sum of terms; shared from the cache, so immutable"""
+    terms: Tuple[Term, ...]
+    constant: int
+
+    def resolve(self, sheet: dict, breakdown: List[Tuple[str, int]]) -> int:
+        total = self.constant
+        for term in self.terms:
+            value = term.value(sheet)
+            breakdown.append((term.label, term.sign * value))
+            total += term.sign * value
+        if self.constant:
+            breakdown.append(("modificador", self.constant))
+        return total
+
+
+@dataclass(frozen=True)
+class ResolvedPool:
+    pool: int
+    hunger: int
+    breakdown: Tuple[Tuple[str, int], ...]
+
+    def to_dict(self) -> dict:
+        return {"pool": self.pool, "hunger": self.hunger, "breakdown": [list(b) for b in self.breakdown]}
+
+
+@dataclass(frozen=True)
+class DicePlan:
+    expression: str
+    game_version: str
+    pool: PoolPlan
+    hunger: Optional[PoolPlan]
+
+    def resolve(self, sheet: dict) -> ResolvedPool:
+        """Pool (at least 1) and Hunger (0-5, at most the pool) for one sheet"""
+        breakdown: List[Tuple[str, int]] = []
+        pool = max(1, self.pool.resolve(sheet or {}, breakdown))
+        hunger = 0
+        if self.hunger is not None:
+            hunger = min(max(0, self.hunger.resolve(sheet or {}, breakdown)), 5, pool)
+        return ResolvedPool(pool, hunger, tuple(breakdown))
+
+
+def _compile_sum(text: str, layout: Dict[str, Path]) -> PoolPlan:
+    terms: List[Term] = []
+    constant = 0
+    sign = 1
+    expect_operand = True
+    pos = 0
+    text = text.strip()
+    if not text:
+        raise ExpressionError("Expressao vazia")
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise ExpressionError(f"Caractere invalido na posicao {pos + 1}: '{text[pos]}'")
+        number, name, operator = match.groups()
+        pos = match.end()
+        if operator:
+            if expect_operand:
+                raise ExpressionError(f"Operador '{operator}' sem valor")
+            sign = 1 if operator == "+" else -1
+            expect_operand = True
+            continue
+        if not expect_operand:
+            raise ExpressionError(f"Falta um operador antes de '{number or name}'")
+        if number:
+            constant += sign * int(number)
+        elif "." in name:
+            terms.append(Term(name, sign, tuple(name.split(".")), dotted=True))
+        else:
+            key = normalize(name)
+            terms.append(Term(key, sign, layout.get(key)))
+        expect_operand = False
+    if expect_operand:
+        raise ExpressionError("Expressao termina com um operador")
+    return PoolPlan(tuple(terms), constant)
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression: str, game_version: str = "v5") -> DicePlan:
+    """
+    Compile an expression for one edition's sheet layout.
+
+    Raises:
+        ExpressionError: On syntax errors, or a Hunger part on V20. Unknown
+            Disciplines and missing dotted paths raise when the plan is resolved.
+    """
+    if game_version not in LAYOUTS:
+        raise ExpressionError(f"Versao de jogo desconhecida: {game_version}")
+    parts = expression.split(",")
+    if len(parts) > 2:
+        raise ExpressionError("Use no maximo uma virgula: 'parada, fome'")
+    if len(parts) == 2 and game_version != "v5":
+        raise ExpressionError("Fome so existe em V5")
+    layout = LAYOUTS[game_version]
+    pool = _compile_sum(parts[0], layout)
+    hunger = _compile_sum(parts[1], layout) if len(parts) == 2 else None
+    return DicePlan(expression, game_version, pool, hunger)
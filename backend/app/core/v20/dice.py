@@ -1,7 +1,9 @@
-import random
 from dataclasses import dataclass
 from enum import Enum
-from typing import List
+from typing import List, Optional, Tuple, Union
+
+from ..entropy import DiceSource, dice_sources
+from ..v5.dice import face_counts
 
 
 class V20RollResult(Enum):
@@ -22,6 +24,37 @@ class V20DiceRoll:
     result_type: V20RollResult
 
 
+@dataclass(slots=True)
+class V20CompactRoll:
+    """
+    A V20 roll without the individual dice: how many dice showed each face.
+    counts[i] / reroll_counts[i] = dice (specialty rerolls) that rolled i + 1.
+    """
+    counts: Tuple[int, ...]
+    reroll_counts: Tuple[int, ...]
+    difficulty: int
+    successes: int
+    ones: int
+    tens: int
+    result_type: V20RollResult
+
+    @property
+    def pool(self) -> int:
+        return sum(self.counts)
+
+    @classmethod
+    def from_roll(cls, roll: V20DiceRoll) -> "V20CompactRoll":
+        return cls(
+            counts=face_counts(roll.dice),
+            reroll_counts=face_counts(roll.specialty_rerolls),
+            difficulty=roll.difficulty,
+            successes=roll.successes,
+            ones=roll.ones,
+            tens=roll.tens,
+            result_type=roll.result_type,
+        )
+
+
 class V20DiceRoller:
     """
     V20 Dice Mechanics:
@@ -38,8 +71,10 @@ class V20DiceRoller:
         pool: int,
         difficulty: int = 6,
         specialty: bool = False,
-        willpower: bool = False
-    ) -> V20DiceRoll:
+        willpower: bool = False,
+        source: Optional[DiceSource] = None,
+        compact: bool = False
+    ) -> Union[V20DiceRoll, V20CompactRoll]:
         """
         Roll a V20 dice pool.
 
@@ -48,32 +83,61 @@ class V20DiceRoller:
             difficulty: Target number (usually 6)
             specialty: If character has relevant specialty (10s reroll)
             willpower: If spending Willpower for automatic success
+            source: Dice source (defaults to the shared one)
+            compact: Return face counts instead of the individual dice
 
         Returns:
-            V20DiceRoll with all results
+            V20DiceRoll with all results (V20CompactRoll if compact)
         """
         if pool <= 0:
             pool = 1
 
         difficulty = max(2, min(10, difficulty))  # Clamp difficulty 2-10
 
+        source = source or dice_sources.default
+
         # Roll initial dice
-        dice = [random.randint(1, 10) for _ in range(pool)]
+        dice = source.roll(pool)
+
+        # Specialty rerolls for 10s
+        specialty_rerolls = []
+        if specialty:
+            specialty_rerolls = source.roll(dice.count(10))
+
+        roll = V20DiceRoller.from_dice(dice, difficulty, specialty_rerolls, willpower)
+        return V20CompactRoll.from_roll(roll) if compact else roll
+
+    @staticmethod
+    def from_dice(
+        dice: List[int],
+        difficulty: int = 6,
+        specialty_rerolls: List[int] = None,
+        willpower: bool = False
+    ) -> V20DiceRoll:
+        """
+        Score dice that were already rolled.
+
+        Args:
+            dice: Faces of the initial roll
+            difficulty: Target number, already clamped to 2-10
+            specialty_rerolls: Faces rerolled for 10s under a specialty
+            willpower: If spending Willpower for automatic success
+
+        Returns:
+            V20DiceRoll with all results
+        """
+        specialty_rerolls = specialty_rerolls or []
 
         # Count results
         ones = sum(1 for d in dice if d == 1)
         tens = sum(1 for d in dice if d == 10)
         successes = sum(1 for d in dice if d >= difficulty)
 
-        # Specialty rerolls for 10s
-        specialty_rerolls = []
-        if specialty and tens > 0:
-            specialty_rerolls = [random.randint(1, 10) for _ in range(tens)]
-            for reroll in specialty_rerolls:
-                if reroll >= difficulty:
-                    successes += 1
-                if reroll == 1:
-                    ones += 1
+        for reroll in specialty_rerolls:
+            if reroll >= difficulty:
+                successes += 1
+            if reroll == 1:
+                ones += 1
 
         # Add Willpower automatic success
         if willpower:
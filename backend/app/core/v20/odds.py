@@ -0,0 +1,134 @@
+"""
+Exact V20 roll probabilities.
+
+Dice are folded one at a time into integer outcome counts keyed by
+(successes, ones), following V20DiceRoller.roll:
+
+- 1 adds a one; faces below the difficulty do nothing; faces at or
+  above it add a success
+- with a specialty every 10 is rerolled once, and the reroll can add a
+  success or a one of its own, so a die has 100 equally weighted
+  outcomes instead of 10
+
+Willpower, cancellation by 1s and the botch rule are applied to the
+final table. Results are cached in an LRU keyed by
+(pool, difficulty, specialty, willpower).
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from .dice import V20RollResult
+
+MAX_POOL = 30
+
+# (successes, ones) -> outcome count
+CountTable = Dict[Tuple[int, int], int]
+
+
+@dataclass(frozen=True)
+class V20Odds:
+    """Exact outcome distribution of one V20 roll (shared from the cache; do not mutate)"""
+    pool: int
+    difficulty: int
+    specialty: bool
+    willpower: bool
+    successes: Tuple[float, ...]  # successes[k] = P(k net successes); failures and botches count as 0
+    results: Dict[str, float]  # V20RollResult value -> probability
+    success_chance: float
+    expected_successes: float
+
+    def to_dict(self) -> dict:
+        return {
+            "pool": self.pool,
+            "difficulty": self.difficulty,
+            "specialty": self.specialty,
+            "willpower": self.willpower,
+            "successes": {k: p for k, p in enumerate(self.successes) if p},
+            "results": dict(self.results),
+            "botch_chance": self.results[V20RollResult.BOTCH.value],
+            "exceptional_chance": self.results[V20RollResult.EXCEPTIONAL.value],
+            "success_chance": self.success_chance,
+            "expected_successes": self.expected_successes,
+        }
+
+
+def _die_outcomes(difficulty: int, specialty: bool) -> Tuple[Tuple[int, int, int], ...]:
+    """(successes, ones, weight) of a single die; weights sum to 10, or 100 with a specialty"""
+    scale = 10 if specialty else 1
+    outcomes = [
+        (0, 1, scale),  # 1
+        (0, 0, (difficulty - 2) * scale),  # 2 .. difficulty-1
+        (1, 0, (10 - difficulty) * scale),  # difficulty .. 9
+    ]
+    if specialty:
+        # The 10 is a success and is rerolled once
+        outcomes += [
+            (1, 1, 1),  # reroll 1
+            (1, 0, difficulty - 2),  # reroll below difficulty
+            (2, 0, 11 - difficulty),  # reroll at or above difficulty, 10 included
+        ]
+    else:
+        outcomes.append((1, 0, 1))  # 10
+    return tuple(o for o in outcomes if o[2])
+
+
+@lru_cache(maxsize=None)
+def count_table(pool: int, difficulty: int, specialty: bool) -> CountTable:
+    """Outcome counts of `pool` dice by (successes, ones), before Willpower and cancellation"""
+    if pool == 0:
+        return {(0, 0): 1}
+    table: CountTable = {}
+    outcomes = _die_outcomes(difficulty, specialty)
+    for (s, o), n in count_table(pool - 1, difficulty, specialty).items():
+        for ds, do, weight in outcomes:
+            key = (s + ds, o + do)
+            table[key] = table.get(key, 0) + n * weight
+    return table
+
+
+@lru_cache(maxsize=4096)
+def v20_odds(pool: int, difficulty: int = 6, specialty: bool = False, willpower: bool = False) -> V20Odds:
+    """
+    Exact odds of a V20 roll.
+
+    Args:
+        pool: Number of dice
+        difficulty: Target number (clamped to 2-10 like the roller)
+        specialty: If 10s are rerolled
+        willpower: If Willpower adds an automatic success
+
+    Returns:
+        V20Odds with the net successes and result type distributions
+    """
+    pool = max(1, pool)
+    difficulty = max(2, min(10, difficulty))
+    total = (100 if specialty else 10) ** pool
+
+    by_successes: Dict[int, int] = {}
+    by_result = {result.value: 0 for result in V20RollResult}
+    for (successes, ones), n in count_table(pool, difficulty, specialty).items():
+        successes += 1 if willpower else 0
+        net = successes - ones
+        if net <= 0:
+            result = V20RollResult.BOTCH if ones > 0 and successes == 0 else V20RollResult.FAILURE
+            net = 0
+        elif net >= 5:
+            result = V20RollResult.EXCEPTIONAL
+        else:
+            result = V20RollResult.SUCCESS
+        by_result[result.value] += n
+        by_successes[net] = by_successes.get(net, 0) + n
+
+    most = max(by_successes)
+    passed = by_result[V20RollResult.SUCCESS.value] + by_result[V20RollResult.EXCEPTIONAL.value]
+    return V20Odds(
+        pool=pool,
+        difficulty=difficulty,
+        specialty=specialty,
+        willpower=willpower,
+        successes=tuple(by_successes.get(k, 0) / total for k in range(most + 1)),
+        results={name: n / total for name, n in by_result.items()},
+        success_chance=passed / total,
+        expected_successes=sum(k * n for k, n in by_successes.items()) / total,
+    )
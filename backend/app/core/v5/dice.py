@@ -1,7 +1,8 @@
-import random
 from dataclasses import dataclass
 from enum import Enum
-from typing import List, Tuple
+from typing import List, Optional, Tuple, Union
+
+from ..entropy import DiceSource, dice_sources
 
 
 class V5RollResult(Enum):
@@ -26,6 +27,55 @@ class V5DiceRoll:
     margin: int
 
 
+@dataclass(slots=True)
+class V5CompactRoll:
+    """
+    A V5 roll without the individual dice: how many dice showed each face.
+    regular_counts[i] / hunger_counts[i] = dice that rolled i + 1.
+    """
+    regular_counts: Tuple[int, ...]
+    hunger_counts: Tuple[int, ...]
+    difficulty: int
+    successes: int
+    regular_tens: int
+    hunger_tens: int
+    hunger_ones: int
+    critical_pairs: int
+    result_type: V5RollResult
+    margin: int
+
+    @property
+    def pool(self) -> int:
+        return sum(self.regular_counts) + sum(self.hunger_counts)
+
+    @property
+    def hunger(self) -> int:
+        return sum(self.hunger_counts)
+
+    @classmethod
+    def from_roll(cls, roll: V5DiceRoll) -> "V5CompactRoll":
+        return cls(
+            regular_counts=face_counts(roll.regular_dice),
+            hunger_counts=face_counts(roll.hunger_dice),
+            difficulty=roll.difficulty,
+            successes=roll.successes,
+            regular_tens=roll.regular_tens,
+            hunger_tens=roll.hunger_tens,
+            hunger_ones=roll.hunger_ones,
+            critical_pairs=roll.critical_pairs,
+            result_type=roll.result_type,
+            margin=roll.margin,
+        )
+
+
+def face_counts(dice: List[int]) -> Tuple[int, ...]:
+    """Ten counts: how many of the dice rolled 1, 2, ... 10"""
+    counts = [0] * 10
+    for face in dice:
+        counts[face - 1] += 1
+    return tuple(counts)
+
+
 class V5DiceRoller:
     """
     V5 Dice Mechanics:
@@ -37,7 +87,13 @@ class V5DiceRoller:
     """
 
     @staticmethod
-    def roll(pool: int, hunger: int = 0, difficulty: int = 1) -> V5DiceRoll:
+    def roll(
+        pool: int,
+        hunger: int = 0,
+        difficulty: int = 1,
+        source: Optional[DiceSource] = None,
+        compact: bool = False
+    ) -> Union[V5DiceRoll, V5CompactRoll]:
         """
         Roll a V5 dice pool.
 
@@ -45,9 +101,11 @@ class V5DiceRoller:
             pool: Total number of dice to roll
             hunger: Number of dice that are Hunger Dice (max = pool)
             difficulty: Number of successes needed
+            source: Dice source (defaults to the shared one)
+            compact: Return face counts instead of the individual dice
 
         Returns:
-            V5DiceRoll with all results
+            V5DiceRoll with all results (V5CompactRoll if compact)
         """
         if pool <= 0:
             pool = 1
@@ -56,9 +114,26 @@ class V5DiceRoller:
         regular_count = pool - hunger
 
         # Roll the dice
-        regular_dice = [random.randint(1, 10) for _ in range(regular_count)]
-        hunger_dice = [random.randint(1, 10) for _ in range(hunger)]
+        dice = (source or dice_sources.default).roll(pool)
+        regular_dice = dice[:regular_count]
+        hunger_dice = dice[regular_count:]
+
+        roll = V5DiceRoller.from_dice(regular_dice, hunger_dice, difficulty)
+        return V5CompactRoll.from_roll(roll) if compact else roll
+
+    @staticmethod
+    def from_dice(regular_dice: List[int], hunger_dice: List[int], difficulty: int = 1) -> V5DiceRoll:
+        """
+        Score dice that were already rolled.
+
+        Args:
+            regular_dice: Faces of the regular dice
+            hunger_dice: Faces of the Hunger dice
+            difficulty: Number of successes needed
 
+        Returns:
+            V5DiceRoll with all results
+        """
         # Count basic successes (6+)
         regular_successes = sum(1 for d in regular_dice if d >= 6)
         hunger_successes = sum(1 for d in hunger_dice if d >= 6)
@@ -105,22 +180,24 @@ class V5DiceRoller:
         )
 
     @staticmethod
-    def rouse_check(reroll: bool = False) -> Tuple[bool, List[int]]:
+    def rouse_check(reroll: bool = False, source: Optional[DiceSource] = None) -> Tuple[bool, List[int]]:
         """
         Rouse Check: 1d10, 6+ = success (no Hunger gain)
         Blood Potency allows reroll on fail
 
         Args:
             reroll: Whether to reroll on failure (Blood Potency bonus)
+            source: Dice source (defaults to the shared one)
 
         Returns:
             Tuple of (success, list of dice rolled)
         """
-        dice = [random.randint(1, 10)]
+        source = source or dice_sources.default
+        dice = [source.d10()]
         success = dice[0] >= 6
 
         if not success and reroll:
-            reroll_die = random.randint(1, 10)
+            reroll_die = source.d10()
             dice.append(reroll_die)
             success = reroll_die >= 6
 
@@ -0,0 +1,140 @@
+"""
+Exact V5 roll probabilities.
+
+Every d10 outcome is equally likely, so a pool of N dice has 10^N equally
+weighted outcomes. Instead of enumerating them we fold the dice one at a
+time into a table of integer outcome counts keyed by what the scoring in
+V5DiceRoller.roll cares about:
+
+- regular die: 1-5 fail (5 faces), 6-9 success (4), 10 (1)
+- hunger die: 1 (1 face), 2-5 fail (4), 6-9 success (4), 10 (1)
+
+The result is exact (integer counts divided by 10^N at the very end).
+Tables are memoized per (pool, hunger) and the odds per
+(pool, hunger, difficulty), and the common range is precomputed at startup.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from .dice import V5RollResult
+
+# (total successes, has a critical pair, has a hunger 10, has a hunger 1) -> outcome count
+JointTable = Dict[Tuple[int, bool, bool, bool], int]
+
+MAX_POOL = 30
+MAX_HUNGER = 5
+
+
+@dataclass(frozen=True)
+class V5Odds:
+    """Exact outcome distribution of one V5 roll (shared from the cache; do not mutate)"""
+    pool: int
+    hunger: int
+    difficulty: int
+    successes: Tuple[float, ...]  # successes[k] = P(exactly k successes)
+    results: Dict[str, float]  # V5RollResult value -> probability
+    success_chance: float
+    expected_successes: float
+
+    def to_dict(self) -> dict:
+        return {
+            "pool": self.pool,
+            "hunger": self.hunger,
+            "difficulty": self.difficulty,
+            "successes": {k: p for k, p in enumerate(self.successes) if p},
+            "results": dict(self.results),
+            "success_chance": self.success_chance,
+            "expected_successes": self.expected_successes,
+        }
+
+
+@lru_cache(maxsize=None)
+def _dice_counts(regular: int, hunger: int) -> Dict[Tuple[int, int, bool, bool], int]:
+    """Outcome counts by (non-ten successes, tens, hunger ten seen, hunger one seen)"""
+    if regular == 0 and hunger == 0:
+        return {(0, 0, False, False): 1}
+
+    counts: Dict[Tuple[int, int, bool, bool], int] = {}
+
+    def add(key, weight):
+        counts[key] = counts.get(key, 0) + weight
+
+    if hunger > 0:
+        # Add one hunger die to the table for one fewer
+        for (s, t, h10, h1), n in _dice_counts(regular, hunger - 1).items():
+            add((s, t, h10, True), n)  # 1
+            add((s, t, h10, h1), n * 4)  # 2-5
+            add((s + 1, t, h10, h1), n * 4)  # 6-9
+            add((s, t + 1, True, h1), n)  # 10
+    else:
+        for (s, t, h10, h1), n in _dice_counts(regular - 1, 0).items():
+            add((s, t, h10, h1), n * 5)  # 1-5
+            add((s + 1, t, h10, h1), n * 4)  # 6-9
+            add((s, t + 1, h10, h1), n)  # 10
+    return counts
+
+
+@lru_cache(maxsize=None)
+def joint_table(pool: int, hunger: int) -> JointTable:
+    """Outcome counts of a pool, reduced to what decides successes and result type"""
+    pool = max(1, pool)
+    hunger = min(max(0, hunger), pool)
+    table: JointTable = {}
+    for (s, t, h10, h1), n in _dice_counts(pool - hunger, hunger).items():
+        pairs = t // 2
+        key = (s + t + pairs * 2, pairs > 0, h10, h1)
+        table[key] = table.get(key, 0) + n
+    return table
+
+
+@lru_cache(maxsize=None)
+def v5_odds(pool: int, hunger: int = 0, difficulty: int = 1) -> V5Odds:
+    """
+    Exact odds of a V5 roll.
+
+    Args:
+        pool: Total number of dice
+        hunger: Hunger dice among them (capped at pool)
+        difficulty: Successes needed
+
+    Returns:
+        V5Odds with the successes and result type distributions
+    """
+    pool = max(1, pool)
+    hunger = min(max(0, hunger), pool)
+    total = 10 ** pool
+
+    by_successes: Dict[int, int] = {}
+    by_result = {result.value: 0 for result in V5RollResult}
+    for (successes, critical, hunger_ten, hunger_one), n in joint_table(pool, hunger).items():
+        by_successes[successes] = by_successes.get(successes, 0) + n
+        if successes >= difficulty:
+            if critical:
+                result = V5RollResult.MESSY_CRITICAL if hunger_ten else V5RollResult.CRITICAL
+            else:
+                result = V5RollResult.SUCCESS
+        else:
+            result = V5RollResult.BESTIAL_FAILURE if hunger_one else V5RollResult.FAILURE
+        by_result[result.value] += n
+
+    most = max(by_successes)
+    successes = tuple(by_successes.get(k, 0) / total for k in range(most + 1))
+    passed = sum(n for k, n in by_successes.items() if k >= difficulty)
+    return V5Odds(
+        pool=pool,
+        hunger=hunger,
+        difficulty=difficulty,
+        successes=successes,
+        results={name: n / total for name, n in by_result.items()},
+        success_chance=passed / total,
+        expected_successes=sum(k * n for k, n in by_successes.items()) / total,
+    )
+
+
+def precompute_v5_odds(max_pool: int = 20, max_difficulty: int = 10):
+    """Warm the cache for the pools, hunger and difficulties players actually roll"""
+    for pool in range(1, max_pool + 1):
+        for hunger in range(0, min(pool, MAX_HUNGER) + 1):
+            for difficulty in range(1, max_difficulty + 1):
+                v5_odds(pool, hunger, difficulty)
@@ -31,7 +31,7 @@ class RouseChecker:
             RouseCheckResult with all details
         """
         # Blood Potency determines number of allowed rerolls
-        from ..v5 import BLOOD_POTENCY_TABLE
+        from ...game_data.v5.blood_potency import BLOOD_POTENCY_TABLE
         bp_info = BLOOD_POTENCY_TABLE.get(blood_potency)
         can_reroll = bp_info.rouse_reroll > 0 if bp_info else False
 
@@ -0,0 +1,156 @@
+"""
+Willpower reroll advice for V5.
+
+Spending Willpower rerolls up to three regular dice (never Hunger dice).
+For scoring, a regular die is a failure (1-5), a success (6-9) or a 10, so
+a choice is how many dice of each kind to reroll: at most 20 options.
+
+What the rerolled dice can add only depends on how many are rerolled and
+on the 10s that are kept (none, one, or two or more; and whether one of
+them is unpaired). REROLL_TABLE holds, for each of those cases and each
+number of successes still missing, the exact number of reroll outcomes
+that succeed and that succeed with a critical. It is built once at
+import, so weighing an option is a single lookup.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import product
+from typing import Dict, List, Tuple
+
+MAX_REROLL = 3
+OUTCOMES = 10 ** MAX_REROLL  # Table counts are out of this many outcomes, whatever the dice rerolled
+
+# Most successes a reroll can add: three 10s next to an unpaired kept 10
+_MAX_GAIN = MAX_REROLL + 2 * ((1 + MAX_REROLL) // 2)
+
+# (dice rerolled, kept 10s capped at 2, kept 10s odd, successes missing) -> (succeed, critical) counts
+RerollTable = Dict[Tuple[int, int, bool, int], Tuple[int, int]]
+
+
+def _build_table() -> RerollTable:
+    table: RerollTable = {}
+    for rerolled in range(MAX_REROLL + 1):
+        weight = 10 ** (MAX_REROLL - rerolled)
+        # Rerolled dice outcomes by (non-ten successes, tens)
+        outcomes: Dict[Tuple[int, int], int] = {}
+        for faces in product(range(1, 11), repeat=rerolled):
+            key = (sum(1 for f in faces if 6 <= f <= 9), faces.count(10))
+            outcomes[key] = outcomes.get(key, 0) + weight
+
+        for kept_tens, odd in ((0, False), (1, True), (2, False), (2, True)):
+            for missing in range(_MAX_GAIN + 1):
+                succeed = critical = 0
+                for (successes, tens), n in outcomes.items():
+                    gain = successes + tens + 2 * ((odd + tens) // 2)
+                    if gain >= missing:
+                        succeed += n
+                        if kept_tens + tens >= 2:
+                            critical += n
+                table[(rerolled, kept_tens, odd, missing)] = (succeed, critical)
+    return table
+
+
+REROLL_TABLE = _build_table()
+
+
+@dataclass(frozen=True)
+class RerollAdvice:
+    """Best Willpower reroll for one V5 roll"""
+    reroll: Tuple[int, ...]  # Indices into regular_dice; empty when rerolling cannot help
+    success_chance: float
+    critical_chance: float
+    messy_critical_chance: float
+    bestial_failure_chance: float
+
+    def to_dict(self) -> dict:
+        return {
+            "reroll": list(self.reroll),
+            "success_chance": self.success_chance,
+            "critical_chance": self.critical_chance,
+            "messy_critical_chance": self.messy_critical_chance,
+            "bestial_failure_chance": self.bestial_failure_chance,
+        }
+
+
+def _chances(rerolled: int, successes: int, tens: int, difficulty: int) -> Tuple[int, int]:
+    """(succeed, critical) outcome counts when the kept dice hold `successes` non-ten successes and `tens` 10s"""
+    missing = difficulty - (successes + tens + 2 * (tens // 2))
+    if missing > _MAX_GAIN:
+        return 0, 0
+    return REROLL_TABLE[(rerolled, min(tens, 2), tens % 2 == 1, max(0, missing))]
+
+
+@lru_cache(maxsize=4096)
+def _best_option(
+    failures: int, successes: int, tens: int, hunger_successes: int, hunger_tens: int, difficulty: int, goal: str
+) -> Tuple[int, int, int, int, int]:
+    """(failures, successes, tens) to reroll and the (succeed, critical) counts they give"""
+    best_key, best = None, None
+    for ten_rerolls in range(min(tens, MAX_REROLL) + 1):
+        for success_rerolls in range(min(successes, MAX_REROLL - ten_rerolls) + 1):
+            for failure_rerolls in range(min(failures, MAX_REROLL - ten_rerolls - success_rerolls) + 1):
+                rerolled = ten_rerolls + success_rerolls + failure_rerolls
+                succeed, critical = _chances(
+                    rerolled,
+                    successes - success_rerolls + hunger_successes,
+                    tens - ten_rerolls + hunger_tens,
+                    difficulty,
+                )
+                # Exact integer counts, so ties are real ties
+                if goal == "critical":
+                    key = (critical, succeed, -rerolled)
+                else:
+                    key = (succeed, -rerolled, critical)
+                if best_key is None or key > best_key:
+                    best_key = key
+                    best = (failure_rerolls, success_rerolls, ten_rerolls, succeed, critical)
+    return best
+
+
+def best_reroll(
+    regular_dice: List[int],
+    hunger_dice: List[int],
+    difficulty: int = 1,
+    goal: str = "success",
+) -> RerollAdvice:
+    """
+    Pick the regular dice to reroll with Willpower.
+
+    Args:
+        regular_dice: Faces of the regular dice
+        hunger_dice: Faces of the Hunger dice (never rerolled)
+        difficulty: Successes needed
+        goal: "success" to maximize the chance of meeting difficulty (ties go
+            to fewer dice, then to a better critical chance), "critical" to
+            maximize the chance of a critical success
+
+    Returns:
+        RerollAdvice
+    """
+    by_kind: Dict[str, List[int]] = {"failure": [], "success": [], "ten": []}
+    for index, face in enumerate(regular_dice):
+        by_kind["ten" if face == 10 else "success" if face >= 6 else "failure"].append(index)
+    hunger_tens = hunger_dice.count(10)
+
+    failure_rerolls, success_rerolls, ten_rerolls, succeed, critical = _best_option(
+        len(by_kind["failure"]),
+        len(by_kind["success"]),
+        len(by_kind["ten"]),
+        sum(1 for d in hunger_dice if 6 <= d <= 9),
+        hunger_tens,
+        difficulty,
+        goal,
+    )
+    reroll = (
+        by_kind["failure"][:failure_rerolls]
+        + by_kind["success"][:success_rerolls]
+        + by_kind["ten"][:ten_rerolls]
+    )
+    return RerollAdvice(
+        reroll=tuple(sorted(reroll)),
+        success_chance=succeed / OUTCOMES,
+        critical_chance=critical / OUTCOMES,
+        # Hunger dice are kept: any Hunger 10 makes a critical messy, any Hunger 1 makes a failure bestial
+        messy_critical_chance=critical / OUTCOMES if hunger_tens else 0.0,
+        bestial_failure_chance=(OUTCOMES - succeed) / OUTCOMES if 1 in hunger_dice else 0.0,
+    )
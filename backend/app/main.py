@@ -3,7 +3,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from .config import settings
-from .database import init_db
+from .database import init_db, async_session_maker
+from .core.v5.odds import precompute_v5_odds
+from .services.session_registry import session_registry
+from .services.simulation import simulation_service
+from .services.write_behind import chat_writer, dice_writer
 from .api import auth, users, chronicles, characters, dice, scenes, game_data, websocket, xp, sessions, chat, initiative
 
 
@@ -12,9 +16,19 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup
     await init_db()
+    precompute_v5_odds(settings.DICE_ODDS_PRECOMPUTE_POOL)
+    await websocket.manager.start()
+    session_registry.attach(websocket.manager.backplane)
+    async with async_session_maker() as db:
+        await session_registry.warm(db)
+    chat_writer.start()
+    dice_writer.start()
     yield
     # Shutdown
-    pass
+    await websocket.manager.stop()
+    await chat_writer.stop()
+    await dice_writer.stop()
+    simulation_service.shutdown()
 
 
 app = FastAPI(
@@ -3,6 +3,7 @@ from .chronicle import Chronicle, ChronicleMember
 from .character import Character
 from .scene import Scene
 from .dice_roll import DiceRoll
+from .dice_stats import DiceStats
 from .xp_request import XPRequest
 from .xp_log import XPLog
 from .game_session import GameSession
@@ -18,6 +19,7 @@ __all__ = [
     "Character",
     "Scene",
     "DiceRoll",
+    "DiceStats",
     "XPRequest",
     "XPLog",
     "GameSession",
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Integer, Boolean, DateTime, ForeignKey, JSON, func
+from sqlalchemy import Column, String, Text, Integer, Boolean, DateTime, ForeignKey, JSON, Index, func
 from sqlalchemy.orm import relationship
 import uuid
 
@@ -11,11 +11,16 @@ def generate_uuid():
 
 class DiceRoll(Base):
     __tablename__ = "dice_rolls"
+    __table_args__ = (
+        # Roll history is read newest-first per chronicle with a (created_at, id) cursor
+        Index("ix_dice_rolls_chronicle_created_id", "chronicle_id", "created_at", "id"),
+    )
 
     id = Column(String(36), primary_key=True, default=generate_uuid)
 
     # Relations
     chronicle_id = Column(String(36), ForeignKey("chronicles.id", ondelete="CASCADE"), nullable=True)
+    session_id = Column(String(36), ForeignKey("game_sessions.id", ondelete="SET NULL"), nullable=True)
     character_id = Column(String(36), ForeignKey("characters.id", ondelete="SET NULL"), nullable=True)
     roller_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, func
+
+from ..database import Base
+
+
+class DiceStats(Base):
+    """
+    Running roll statistics for one scope of a chronicle.
+
+    One row per (chronicle, character or all, session or all), so every
+    stats question is a primary-key lookup. Maintained by the dice roll
+    writer as rolls are inserted.
+    """
+    __tablename__ = "dice_stats"
+
+    # "<chronicle_id>|<character_id or *>|<session_id or *>"
+    key = Column(String(120), primary_key=True)
+    chronicle_id = Column(String(36), ForeignKey("chronicles.id", ondelete="CASCADE"), nullable=False, index=True)
+    character_id = Column(String(36), ForeignKey("characters.id", ondelete="CASCADE"), nullable=True)
+    session_id = Column(String(36), ForeignKey("game_sessions.id", ondelete="CASCADE"), nullable=True)
+
+    rolls = Column(Integer, nullable=False, default=0)
+    successes = Column(Integer, nullable=False, default=0)
+    hunger_dice = Column(Integer, nullable=False, default=0)
+    results = Column(JSON, nullable=False, default=dict)  # result_type -> count
+    histogram = Column(JSON, nullable=False, default=dict)  # successes (as text) -> count
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<DiceStats {self.key}: {self.rolls} rolls>"
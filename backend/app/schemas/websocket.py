@@ -0,0 +1,77 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Any, Dict, List, Literal, Optional, Union
+
+
+# Inbound WebSocket frames. Unknown fields are ignored so older and newer
+# clients can share a chronicle.
+class WSMessage(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    type: str
+
+
+class WSEvent(WSMessage):
+    """Generic table event relayed with its data payload (session, XP, combat, scene)"""
+    data: Dict[str, Any] = Field(default_factory=dict)
+
+
+class WSChatPayload(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    content: Optional[str] = None
+    message_type: str = "chat"  # "chat", "action", "whisper", "ooc", "system"
+    character_id: Optional[str] = None
+    character_name: Optional[str] = None
+    recipient_id: Optional[str] = None  # For whispers
+
+
+class WSChatMessage(WSMessage):
+    data: WSChatPayload = Field(default_factory=WSChatPayload)
+    message: str = ""  # Legacy clients send the text here
+
+
+class WSSceneChange(WSMessage):
+    scene_id: Optional[str] = None
+    scene_name: Optional[str] = None
+
+
+class WSCharacterUpdate(WSMessage):
+    character_id: Optional[str] = None
+    character_name: Optional[str] = None
+    data: Any = None
+
+
+class WSTyping(WSMessage):
+    is_typing: bool = False
+
+
+class WSUpdateCharacter(WSMessage):
+    character_id: Optional[str] = None
+    character_name: Optional[str] = None
+
+
+class WSSubscription(WSMessage):
+    topics: Union[List[Any], str] = Field(default_factory=list)
+
+
+class WSRollRequest(WSMessage):
+    """Ask the server to roll; the result is broadcast as a dice_roll frame"""
+    request_id: Optional[str] = None  # Echoed back so the roller can match the result
+    game_version: Literal["v5", "v20"] = "v5"
+    roll_type: Literal["standard", "rouse"] = "standard"
+    pool: int = Field(default=1, ge=1, le=30)
+    hunger: int = Field(default=0, ge=0, le=5)
+    expression: Optional[str] = Field(default=None, max_length=200)  # "forca+briga+2, fome"; replaces pool/hunger
+    difficulty: Optional[int] = Field(default=None, ge=0, le=10)  # Defaults: 1 (V5), 6 (V20)
+    specialty: bool = False  # V20: reroll 10s
+    willpower: bool = False  # V20: automatic success
+    reroll: bool = False  # V5 rouse: Blood Potency reroll
+    description: Optional[str] = Field(default=None, max_length=500)
+    character_id: Optional[str] = None
+    character_name: Optional[str] = None
+    is_secret: bool = False
+    compact: bool = False  # Broadcast and save face counts instead of the individual dice
+
+
+class WSResume(WSMessage):
+    last_seq: int = Field(default=0, ge=0)
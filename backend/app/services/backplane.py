@@ -0,0 +1,310 @@
+"""
+Cross-process fan-out for the chronicle WebSocket hub.
+
+Each worker keeps its own sockets; the backplane carries broadcast and
+targeted messages between workers and holds the shared presence roster,
+so players connected to different uvicorn workers still see each other.
+"""
+import asyncio
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from ..utils.serialization import dumps_json, loads_json
+
+logger = logging.getLogger(__name__)
+
+# (chronicle_id, envelope) -> None
+EnvelopeHandler = Callable[[str, dict], Awaitable[None]]
+
+# (event) -> None, for process-wide state such as the active session registry
+ControlHandler = Callable[[dict], Awaitable[None]]
+
+
+class Backplane(ABC):
+    """Transport for chronicle envelopes and presence shared by all workers"""
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self._handler: Optional[EnvelopeHandler] = None
+        self._control_handlers: List[ControlHandler] = []
+
+    def attach(self, handler: EnvelopeHandler):
+        """Register the local delivery callback for incoming envelopes"""
+        self._handler = handler
+
+    def attach_control(self, handler: ControlHandler):
+        """Register a callback for control events published by any worker"""
+        self._control_handlers.append(handler)
+
+    async def _dispatch_control(self, event: dict):
+        for handler in self._control_handlers:
+            await handler(event)
+
+    async def start(self):
+        """Open connections and start listening (no-op for in-process backends)"""
+
+    async def stop(self):
+        """Stop listening and release connections"""
+
+    @abstractmethod
+    async def subscribe(self, chronicle_id: str):
+        """Start receiving envelopes for a chronicle"""
+
+    @abstractmethod
+    async def unsubscribe(self, chronicle_id: str):
+        """Stop receiving envelopes for a chronicle"""
+
+    @abstractmethod
+    async def publish(self, chronicle_id: str, envelope: dict):
+        """Deliver an envelope to every worker subscribed to the chronicle"""
+
+    @abstractmethod
+    async def next_sequence(self, chronicle_id: str) -> int:
+        """Allocate the next broadcast sequence number for a chronicle"""
+
+    @abstractmethod
+    async def current_sequence(self, chronicle_id: str) -> int:
+        """Last broadcast sequence number allocated for a chronicle"""
+
+    @abstractmethod
+    async def publish_control(self, event: dict):
+        """Deliver a control event to every worker, including this one"""
+
+    @abstractmethod
+    async def add_presence(self, chronicle_id: str, conn_id: str, info: dict) -> int:
+        """Add or replace a connection in the chronicle roster; returns the new roster version"""
+
+    @abstractmethod
+    async def remove_presence(self, chronicle_id: str, conn_id: str) -> int:
+        """Remove a connection from the chronicle roster; returns the new roster version"""
+
+    @abstractmethod
+    async def get_presence(self, chronicle_id: str) -> Tuple[int, List[dict]]:
+        """Get the roster version and entries of every worker for a chronicle"""
+
+
+class InMemoryBroker:
+    """In-process stand-in for Redis, shared by the backplanes of one process"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["InMemoryBackplane"]] = {}
+        self.presence: Dict[str, Dict[str, dict]] = {}
+        self.presence_versions: Dict[str, int] = {}
+        self.sequences: Dict[str, int] = {}
+        self.backplanes: List["InMemoryBackplane"] = []
+
+
+class InMemoryBackplane(Backplane):
+    """
+    Single-process backplane.
+
+    Several instances sharing one InMemoryBroker behave like workers behind
+    a Redis server, which is how the multi-worker paths are tested.
+    """
+
+    def __init__(self, broker: InMemoryBroker = None):
+        super().__init__()
+        self.broker = broker or InMemoryBroker()
+        self.broker.backplanes.append(self)
+
+    async def subscribe(self, chronicle_id: str):
+        self.broker.subscribers.setdefault(chronicle_id, set()).add(self)
+
+    async def unsubscribe(self, chronicle_id: str):
+        subscribers = self.broker.subscribers.get(chronicle_id)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                del self.broker.subscribers[chronicle_id]
+
+    async def publish(self, chronicle_id: str, envelope: dict):
+        for backplane in list(self.broker.subscribers.get(chronicle_id, ())):
+            if backplane._handler:
+                await backplane._handler(chronicle_id, envelope)
+
+    async def next_sequence(self, chronicle_id: str) -> int:
+        seq = self.broker.sequences.get(chronicle_id, 0) + 1
+        self.broker.sequences[chronicle_id] = seq
+        return seq
+
+    async def current_sequence(self, chronicle_id: str) -> int:
+        return self.broker.sequences.get(chronicle_id, 0)
+
+    async def publish_control(self, event: dict):
+        for backplane in list(self.broker.backplanes):
+            await backplane._dispatch_control(event)
+
+    async def add_presence(self, chronicle_id: str, conn_id: str, info: dict) -> int:
+        self.broker.presence.setdefault(chronicle_id, {})[conn_id] = info
+        return self._bump_version(chronicle_id)
+
+    async def remove_presence(self, chronicle_id: str, conn_id: str) -> int:
+        roster = self.broker.presence.get(chronicle_id)
+        if roster is not None:
+            roster.pop(conn_id, None)
+            if not roster:
+                del self.broker.presence[chronicle_id]
+        return self._bump_version(chronicle_id)
+
+    async def get_presence(self, chronicle_id: str) -> Tuple[int, List[dict]]:
+        version = self.broker.presence_versions.get(chronicle_id, 0)
+        return version, list(self.broker.presence.get(chronicle_id, {}).values())
+
+    def _bump_version(self, chronicle_id: str) -> int:
+        version = self.broker.presence_versions.get(chronicle_id, 0) + 1
+        self.broker.presence_versions[chronicle_id] = version
+        return version
+
+
+class RedisBackplane(Backplane):
+    """
+    Redis pub/sub backplane.
+
+    Envelopes go through one channel per chronicle. Presence lives in a hash
+    per chronicle, tagged with the owning worker; each worker refreshes a
+    heartbeat key so entries left behind by a crashed worker are ignored.
+    """
+
+    CHANNEL_PREFIX = "vtt:chronicle:"
+    CONTROL_CHANNEL = "vtt:control"
+    PRESENCE_PREFIX = "vtt:presence:"
+    PRESENCE_VERSION_PREFIX = "vtt:presence_version:"
+    SEQUENCE_PREFIX = "vtt:seq:"
+    WORKER_PREFIX = "vtt:worker:"
+    HEARTBEAT_TTL = 30  # seconds
+
+    def __init__(self, url: str):
+        super().__init__()
+        self.url = url
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._channels: Set[str] = set()
+
+    async def start(self):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(self.url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.CONTROL_CHANNEL)
+        await self._beat()
+        self._listener = asyncio.create_task(self._listen())
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        tasks = [task for task in (self._listener, self._heartbeat) if task]
+        for task in tasks:
+            task.cancel()
+        # Let the tasks unwind before their connections are closed
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._listener = self._heartbeat = None
+        if self._redis is not None:
+            await self._redis.delete(self.WORKER_PREFIX + self.worker_id)
+            await self._pubsub.aclose()
+            await self._redis.aclose()
+            self._redis = None
+
+    async def subscribe(self, chronicle_id: str):
+        channel = self.CHANNEL_PREFIX + chronicle_id
+        if channel not in self._channels:
+            await self._pubsub.subscribe(channel)
+            self._channels.add(channel)
+
+    async def unsubscribe(self, chronicle_id: str):
+        channel = self.CHANNEL_PREFIX + chronicle_id
+        if channel in self._channels:
+            self._channels.discard(channel)
+            await self._pubsub.unsubscribe(channel)
+
+    async def publish(self, chronicle_id: str, envelope: dict):
+        await self._redis.publish(self.CHANNEL_PREFIX + chronicle_id, dumps_json(envelope))
+
+    async def next_sequence(self, chronicle_id: str) -> int:
+        return await self._redis.incr(self.SEQUENCE_PREFIX + chronicle_id)
+
+    async def current_sequence(self, chronicle_id: str) -> int:
+        return int(await self._redis.get(self.SEQUENCE_PREFIX + chronicle_id) or 0)
+
+    async def publish_control(self, event: dict):
+        await self._redis.publish(self.CONTROL_CHANNEL, dumps_json(event))
+
+    async def add_presence(self, chronicle_id: str, conn_id: str, info: dict) -> int:
+        entry = dict(info, worker_id=self.worker_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.PRESENCE_PREFIX + chronicle_id, conn_id, dumps_json(entry))
+            pipe.incr(self.PRESENCE_VERSION_PREFIX + chronicle_id)
+            _, version = await pipe.execute()
+        return version
+
+    async def remove_presence(self, chronicle_id: str, conn_id: str) -> int:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(self.PRESENCE_PREFIX + chronicle_id, conn_id)
+            pipe.incr(self.PRESENCE_VERSION_PREFIX + chronicle_id)
+            _, version = await pipe.execute()
+        return version
+
+    async def get_presence(self, chronicle_id: str) -> Tuple[int, List[dict]]:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.get(self.PRESENCE_VERSION_PREFIX + chronicle_id)
+            pipe.hvals(self.PRESENCE_PREFIX + chronicle_id)
+            version, raw_entries = await pipe.execute()
+        version = int(version or 0)
+        entries = [loads_json(raw) for raw in raw_entries]
+        workers = sorted({entry["worker_id"] for entry in entries})
+        if not workers:
+            return version, []
+        alive = await self._redis.mget([self.WORKER_PREFIX + worker for worker in workers])
+        live_workers = {worker for worker, beat in zip(workers, alive) if beat is not None}
+        return version, [
+            {key: value for key, value in entry.items() if key != "worker_id"}
+            for entry in entries
+            if entry["worker_id"] in live_workers
+        ]
+
+    async def _beat(self):
+        await self._redis.set(self.WORKER_PREFIX + self.worker_id, 1, ex=self.HEARTBEAT_TTL)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_TTL / 3)
+            try:
+                await self._beat()
+            except Exception:
+                logger.exception("Backplane heartbeat failed")
+
+    async def _listen(self):
+        prefix_length = len(self.CHANNEL_PREFIX)
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Backplane listener failed")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            try:
+                payload = loads_json(message["data"])
+                if channel == self.CONTROL_CHANNEL:
+                    await self._dispatch_control(payload)
+                elif self._handler:
+                    await self._handler(channel[prefix_length:], payload)
+            except Exception:
+                logger.exception("Backplane handler failed for %s", channel)
+
+
+def create_backplane(kind: str, redis_url: str) -> Backplane:
+    """Build the backplane selected by settings.WS_BACKPLANE"""
+    if kind == "redis":
+        return RedisBackplane(redis_url)
+    if kind == "memory":
+        return InMemoryBackplane()
+    raise ValueError(f"Unknown WebSocket backplane: {kind}")
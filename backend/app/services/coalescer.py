@@ -0,0 +1,84 @@
+"""
+Server-side coalescing of bursty chronicle events.
+
+Typing indicators and character sheet tweaks arrive many times a second.
+Instead of rebroadcasting each frame, the first one of a burst opens a
+window per (chronicle, sender, event) and everything arriving before the
+window closes is folded into a single frame, sent when it closes.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+Merge = Callable[[dict, dict], dict]
+Sink = Callable[[str, dict, Any], Awaitable[None]]
+
+
+def last_write_wins(pending: dict, incoming: dict) -> dict:
+    """Keep only the newest frame (typing indicators)"""
+    return incoming
+
+
+def merge_deltas(base: Any, delta: Any) -> Any:
+    """Recursively merge a partial update into an earlier one; later values win"""
+    if not isinstance(base, dict) or not isinstance(delta, dict):
+        return delta
+    merged = dict(base)
+    for key, value in delta.items():
+        merged[key] = merge_deltas(merged.get(key), value) if key in merged else value
+    return merged
+
+
+def merge_character_updates(pending: dict, incoming: dict) -> dict:
+    """Fold a character_update into the pending one, merging their data deltas"""
+    return {**incoming, "data": merge_deltas(pending.get("data"), incoming.get("data"))}
+
+
+class Coalescer:
+    """Folds bursts of frames per key into one frame per window"""
+
+    def __init__(self, sink: Sink, window: float):
+        self.sink = sink
+        self.window = window
+        # (chronicle_id, key) -> [message, exclude]
+        self._pending: Dict[Tuple[str, Hashable], list] = {}
+        self._timers: Dict[Tuple[str, Hashable], asyncio.Task] = {}
+        self.received = 0
+        self.flushed = 0
+
+    async def submit(self, chronicle_id: str, key: Hashable, message: dict,
+                     merge: Merge = last_write_wins, exclude: Any = None):
+        """Queue a frame; it goes out, merged with the rest of its burst, when the window closes"""
+        self.received += 1
+        if self.window <= 0:
+            self.flushed += 1
+            await self.sink(chronicle_id, message, exclude)
+            return
+
+        slot = (chronicle_id, key)
+        pending = self._pending.get(slot)
+        if pending is None:
+            self._pending[slot] = [message, exclude]
+            self._timers[slot] = asyncio.create_task(self._flush_later(slot))
+        else:
+            pending[0] = merge(pending[0], message)
+
+    async def _flush_later(self, slot: Tuple[str, Hashable]):
+        await asyncio.sleep(self.window)
+        await self._flush(slot)
+
+    async def _flush(self, slot: Tuple[str, Hashable]):
+        self._timers.pop(slot, None)
+        pending = self._pending.pop(slot, None)
+        if pending is None:
+            return
+        self.flushed += 1
+        await self.sink(slot[0], pending[0], pending[1])
+
+    async def flush_all(self):
+        """Send everything pending right away (shutdown)"""
+        for slot, timer in list(self._timers.items()):
+            timer.cancel()
+            await self._flush(slot)
+
+    def pending_count(self, chronicle_id: Optional[str] = None) -> int:
+        return sum(1 for slot in self._pending if chronicle_id is None or slot[0] == chronicle_id)
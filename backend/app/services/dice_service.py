@@ -0,0 +1,237 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Union
+
+from ..core.batch import roll_v5_batch, roll_v20_batch
+from ..core.entropy import DiceSource
+from ..core.expressions import ResolvedPool, compile_expression
+from ..core.v5.dice import V5CompactRoll, V5DiceRoll, V5DiceRoller, V5RollResult
+from ..core.v20.dice import V20CompactRoll, V20DiceRoll, V20DiceRoller, V20RollResult
+
+V5Roll = Union[V5DiceRoll, V5CompactRoll]
+V20Roll = Union[V20DiceRoll, V20CompactRoll]
+
+
+@dataclass
+class RollOutcome:
+    """A server-side roll: the client-facing result plus the columns derived from it"""
+    game_version: str
+    roll_type: str
+    pool: int
+    difficulty: Optional[int]
+    hunger: int
+    result: dict
+    successes: int
+    is_critical: bool = False
+    is_messy_critical: bool = False
+    is_bestial_failure: bool = False
+    is_botch: bool = False
+
+
+def _or_default(value: Optional[int], default: int) -> int:
+    return default if value is None else value
+
+
+class DiceService:
+    """Rolls dice on the server and shapes results for clients and the dice_rolls table"""
+
+    @staticmethod
+    def v5_result(roll: V5Roll) -> dict:
+        """
+        Client-facing payload of a V5 roll. Compact rolls carry ten face
+        counts per dice kind (regular_counts[i] = dice showing i + 1)
+        instead of the dice.
+        """
+        if isinstance(roll, V5CompactRoll):
+            dice = {
+                "compact": True,
+                "regular_counts": list(roll.regular_counts),
+                "hunger_counts": list(roll.hunger_counts),
+            }
+        else:
+            dice = {"regular_dice": roll.regular_dice, "hunger_dice": roll.hunger_dice}
+        return {
+            **dice,
+            "difficulty": roll.difficulty,
+            "successes": roll.successes,
+            "regular_tens": roll.regular_tens,
+            "hunger_tens": roll.hunger_tens,
+            "hunger_ones": roll.hunger_ones,
+            "critical_pairs": roll.critical_pairs,
+            "result_type": roll.result_type.value,
+            "margin": roll.margin,
+        }
+
+    @staticmethod
+    def v20_result(roll: V20Roll) -> dict:
+        """Client-facing payload of a V20 roll (face counts instead of dice if compact)"""
+        if isinstance(roll, V20CompactRoll):
+            dice = {
+                "compact": True,
+                "counts": list(roll.counts),
+                "reroll_counts": list(roll.reroll_counts),
+            }
+        else:
+            dice = {"dice": roll.dice, "specialty_rerolls": roll.specialty_rerolls}
+        return {
+            **dice,
+            "difficulty": roll.difficulty,
+            "successes": roll.successes,
+            "ones": roll.ones,
+            "tens": roll.tens,
+            "result_type": roll.result_type.value,
+        }
+
+    @staticmethod
+    def resolve_expression(expression: str, sheet: dict, game_version: str = "v5") -> ResolvedPool:
+        """Pool and Hunger of a dice expression for one character sheet (plans are cached)"""
+        return compile_expression(expression, game_version).resolve(sheet)
+
+    @staticmethod
+    def v5_outcome(roll: V5Roll) -> RollOutcome:
+        if isinstance(roll, V5CompactRoll):
+            pool, hunger = roll.pool, roll.hunger
+        else:
+            pool, hunger = len(roll.regular_dice) + len(roll.hunger_dice), len(roll.hunger_dice)
+        return RollOutcome(
+            game_version="v5",
+            roll_type="standard",
+            pool=pool,
+            difficulty=roll.difficulty,
+            hunger=hunger,
+            result=DiceService.v5_result(roll),
+            successes=roll.successes,
+            is_critical=roll.result_type in (V5RollResult.CRITICAL, V5RollResult.MESSY_CRITICAL),
+            is_messy_critical=roll.result_type == V5RollResult.MESSY_CRITICAL,
+            is_bestial_failure=roll.result_type == V5RollResult.BESTIAL_FAILURE,
+        )
+
+    @staticmethod
+    def v20_outcome(roll: V20Roll) -> RollOutcome:
+        return RollOutcome(
+            game_version="v20",
+            roll_type="standard",
+            pool=roll.pool if isinstance(roll, V20CompactRoll) else len(roll.dice),
+            difficulty=roll.difficulty,
+            hunger=0,
+            result=DiceService.v20_result(roll),
+            successes=roll.successes,
+            is_botch=roll.result_type == V20RollResult.BOTCH,
+        )
+
+    @staticmethod
+    def roll_v5(
+        pool: int,
+        hunger: int = 0,
+        difficulty: int = 1,
+        source: Optional[DiceSource] = None,
+        compact: bool = False,
+    ) -> RollOutcome:
+        roll = V5DiceRoller.roll(pool=pool, hunger=hunger, difficulty=difficulty, source=source, compact=compact)
+        return DiceService.v5_outcome(roll)
+
+    @staticmethod
+    def rouse_check(reroll: bool = False, source: Optional[DiceSource] = None) -> RollOutcome:
+        success, dice = V5DiceRoller.rouse_check(reroll=reroll, source=source)
+        return RollOutcome(
+            game_version="v5",
+            roll_type="rouse",
+            pool=1,
+            difficulty=None,
+            hunger=0,
+            result={"dice": dice, "success": success, "hunger_increase": 0 if success else 1},
+            successes=1 if success else 0,
+        )
+
+    @staticmethod
+    def roll_v20(
+        pool: int,
+        difficulty: int = 6,
+        specialty: bool = False,
+        willpower: bool = False,
+        source: Optional[DiceSource] = None,
+        compact: bool = False,
+    ) -> RollOutcome:
+        roll = V20DiceRoller.roll(
+            pool=pool, difficulty=difficulty, specialty=specialty, willpower=willpower, source=source,
+            compact=compact,
+        )
+        return DiceService.v20_outcome(roll)
+
+    @staticmethod
+    def roll_many(specs: List[dict], compact: bool = False, source: Optional[DiceSource] = None) -> List[RollOutcome]:
+        """
+        Roll many V5/V20 pools with one batch-engine call per edition.
+
+        Each spec has game_version, pool and optionally hunger, difficulty
+        (defaults 1 for V5, 6 for V20), specialty and willpower. Outcomes
+        are returned in the order of the specs; with compact, their results
+        hold face counts instead of dice. Dice come from `source` (defaults
+        to the shared one).
+        """
+        outcomes: List[Optional[RollOutcome]] = [None] * len(specs)
+
+        v5 = [i for i, spec in enumerate(specs) if spec["game_version"] == "v5"]
+        if v5:
+            rolls = roll_v5_batch(
+                [specs[i]["pool"] for i in v5],
+                hunger=[specs[i].get("hunger", 0) for i in v5],
+                difficulty=[_or_default(specs[i].get("difficulty"), 1) for i in v5],
+                compact=compact,
+                source=source,
+            )
+            for i, roll in zip(v5, rolls):
+                outcomes[i] = DiceService.v5_outcome(roll)
+
+        v20 = [i for i, spec in enumerate(specs) if spec["game_version"] == "v20"]
+        if v20:
+            rolls = roll_v20_batch(
+                [specs[i]["pool"] for i in v20],
+                difficulty=[_or_default(specs[i].get("difficulty"), 6) for i in v20],
+                specialty=[specs[i].get("specialty", False) for i in v20],
+                willpower=[specs[i].get("willpower", False) for i in v20],
+                compact=compact,
+                source=source,
+            )
+            for i, roll in zip(v20, rolls):
+                outcomes[i] = DiceService.v20_outcome(roll)
+
+        return outcomes
+
+    @staticmethod
+    def to_row(
+        outcome: RollOutcome,
+        roll_id: str,
+        chronicle_id: Optional[str],
+        roller_id: str,
+        character_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        description: Optional[str] = None,
+        is_secret: bool = False,
+        created_at: Optional[datetime] = None,
+    ) -> dict:
+        """dice_rolls row for a write-behind insert"""
+        return {
+            "id": roll_id,
+            "chronicle_id": chronicle_id,
+            "session_id": session_id,
+            "character_id": character_id,
+            "roller_id": roller_id,
+            "game_version": outcome.game_version,
+            "roll_type": outcome.roll_type,
+            "description": description,
+            "pool": outcome.pool,
+            "difficulty": outcome.difficulty,
+            "hunger": outcome.hunger,
+            "result": outcome.result,
+            "successes": outcome.successes,
+            "is_critical": outcome.is_critical,
+            "is_messy_critical": outcome.is_messy_critical,
+            "is_bestial_failure": outcome.is_bestial_failure,
+            "is_botch": outcome.is_botch,
+            "is_secret": is_secret,
+            "created_at": created_at or datetime.utcnow(),
+        }
+
+
+dice_service = DiceService()
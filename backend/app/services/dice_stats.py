@@ -0,0 +1,199 @@
+"""
+Incrementally maintained dice statistics ("Hunger dice curse" stats).
+
+Every countable roll updates up to four dice_stats rows: the chronicle as
+a whole, the character, the session, and the character within the
+session. The rows are updated in the same transaction that inserts the
+rolls, so reading stats is a single primary-key lookup however long the
+history is. Each row is written with one INSERT ... ON CONFLICT DO UPDATE
+that adds to the stored counters, so concurrent writers (other workers)
+neither lose updates nor race to create the same row.
+
+Only standard public rolls count: rouse checks have no result type, and
+leaving secret rolls out keeps stats safe to show to every member.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import JSON, Integer, and_, cast, delete, func, literal, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.dice_roll import DiceRoll
+from ..models.dice_stats import DiceStats
+
+ALL = "*"
+REBUILD_CHUNK = 1000
+
+
+def stats_key(chronicle_id: str, character_id: Optional[str] = None, session_id: Optional[str] = None) -> str:
+    return f"{chronicle_id}|{character_id or ALL}|{session_id or ALL}"
+
+
+@dataclass
+class _Delta:
+    chronicle_id: str
+    character_id: Optional[str]
+    session_id: Optional[str]
+    rolls: int = 0
+    successes: int = 0
+    hunger_dice: int = 0
+    results: Counter = field(default_factory=Counter)
+    histogram: Counter = field(default_factory=Counter)
+
+
+def _empty(chronicle_id: str, character_id: Optional[str], session_id: Optional[str]) -> dict:
+    return {
+        "chronicle_id": chronicle_id,
+        "character_id": character_id,
+        "session_id": session_id,
+        "rolls": 0,
+        "successes": 0,
+        "hunger_dice": 0,
+        "results": {},
+        "histogram": {},
+    }
+
+
+def _add_counts(column, counts: Counter, dialect: str):
+    """SQL expression for a JSON object of counters with `counts` added to it"""
+    if dialect == "postgresql":
+        pairs = []
+        for name, n in counts.items():
+            pairs += [literal(name), func.coalesce(cast(column.op("->>")(name), Integer), 0) + n]
+        return cast(cast(column, postgresql.JSONB).op("||")(func.jsonb_build_object(*pairs)), JSON)
+    args = []
+    for name, n in counts.items():
+        path = f'$."{name}"'
+        args += [path, func.coalesce(func.json_extract(column, path), 0) + n]
+    return func.json_set(column, *args)
+
+
+class DiceStatsService:
+    """Maintains and reads the dice_stats aggregates"""
+
+    @staticmethod
+    def countable(row: dict) -> bool:
+        return (
+            row.get("chronicle_id") is not None
+            and not row.get("is_secret")
+            and row.get("roll_type") in (None, "standard")
+            and "result_type" in (row.get("result") or {})
+        )
+
+    def deltas(self, rows: Iterable[dict]) -> Dict[str, _Delta]:
+        """Per-scope increments for a batch of dice_rolls rows"""
+        deltas: Dict[str, _Delta] = {}
+        for row in rows:
+            if not self.countable(row):
+                continue
+            chronicle_id = row["chronicle_id"]
+            successes = row.get("successes") or 0
+            result_type = row["result"]["result_type"]
+            for character_id in {row.get("character_id"), None}:
+                for session_id in {row.get("session_id"), None}:
+                    key = stats_key(chronicle_id, character_id, session_id)
+                    delta = deltas.get(key)
+                    if delta is None:
+                        delta = deltas[key] = _Delta(chronicle_id, character_id, session_id)
+                    delta.rolls += 1
+                    delta.successes += successes
+                    delta.hunger_dice += row.get("hunger") or 0
+                    delta.results[result_type] += 1
+                    delta.histogram[str(successes)] += 1
+        return deltas
+
+    async def apply(self, db: AsyncSession, rows: List[dict]):
+        """Fold a batch of rolls into the aggregates (caller commits)"""
+        deltas = self.deltas(rows)
+        if not deltas:
+            return
+        dialect = db.get_bind().dialect.name
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        table = DiceStats.__table__
+        for key, delta in deltas.items():
+            stmt = insert(table).values(
+                key=key,
+                chronicle_id=delta.chronicle_id,
+                character_id=delta.character_id,
+                session_id=delta.session_id,
+                rolls=delta.rolls,
+                successes=delta.successes,
+                hunger_dice=delta.hunger_dice,
+                results=dict(delta.results),
+                histogram=dict(delta.histogram),
+            )
+            # The increments run in the database, against whatever row is there by then
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={
+                    "rolls": table.c.rolls + stmt.excluded.rolls,
+                    "successes": table.c.successes + stmt.excluded.successes,
+                    "hunger_dice": table.c.hunger_dice + stmt.excluded.hunger_dice,
+                    "results": _add_counts(table.c.results, delta.results, dialect),
+                    "histogram": _add_counts(table.c.histogram, delta.histogram, dialect),
+                    "updated_at": func.now(),
+                },
+            ))
+
+    async def get(
+        self,
+        db: AsyncSession,
+        chronicle_id: str,
+        character_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> dict:
+        """Stats of one scope, with derived rates"""
+        stats = await db.get(DiceStats, stats_key(chronicle_id, character_id, session_id))
+        data = _empty(chronicle_id, character_id, session_id)
+        if stats is not None:
+            data.update(
+                rolls=stats.rolls,
+                successes=stats.successes,
+                hunger_dice=stats.hunger_dice,
+                results=dict(stats.results),
+                histogram={int(k): n for k, n in stats.histogram.items()},
+            )
+        rolls = data["rolls"]
+        results = data["results"]
+
+        def rate(*names):
+            return sum(results.get(name, 0) for name in names) / rolls if rolls else 0.0
+
+        data.update(
+            average_successes=data["successes"] / rolls if rolls else 0.0,
+            critical_rate=rate("critical", "messy_critical"),
+            messy_critical_rate=rate("messy_critical"),
+            bestial_failure_rate=rate("bestial_failure"),
+            botch_rate=rate("botch"),
+        )
+        return data
+
+    async def rebuild(self, db: AsyncSession, chronicle_id: str) -> int:
+        """Recompute a chronicle's aggregates from its roll history (caller commits)"""
+        await db.execute(delete(DiceStats).where(DiceStats.chronicle_id == chronicle_id))
+        query = (
+            select(*DiceRoll.__table__.columns)
+            .where(DiceRoll.chronicle_id == chronicle_id)
+            .order_by(DiceRoll.created_at, DiceRoll.id)
+            .limit(REBUILD_CHUNK)
+        )
+        counted = 0
+        after = None
+        while True:
+            # Keyset pages over the (chronicle_id, created_at, id) index
+            page = query if after is None else query.where(or_(
+                DiceRoll.created_at > after[0],
+                and_(DiceRoll.created_at == after[0], DiceRoll.id > after[1]),
+            ))
+            rows = [dict(row) for row in (await db.execute(page)).mappings()]
+            if not rows:
+                return counted
+            await self.apply(db, rows)
+            await db.flush()
+            counted += len(rows)
+            after = (rows[-1]["created_at"], rows[-1]["id"])
+
+
+dice_stats = DiceStatsService()
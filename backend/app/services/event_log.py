@@ -0,0 +1,43 @@
+"""
+Sequenced event history for chronicle broadcasts.
+
+Every broadcast that is worth replaying gets a monotonic per-chronicle
+sequence number from the backplane. Each worker keeps the most recent
+events of the chronicles it is subscribed to, so a client that reconnects
+with its last seen sequence number only receives what it missed.
+"""
+from collections import deque
+from typing import Deque, List, Optional
+
+
+class EventLog:
+    """Bounded ring buffer of one chronicle's sequenced broadcasts"""
+
+    def __init__(self, capacity: int, floor: int = 0):
+        self._events: Deque[dict] = deque(maxlen=capacity)
+        # Highest sequence number that is *not* available here; everything after it is
+        self.floor = floor
+        self.last_seq = floor
+
+    def append(self, message: dict):
+        if len(self._events) == self._events.maxlen:
+            self.floor = max(self.floor, self._events[0]["seq"])
+        self._events.append(message)
+        self.last_seq = max(self.last_seq, message["seq"])
+
+    def since(self, last_seq: int) -> Optional[List[dict]]:
+        """
+        Events after last_seq, in order.
+
+        Returns None when part of the gap was never buffered here or has
+        already been evicted, meaning the client needs a full resync.
+        """
+        if last_seq < self.floor:
+            return None
+        return sorted(
+            (event for event in self._events if event["seq"] > last_seq),
+            key=lambda event: event["seq"],
+        )
+
+    def __len__(self):
+        return len(self._events)
@@ -0,0 +1,41 @@
+"""
+Versioned presence rosters for chronicles.
+
+Every join, leave or character change bumps the chronicle's roster version
+and produces a small delta frame. Clients apply deltas in version order
+and only ask for a full snapshot on connect or when they see a gap.
+"""
+from .backplane import Backplane
+
+
+class PresenceTracker:
+    """Keeps the shared roster and builds the delta frames for it"""
+
+    def __init__(self, backplane: Backplane):
+        self.backplane = backplane
+
+    async def join(self, chronicle_id: str, entry: dict) -> dict:
+        """Add a connection; returns the user_joined delta"""
+        version = await self.backplane.add_presence(chronicle_id, entry["connection_id"], entry)
+        return {"type": "user_joined", **entry, "presence_version": version}
+
+    async def update(self, chronicle_id: str, entry: dict) -> dict:
+        """Replace a connection's entry; returns the user_character_changed delta"""
+        version = await self.backplane.add_presence(chronicle_id, entry["connection_id"], entry)
+        return {"type": "user_character_changed", **entry, "presence_version": version}
+
+    async def leave(self, chronicle_id: str, entry: dict) -> dict:
+        """Remove a connection; returns the user_left delta"""
+        version = await self.backplane.remove_presence(chronicle_id, entry["connection_id"])
+        return {
+            "type": "user_left",
+            "connection_id": entry["connection_id"],
+            "user_id": entry["user_id"],
+            "username": entry["username"],
+            "presence_version": version,
+        }
+
+    async def snapshot(self, chronicle_id: str) -> dict:
+        """Full roster, for new connections and clients that saw a version gap"""
+        version, entries = await self.backplane.get_presence(chronicle_id)
+        return {"online_users": entries, "presence_version": version}
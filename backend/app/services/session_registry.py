@@ -0,0 +1,95 @@
+"""
+In-process registry of the active GameSession of each chronicle.
+
+Warmed from the database at startup and kept current by the session
+endpoints, so the chat hot path never has to query game_sessions. Changes
+are published on the backplane control channel so every worker applies
+them.
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.game_session import GameSession
+from .backplane import Backplane
+
+
+@dataclass
+class ActiveSession:
+    session_id: str
+    scene_id: Optional[str] = None
+
+
+class SessionRegistry:
+    """Maps chronicle_id to its active session and scene"""
+
+    CONTROL_KIND = "active_session"
+
+    def __init__(self):
+        self._active: Dict[str, ActiveSession] = {}
+        self._backplane: Optional[Backplane] = None
+
+    def attach(self, backplane: Backplane):
+        """Share registry changes with the other workers through the backplane"""
+        self._backplane = backplane
+        backplane.attach_control(self._on_control)
+
+    async def warm(self, db: AsyncSession):
+        """Load every active session from the database"""
+        result = await db.execute(
+            select(GameSession.chronicle_id, GameSession.id, GameSession.active_scene_id)
+            .where(GameSession.is_active == True)
+        )
+        self._active = {
+            chronicle_id: ActiveSession(session_id, scene_id)
+            for chronicle_id, session_id, scene_id in result.all()
+        }
+
+    def get(self, chronicle_id: str) -> Optional[ActiveSession]:
+        return self._active.get(chronicle_id)
+
+    def session_id(self, chronicle_id: str) -> Optional[str]:
+        """Active session id for a chronicle, or None"""
+        active = self._active.get(chronicle_id)
+        return active.session_id if active else None
+
+    async def activate(self, chronicle_id: str, session_id: str, scene_id: str = None):
+        """Record a newly started session"""
+        await self._publish({"event": "started", "chronicle_id": chronicle_id, "session_id": session_id, "scene_id": scene_id})
+
+    async def deactivate(self, chronicle_id: str, session_id: str):
+        """Record that a session has ended"""
+        await self._publish({"event": "ended", "chronicle_id": chronicle_id, "session_id": session_id})
+
+    async def set_scene(self, chronicle_id: str, session_id: str, scene_id: Optional[str]):
+        """Record the active scene of a session"""
+        await self._publish({"event": "scene", "chronicle_id": chronicle_id, "session_id": session_id, "scene_id": scene_id})
+
+    def apply(self, event: dict):
+        """Apply a registry change locally (idempotent)"""
+        chronicle_id = event["chronicle_id"]
+        session_id = event["session_id"]
+        current = self._active.get(chronicle_id)
+
+        if event["event"] == "started":
+            self._active[chronicle_id] = ActiveSession(session_id, event.get("scene_id"))
+        elif current and current.session_id == session_id:
+            if event["event"] == "ended":
+                del self._active[chronicle_id]
+            else:
+                current.scene_id = event.get("scene_id")
+
+    async def _publish(self, event: dict):
+        # Apply here first so this worker never reads its own stale state
+        self.apply(event)
+        if self._backplane is not None:
+            await self._backplane.publish_control(dict(event, kind=self.CONTROL_KIND))
+
+    async def _on_control(self, event: dict):
+        if event.get("kind") == self.CONTROL_KIND:
+            self.apply(event)
+
+
+session_registry = SessionRegistry()
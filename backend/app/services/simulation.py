@@ -0,0 +1,213 @@
+"""
+Monte Carlo simulation of rolls that have no convenient closed form.
+
+Extended and resisted V20 rolls and contested V5 rolls are simulated with
+the vectorized dice engine. Trials are split into chunks that run in a
+ProcessPoolExecutor, so the event loop never blocks; every finished
+chunk yields a progress update with running estimates and 95% confidence
+intervals. Finished results are cached per parameter tuple.
+"""
+import asyncio
+import math
+import os
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+from ..core.batch import V20_RESULTS, tally_v5, tally_v20
+from ..core.v20.dice import V20RollResult
+
+Z_95 = 1.959963984540054
+# Keep one chunk's dice arrays at a few tens of MB
+DICE_PER_CHUNK = 2_000_000
+
+# Parameters each scenario takes, with defaults; anything else in a request is ignored
+SCENARIOS: Dict[str, Dict[str, object]] = {
+    "v20_extended": {"pool": 5, "difficulty": 6, "target_successes": 5, "max_rolls": 10, "specialty": False},
+    "v20_resisted": {"attacker_pool": 5, "defender_pool": 5, "difficulty": 6,
+                     "attacker_specialty": False, "defender_specialty": False},
+    "v5_contested": {"attacker_pool": 5, "attacker_hunger": 0, "defender_pool": 5, "defender_hunger": 0},
+}
+
+
+def _extended_chunk(params: dict, trials: int, rng: np.random.Generator) -> dict:
+    """V20DiceRoller.extended_roll: stop at the target or at the first botch"""
+    rolls = params["max_rolls"]
+    t = tally_v20(np.full(trials * rolls, params["pool"]), params["difficulty"], params["specialty"], rng=rng)
+    successes = t.successes.reshape(trials, rolls)
+    botches = (t.result == V20_RESULTS.index(V20RollResult.BOTCH)).reshape(trials, rolls)
+
+    reached = np.cumsum(successes, axis=1) >= params["target_successes"]
+    first_reached = np.where(reached.any(axis=1), reached.argmax(axis=1), rolls)
+    first_botch = np.where(botches.any(axis=1), botches.argmax(axis=1), rolls)
+    # A botch roll adds no successes, so the target can only be reached on a clean roll
+    success = first_reached < first_botch
+    taken = np.minimum(np.minimum(first_reached, first_botch) + 1, rolls)
+    return {
+        "events": {"success": int(success.sum()), "botch": int((first_botch < first_reached).sum())},
+        "sums": {"rolls_taken": (float(taken.sum()), float((taken.astype(np.float64) ** 2).sum()))},
+    }
+
+
+def _versus(attacker: np.ndarray, defender: np.ndarray) -> dict:
+    net = (attacker - defender).astype(np.float64)
+    return {
+        "events": {
+            "attacker_wins": int((net > 0).sum()),
+            "ties": int((net == 0).sum()),
+            "defender_wins": int((net < 0).sum()),
+        },
+        "sums": {"net_successes": (float(net.sum()), float((net ** 2).sum()))},
+    }
+
+
+def _resisted_chunk(params: dict, trials: int, rng: np.random.Generator) -> dict:
+    """V20DiceRoller.resisted_roll"""
+    attacker = tally_v20(np.full(trials, params["attacker_pool"]), params["difficulty"],
+                         params["attacker_specialty"], rng=rng)
+    defender = tally_v20(np.full(trials, params["defender_pool"]), params["difficulty"],
+                         params["defender_specialty"], rng=rng)
+    return _versus(attacker.successes, defender.successes)
+
+
+def _contested_chunk(params: dict, trials: int, rng: np.random.Generator) -> dict:
+    """V5DiceRoller.contested_roll"""
+    attacker = tally_v5(np.full(trials, params["attacker_pool"]), params["attacker_hunger"], 0, rng=rng)
+    defender = tally_v5(np.full(trials, params["defender_pool"]), params["defender_hunger"], 0, rng=rng)
+    return _versus(attacker.successes, defender.successes)
+
+
+_CHUNK_RUNNERS: Dict[str, Callable[[dict, int, np.random.Generator], dict]] = {
+    "v20_extended": _extended_chunk,
+    "v20_resisted": _resisted_chunk,
+    "v5_contested": _contested_chunk,
+}
+
+
+def run_chunk(kind: str, params: dict, trials: int, seed: int) -> dict:
+    """Entry point executed in a worker process"""
+    result = _CHUNK_RUNNERS[kind](params, trials, np.random.default_rng(seed))
+    result["trials"] = trials
+    return result
+
+
+def _dice_per_trial(kind: str, params: dict) -> int:
+    if kind == "v20_extended":
+        return params["pool"] * params["max_rolls"]
+    return params["attacker_pool"] + params["defender_pool"]
+
+
+def wilson_interval(events: int, trials: int) -> Tuple[float, float]:
+    """95% Wilson score interval for a proportion"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = events / trials
+    denominator = 1 + Z_95 ** 2 / trials
+    center = (p + Z_95 ** 2 / (2 * trials)) / denominator
+    half = Z_95 * math.sqrt(p * (1 - p) / trials + Z_95 ** 2 / (4 * trials ** 2)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+class SimulationService:
+    """Runs chunked simulations in worker processes and caches finished results"""
+
+    def __init__(self, executor: Executor = None, cache_size: int = None):
+        self._executor = executor
+        self._cache: "OrderedDict[tuple, dict]" = OrderedDict()
+        self.cache_size = cache_size or settings.SIMULATION_CACHE_SIZE
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=settings.SIMULATION_WORKERS or os.cpu_count())
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def normalize(kind: str, params: dict) -> dict:
+        """Scenario parameters with defaults filled in and everything else dropped"""
+        defaults = SCENARIOS[kind]
+        return {name: type(default)(params.get(name, default)) for name, default in defaults.items()}
+
+    async def run(self, kind: str, params: dict, trials: int, seed: Optional[int] = None) -> AsyncIterator[dict]:
+        """
+        Simulate `trials` rolls, yielding a progress update per finished chunk.
+
+        The last update has type "result". Identical requests (same
+        scenario, parameters, trial count and seed) are served from the
+        cache without simulating again.
+        """
+        params = self.normalize(kind, params)
+        key = (kind, tuple(sorted(params.items())), trials, seed)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            yield {**cached, "cached": True}
+            return
+
+        chunk = max(1000, DICE_PER_CHUNK // max(1, _dice_per_trial(kind, params)))
+        sizes = [min(chunk, trials - start) for start in range(0, trials, chunk)]
+        seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(len(sizes))]
+
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(self.executor, run_chunk, kind, params, size, chunk_seed)
+            for size, chunk_seed in zip(sizes, seeds)
+        ]
+
+        totals = {"trials": 0, "events": {}, "sums": {}}
+        try:
+            for done, future in enumerate(asyncio.as_completed(futures), start=1):
+                self._merge(totals, await future)
+                if done < len(futures):
+                    yield self._summary("progress", kind, params, totals, trials)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        result = self._summary("result", kind, params, totals, trials)
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        yield {**result, "cached": False}
+
+    @staticmethod
+    def _merge(totals: dict, part: dict):
+        totals["trials"] += part["trials"]
+        for name, count in part["events"].items():
+            totals["events"][name] = totals["events"].get(name, 0) + count
+        for name, (total, squares) in part["sums"].items():
+            previous = totals["sums"].get(name, (0.0, 0.0))
+            totals["sums"][name] = (previous[0] + total, previous[1] + squares)
+
+    @staticmethod
+    def _summary(kind_of_update: str, kind: str, params: dict, totals: dict, requested: int) -> dict:
+        n = totals["trials"]
+        estimates = {}
+        for name, count in totals["events"].items():
+            low, high = wilson_interval(count, n)
+            estimates[name] = {"estimate": count / n, "ci_low": low, "ci_high": high}
+        for name, (total, squares) in totals["sums"].items():
+            mean = total / n
+            variance = max(0.0, squares / n - mean ** 2) * n / max(1, n - 1)
+            half = Z_95 * math.sqrt(variance / n)
+            estimates[name] = {"estimate": mean, "ci_low": mean - half, "ci_high": mean + half}
+        return {
+            "type": kind_of_update,
+            "scenario": kind,
+            "params": params,
+            "trials_done": n,
+            "trials": requested,
+            "estimates": estimates,
+        }
+
+
+simulation_service = SimulationService()
@@ -0,0 +1,143 @@
+"""
+Write-behind persistence for high-frequency rows (chat lines, dice rolls).
+
+Callers assign ids themselves, broadcast immediately and hand the row to a
+WriteBehindQueue, which bulk-inserts in micro-batches bounded by size and
+time. The queue is bounded, so a flood of frames back-pressures the sender
+instead of growing memory, and stop() flushes everything still pending.
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import async_session_maker
+from ..models.chat_message import ChatMessage
+from ..models.dice_roll import DiceRoll
+from .dice_stats import dice_stats
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Buffers rows for one model and bulk-inserts them in micro-batches"""
+
+    def __init__(
+        self,
+        model,
+        batch_size: int = None,
+        flush_interval: float = None,
+        max_queue: int = None,
+        session_factory=None,
+    ):
+        self.model = model
+        self.batch_size = batch_size or settings.WRITE_BEHIND_BATCH_SIZE
+        # 0 is a valid interval: flush every row as soon as it arrives
+        self.flush_interval = settings.WRITE_BEHIND_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.session_factory = session_factory or async_session_maker
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue or settings.WRITE_BEHIND_QUEUE_SIZE)
+        self._task: Optional[asyncio.Task] = None
+        self.flushed_batches = 0
+        self.flushed_rows = 0
+
+    def start(self):
+        """Start the background flusher (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything queued so far and stop the flusher"""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, row: dict):
+        """Queue a row for insertion; waits only when the queue is full"""
+        self.start()
+        await self._queue.put(row)
+
+    async def prepare(self, db: AsyncSession, rows: List[dict]):
+        """Hook to fill in derived columns for a whole batch before insert"""
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            await self._flush(batch)
+
+    async def insert(self, db: AsyncSession, rows: List[dict]):
+        """Insert rows right away in the caller's transaction, through the same prepare hook"""
+        await self.prepare(db, rows)
+        await db.execute(insert(self.model), rows)
+
+    async def _flush(self, rows: List[dict]):
+        try:
+            async with self.session_factory() as db:
+                await self.insert(db, rows)
+                await db.commit()
+        except Exception:
+            logger.exception("Bulk insert into %s failed, retrying row by row", self.model.__tablename__)
+            await self._flush_one_by_one(rows)
+            return
+
+        self.flushed_batches += 1
+        self.flushed_rows += len(rows)
+
+    async def _flush_one_by_one(self, rows: List[dict]):
+        """Isolate bad rows so one of them cannot sink the whole batch"""
+        for row in rows:
+            try:
+                async with self.session_factory() as db:
+                    await self.insert(db, [row])
+                    await db.commit()
+                self.flushed_rows += 1
+            except Exception:
+                logger.exception("Dropping %s row %s", self.model.__tablename__, row.get("id"))
+
+
+class ChatMessageWriter(WriteBehindQueue):
+    """Write-behind queue for chat messages sent over the WebSocket"""
+
+    def __init__(self, **kwargs):
+        super().__init__(ChatMessage, **kwargs)
+
+
+class DiceRollWriter(WriteBehindQueue):
+    """Write-behind queue for server-side rolls made over the WebSocket"""
+
+    def __init__(self, **kwargs):
+        super().__init__(DiceRoll, **kwargs)
+
+    async def prepare(self, db: AsyncSession, rows: List[dict]):
+        # Stats are updated in the insert's transaction, so they never drift from the rolls
+        await dice_stats.apply(db, rows)
+
+
+chat_writer = ChatMessageWriter()
+dice_writer = DiceRollWriter()
@@ -0,0 +1,129 @@
+"""
+Dispatch table for inbound WebSocket frames.
+
+Handlers register per message type together with the pydantic schema of
+their frame. A frame is size-checked before it is parsed, decoded once and
+validated against its schema; anything malformed is answered with an error
+frame instead of tearing the connection down. Every handler keeps timing
+counters so /ws/metrics shows which event types cost the most.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from ..utils.serialization import loads_json, loads_msgpack
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any, BaseModel], Awaitable[None]]
+
+
+@dataclass
+class HandlerStats:
+    calls: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def record(self, elapsed: float):
+        self.calls += 1
+        self.total_seconds += elapsed
+        if elapsed > self.max_seconds:
+            self.max_seconds = elapsed
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_seconds * 1000, 3),
+            "avg_ms": round(self.total_seconds * 1000 / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 3),
+        }
+
+
+def error_frame(code: str, detail: str, message_type: Optional[str] = None) -> dict:
+    return {"type": "error", "code": code, "detail": detail, "message_type": message_type}
+
+
+class MessageDispatcher:
+    """Routes decoded frames to the handler registered for their type"""
+
+    def __init__(self, max_frame_size: int):
+        self.max_frame_size = max_frame_size
+        self._handlers: Dict[str, Tuple[Type[BaseModel], Handler]] = {}
+        self.stats: Dict[str, HandlerStats] = {}
+        self.rejected: Dict[str, int] = {}
+
+    def register(self, *message_types: str, schema: Type[BaseModel]):
+        """Decorator registering a handler(ctx, payload) for one or more message types"""
+        def decorator(handler: Handler) -> Handler:
+            for message_type in message_types:
+                self._handlers[message_type] = (schema, handler)
+                self.stats[message_type] = HandlerStats()
+            return handler
+        return decorator
+
+    def decode(self, data: Any) -> Tuple[Optional[str], Optional[BaseModel], Optional[dict]]:
+        """
+        Check, parse and validate a raw frame (JSON text or MessagePack bytes).
+
+        Returns (message_type, payload, None) on success or
+        (message_type, None, error_frame) when the frame is rejected.
+        """
+        if len(data) > self.max_frame_size:
+            return None, None, self._reject("frame_too_large", "Mensagem muito grande")
+
+        try:
+            message = loads_msgpack(data) if isinstance(data, bytes) else loads_json(data)
+        except ValueError:
+            return None, None, self._reject("malformed_frame", "Mensagem mal formada")
+        if not isinstance(message, dict):
+            return None, None, self._reject("malformed_frame", "Mensagem deve ser um objeto")
+
+        message_type = message.get("type")
+        entry = self._handlers.get(message_type) if isinstance(message_type, str) else None
+        if entry is None:
+            return None, None, self._reject("unknown_type", "Tipo de mensagem desconhecido")
+
+        try:
+            return message_type, entry[0].model_validate(message), None
+        except ValidationError as exc:
+            detail = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+            )
+            return message_type, None, self._reject("invalid_payload", f"Dados invalidos ({detail})", message_type)
+
+    async def dispatch(self, ctx: Any, data: Any) -> Optional[dict]:
+        """Handle one raw frame; returns an error frame for the sender, or None"""
+        message_type, payload, error = self.decode(data)
+        if error is not None:
+            return error
+
+        _, handler = self._handlers[message_type]
+        stats = self.stats[message_type]
+        started = time.perf_counter()
+        try:
+            await handler(ctx, payload)
+        except Exception:
+            stats.errors += 1
+            logger.exception("WebSocket handler for %s failed", message_type)
+            return error_frame("handler_failed", "Erro ao processar mensagem", message_type)
+        finally:
+            stats.record(time.perf_counter() - started)
+        return None
+
+    def _reject(self, code: str, detail: str, message_type: Optional[str] = None) -> dict:
+        self.rejected[code] = self.rejected.get(code, 0) + 1
+        return error_frame(code, detail, message_type)
+
+    def metrics(self) -> dict:
+        return {
+            "handlers": {
+                message_type: stats.to_dict()
+                for message_type, stats in self.stats.items() if stats.calls
+            },
+            "rejected": dict(self.rejected),
+        }
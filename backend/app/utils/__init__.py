@@ -13,6 +13,7 @@ from .helpers import (
     get_health_max_v5,
     validate_game_version,
 )
+from .serialization import dumps_json, loads_json, dumps_msgpack, loads_msgpack
 
 __all__ = [
     "generate_uuid",
@@ -28,4 +29,8 @@ __all__ = [
     "get_willpower_max_v5",
     "get_health_max_v5",
     "validate_game_version",
+    "dumps_json",
+    "loads_json",
+    "dumps_msgpack",
+    "loads_msgpack",
 ]
@@ -1,8 +1,9 @@
 import uuid
-import random
 from typing import List, Tuple
 from datetime import datetime
 
+from ..core.entropy import dice_sources
+
 
 def generate_uuid() -> str:
     """Generate a new UUID string"""
@@ -11,12 +12,12 @@ def generate_uuid() -> str:
 
 def roll_d10() -> int:
     """Roll a single d10"""
-    return random.randint(1, 10)
+    return dice_sources.default.d10()
 
 
 def roll_dice(count: int) -> List[int]:
     """Roll multiple d10s"""
-    return [roll_d10() for _ in range(count)]
+    return dice_sources.default.roll(count)
 
 
 def format_datetime(dt: datetime) -> str:
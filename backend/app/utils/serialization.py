@@ -0,0 +1,56 @@
+import msgpack
+import orjson
+
+
+def dumps_json(message: dict) -> str:
+    """Encode a message as a compact JSON text frame (orjson)"""
+    return orjson.dumps(message).decode()
+
+
+def loads_json(data) -> dict:
+    """Decode a JSON text or binary frame"""
+    return orjson.loads(data)
+
+
+def dumps_msgpack(message: dict) -> bytes:
+    """Encode a message as a MessagePack binary frame"""
+    return msgpack.packb(message, use_bin_type=True)
+
+
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def _reject_ext(code: int, data: bytes):
+    raise ValueError(f"MessagePack ext type {code} not supported")
+
+
+def _check_json_safe(value):
+    """Raise ValueError on anything orjson could not re-encode for JSON clients"""
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            for key, child in item.items():
+                if not isinstance(key, str):
+                    raise ValueError("Map keys must be strings")
+                stack.append(child)
+        elif isinstance(item, list):
+            stack.extend(item)
+        elif not isinstance(item, _JSON_SCALARS):
+            raise ValueError(f"Unsupported MessagePack value: {type(item).__name__}")
+
+
+def loads_msgpack(data: bytes) -> dict:
+    """
+    Decode a MessagePack binary frame; malformed input raises ValueError.
+
+    Frames are relayed to JSON clients too, so only values JSON can carry
+    are accepted: bin, ext (timestamps included) and non-string map keys
+    are rejected here, before the message is sequenced or broadcast.
+    """
+    try:
+        message = msgpack.unpackb(data, raw=False, ext_hook=_reject_ext)
+    except msgpack.UnpackException as exc:
+        raise ValueError(str(exc)) from exc
+    _check_json_safe(message)
+    return message
@@ -0,0 +1,56 @@
+"""
+Benchmark do motor de dados vetorizado.
+
+Compara o tempo para rolar K paradas de tamanhos variados:
+- caminho escalar (V5DiceRoller.roll / V20DiceRoller.roll, uma parada por vez)
+- caminho em lote (roll_*_batch, objetos completos)
+- apenas contagens (tally_*, para simulacoes)
+
+Executar com: python -m scripts.bench_dice_batch
+"""
+
+import sys
+import os
+import time
+
+# Adiciona o diretorio pai ao path para imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.core.batch import roll_v5_batch, roll_v20_batch, tally_v5, tally_v20
+from app.core.v5.dice import V5DiceRoller
+from app.core.v20.dice import V20DiceRoller
+
+
+BATCH_SIZES = (10, 1000, 100000)
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    rng = np.random.default_rng(2024)
+
+    print(f"{'K':>8} {'regra':>5} {'escalar':>12} {'lote':>12} {'contagens':>12} {'ganho':>8}")
+    for size in BATCH_SIZES:
+        pools = rng.integers(1, 16, size=size)
+        hunger = rng.integers(0, 6, size=size)
+        pool_list, hunger_list = pools.tolist(), hunger.tolist()
+
+        scalar = timed(lambda: [V5DiceRoller.roll(p, h, 3) for p, h in zip(pool_list, hunger_list)])
+        batch = timed(lambda: roll_v5_batch(pools, hunger, 3))
+        tallies = timed(lambda: tally_v5(pools, hunger, 3))
+        print(f"{size:>8} {'V5':>5} {scalar * 1000:>10.2f}ms {batch * 1000:>10.2f}ms {tallies * 1000:>10.2f}ms {scalar / batch:>7.1f}x")
+
+        scalar = timed(lambda: [V20DiceRoller.roll(p, 6, True) for p in pool_list])
+        batch = timed(lambda: roll_v20_batch(pools, 6, True))
+        tallies = timed(lambda: tally_v20(pools, 6, True))
+        print(f"{size:>8} {'V20':>5} {scalar * 1000:>10.2f}ms {batch * 1000:>10.2f}ms {tallies * 1000:>10.2f}ms {scalar / batch:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
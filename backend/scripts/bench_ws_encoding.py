@@ -0,0 +1,76 @@
+"""
+Benchmark de serializacao do broadcast via WebSocket.
+
+Compara o custo de CPU por mensagem de:
+- send_json por destinatario (json.dumps uma vez para cada conexao)
+- serializar uma vez com orjson e enviar o mesmo frame para todos
+
+Executar com: python -m scripts.bench_ws_encoding
+"""
+
+import json
+import sys
+import os
+import time
+
+# Adiciona o diretorio pai ao path para imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.serialization import dumps_json
+
+
+CONNECTION_COUNTS = (10, 50, 200)
+ITERATIONS = 2000
+
+# Mensagem tipica: resultado de rolagem com metadados do jogador
+SAMPLE_MESSAGE = {
+    "type": "dice_roll",
+    "data": {
+        "regular_dice": [3, 7, 10, 6, 2],
+        "hunger_dice": [10, 1],
+        "difficulty": 3,
+        "successes": 6,
+        "result_type": "messy_critical",
+        "description": "Forca + Briga para derrubar o carnical",
+    },
+    "user_id": "3f1e9a52-8c1d-4b8e-9d0e-7a1c2b3d4e5f",
+    "username": "Narrador",
+    "character_id": "9b2c7d14-1a2b-4c3d-8e9f-0a1b2c3d4e5f",
+    "character_name": "Lucita",
+    "is_secret": False,
+    "timestamp": "2026-01-07T22:15:03.123456",
+}
+
+
+def per_recipient(connections: int) -> float:
+    """CPU seconds per message when every recipient encodes its own copy"""
+    start = time.process_time()
+    for _ in range(ITERATIONS):
+        for _ in range(connections):
+            json.dumps(SAMPLE_MESSAGE, separators=(",", ":"), ensure_ascii=False)
+    return (time.process_time() - start) / ITERATIONS
+
+
+def encode_once(connections: int) -> float:
+    """CPU seconds per message when the frame is encoded once and shared"""
+    start = time.process_time()
+    for _ in range(ITERATIONS):
+        frame = dumps_json(SAMPLE_MESSAGE)
+        for _ in range(connections):
+            _ = frame
+    return (time.process_time() - start) / ITERATIONS
+
+
+def main():
+    print(f"{'conexoes':>9} {'por destinatario':>18} {'uma vez':>12} {'economia':>12}")
+    for connections in CONNECTION_COUNTS:
+        before = per_recipient(connections)
+        after = encode_once(connections)
+        print(
+            f"{connections:>9} {before * 1e6:>15.1f} us {after * 1e6:>9.1f} us "
+            f"{(before - after) * 1e6:>9.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Script para reconstruir as estatisticas de dados (tabela dice_stats).
+
+As estatisticas sao mantidas incrementalmente a cada rolagem gravada;
+este script recalcula tudo a partir do historico de rolagens, por
+exemplo depois da migracao 004 ou se algo sair de sincronia.
+
+Executar com: python -m scripts.rebuild_dice_stats [chronicle_id ...]
+(sem argumentos, todas as cronicas)
+"""
+
+import asyncio
+import sys
+import os
+
+# Adiciona o diretorio pai ao path para imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.models.chronicle import Chronicle
+from app.services.dice_stats import dice_stats
+
+
+async def run_rebuild(chronicle_ids: list[str]):
+    """Recalcula as estatisticas de cada cronica, uma transacao por cronica."""
+    engine = create_async_engine(settings.database_url, echo=False)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with async_session() as session:
+        if not chronicle_ids:
+            chronicle_ids = (await session.execute(select(Chronicle.id))).scalars().all()
+
+        for chronicle_id in chronicle_ids:
+            counted = await dice_stats.rebuild(session, chronicle_id)
+            await session.commit()
+            print(f"{chronicle_id}: {counted} rolagens processadas")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_rebuild(sys.argv[1:]))
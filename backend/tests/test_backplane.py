@@ -0,0 +1,119 @@
+import asyncio
+
+import fakeredis
+import pytest
+import redis.asyncio
+
+from app.services.backplane import RedisBackplane
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    """Every RedisBackplane started in the test talks to the same fake server"""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.asyncio, "from_url", lambda url, **kwargs: fakeredis.FakeAsyncRedis(server=server))
+    return server
+
+
+async def start_workers(count: int = 2):
+    workers = [RedisBackplane("redis://fake") for _ in range(count)]
+    for worker in workers:
+        await worker.start()
+    return workers
+
+
+async def record(events: list, event):
+    events.append(event)
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    """Let the listener tasks run until `condition()` holds"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "timed out waiting for the backplane"
+        await asyncio.sleep(0.01)
+
+
+class TestRedisBackplane:
+    """Tests for the Redis backplane against fakeredis"""
+
+    @pytest.mark.asyncio
+    async def test_listener_delivers_envelopes_and_control_events(self, redis_server):
+        worker_a, worker_b = await start_workers()
+        envelopes, controls = [], []
+        worker_b.attach(lambda chronicle_id, envelope: record(envelopes, (chronicle_id, envelope)))
+        for worker in (worker_a, worker_b):
+            worker.attach_control(lambda event, worker=worker: record(controls, (worker.worker_id, event)))
+        try:
+            await worker_b.subscribe("c1")
+            await worker_a.publish("c2", {"type": "ignored"})
+            await worker_a.publish("c1", {"type": "scene_change", "seq": 1})
+            await worker_a.publish_control({"type": "session_started", "chronicle_id": "c1"})
+            await wait_for(lambda: envelopes and len(controls) == 2)
+
+            assert envelopes == [("c1", {"type": "scene_change", "seq": 1})]
+            # Control events reach every worker, the publisher included
+            assert sorted(worker for worker, _ in controls) == sorted([worker_a.worker_id, worker_b.worker_id])
+
+            await worker_b.unsubscribe("c1")
+            await worker_a.publish("c1", {"type": "late"})
+            await asyncio.sleep(0.05)
+            assert len(envelopes) == 1
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+
+    @pytest.mark.asyncio
+    async def test_pipelined_presence_is_versioned(self, redis_server):
+        worker_a, worker_b = await start_workers()
+        try:
+            assert await worker_a.get_presence("c1") == (0, [])
+            assert await worker_a.add_presence("c1", "conn-a", {"user_id": "u1"}) == 1
+            assert await worker_b.add_presence("c1", "conn-b", {"user_id": "u2"}) == 2
+            # Re-adding replaces the entry but still bumps the version
+            assert await worker_a.add_presence("c1", "conn-a", {"user_id": "u1", "typing": True}) == 3
+
+            version, entries = await worker_b.get_presence("c1")
+            assert version == 3
+            assert sorted(entries, key=lambda e: e["user_id"]) == [{"user_id": "u1", "typing": True}, {"user_id": "u2"}]
+
+            assert await worker_b.remove_presence("c1", "conn-b") == 4
+            assert await worker_a.get_presence("c1") == (4, [{"user_id": "u1", "typing": True}])
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+
+    @pytest.mark.asyncio
+    async def test_entries_of_dead_workers_are_ignored(self, redis_server):
+        """A worker whose heartbeat expired no longer shows up in the roster"""
+        worker_a, worker_b = await start_workers()
+        try:
+            await worker_a.add_presence("c1", "conn-a", {"user_id": "u1"})
+            await worker_b.add_presence("c1", "conn-b", {"user_id": "u2"})
+            client = fakeredis.FakeAsyncRedis(server=redis_server)
+            assert await client.ttl(RedisBackplane.WORKER_PREFIX + worker_b.worker_id) > 0
+
+            # Worker B crashes: its roster entries stay, its heartbeat expires
+            worker_b._heartbeat.cancel()
+            await client.delete(RedisBackplane.WORKER_PREFIX + worker_b.worker_id)
+            assert (await worker_a.get_presence("c1"))[1] == [{"user_id": "u1"}]
+            assert await client.hlen(RedisBackplane.PRESENCE_PREFIX + "c1") == 2
+
+            await worker_a.stop()
+            assert await client.exists(RedisBackplane.WORKER_PREFIX + worker_a.worker_id) == 0
+            await client.aclose()
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+
+    @pytest.mark.asyncio
+    async def test_sequences_are_shared(self, redis_server):
+        worker_a, worker_b = await start_workers()
+        try:
+            assert await worker_b.current_sequence("c1") == 0
+            assert [await worker_a.next_sequence("c1"), await worker_b.next_sequence("c1")] == [1, 2]
+            assert await worker_a.current_sequence("c1") == 2
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
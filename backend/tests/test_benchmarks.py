@@ -0,0 +1,157 @@
+"""
+Dice engine micro-benchmarks with regression thresholds.
+
+Deselected by default; run with:
+
+    python -m pytest -m benchmark                     # compare with the baseline
+    BENCH_UPDATE=1 python -m pytest -m benchmark      # rewrite the baseline
+
+Raw timings depend on the machine, so every throughput is divided by the
+throughput of a fixed pure-Python calibration loop, timed in alternation
+with the benchmark so both see the same CPU conditions. The stored
+numbers are "calls per calibration loop", which stay comparable across
+machines; a benchmark fails when it drops more than BENCH_TOLERANCE
+(default 30%) below its baseline in two measurements in a row.
+"""
+import json
+import os
+import platform
+import time
+from pathlib import Path
+
+import pytest
+
+from app.core.v5 import odds as v5_odds_module
+from app.core.v5.dice import V5DiceRoller
+from app.core.v5.rouse_check import RouseChecker
+from app.core.v20 import odds as v20_odds_module
+from app.core.v20.dice import V20DiceRoller
+
+pytestmark = pytest.mark.benchmark
+
+BASELINE_PATH = Path(__file__).parent / "benchmark_baseline.json"
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "0.30"))
+UPDATE = os.environ.get("BENCH_UPDATE") == "1"
+
+POOLS = (1, 5, 10, 15, 20, 25, 30)
+ROUSE_COUNTS = (1, 3, 5)
+TARGET_SECONDS = 0.02  # Length of one timed run
+REPEATS = 7  # Best of
+
+
+def calls_for(fn) -> int:
+    """Number of calls to fn that take about TARGET_SECONDS"""
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= TARGET_SECONDS / 4:
+            return max(1, int(calls * TARGET_SECONDS / elapsed))
+        calls *= 2
+
+
+def rate(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return calls / (time.perf_counter() - start)
+
+
+def calibration_loop():
+    total = 0
+    for i in range(2000):
+        total += i * i % 7
+    return total
+
+
+def score(fn) -> float:
+    """Best throughput of fn over best throughput of the calibration loop, interleaved"""
+    calls, calibration_calls = calls_for(fn), calls_for(calibration_loop)
+    best = best_calibration = 0.0
+    for _ in range(REPEATS):
+        best_calibration = max(best_calibration, rate(calibration_loop, calibration_calls))
+        best = max(best, rate(fn, calls))
+    return best / best_calibration
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    stored = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {"results": {}}
+    measured = {}
+    yield stored["results"], measured
+    if UPDATE and measured:
+        results = {**stored["results"], **measured}
+        BASELINE_PATH.write_text(json.dumps({
+            "unit": "calls per calibration loop",
+            "python": platform.python_version(),
+            "results": dict(sorted(results.items())),
+        }, indent=2) + "\n")
+
+
+def check(name: str, fn, baseline):
+    stored, measured = baseline
+    result = score(fn)
+    measured[name] = round(result, 4)
+    if UPDATE:
+        return
+    if name not in stored:
+        pytest.skip(f"No baseline for {name}; record one with BENCH_UPDATE=1")
+    floor = stored[name] * (1 - TOLERANCE)
+    if result < floor:
+        # Confirm before failing: a single slow measurement is usually noise
+        result = max(result, score(fn))
+    assert result >= floor, (
+        f"{name}: {result:.4f} calls/loop, baseline {stored[name]:.4f} "
+        f"({result / stored[name] - 1:+.0%}, tolerance -{TOLERANCE:.0%})"
+    )
+
+
+class TestRollerBenchmarks:
+    """Throughput of the scalar rollers"""
+
+    @pytest.mark.parametrize("pool", POOLS)
+    def test_v5_roll(self, pool, baseline):
+        check(f"v5_roll[{pool}]", lambda: V5DiceRoller.roll(pool, min(pool, 2), 3), baseline)
+
+    @pytest.mark.parametrize("pool", POOLS)
+    def test_v20_roll(self, pool, baseline):
+        check(f"v20_roll[{pool}]", lambda: V20DiceRoller.roll(pool, 6, specialty=True), baseline)
+
+    @pytest.mark.parametrize("pool", POOLS)
+    def test_v20_extended_roll(self, pool, baseline):
+        check(
+            f"v20_extended_roll[{pool}]",
+            lambda: V20DiceRoller.extended_roll(pool, 6, target_successes=10, max_rolls=10),
+            baseline,
+        )
+
+    @pytest.mark.parametrize("count", ROUSE_COUNTS)
+    def test_multiple_rouse_checks(self, count, baseline):
+        check(
+            f"multiple_rouse_checks[{count}]",
+            lambda: RouseChecker.multiple_rouse_checks(count, blood_potency=2),
+            baseline,
+        )
+
+
+class TestOddsBenchmarks:
+    """Exact odds from a cold cache (every table rebuilt on each call)"""
+
+    @pytest.mark.parametrize("pool", POOLS)
+    def test_v5_odds(self, pool, baseline):
+        def cold():
+            v5_odds_module._dice_counts.cache_clear()
+            v5_odds_module.joint_table.cache_clear()
+            v5_odds_module.v5_odds.__wrapped__(pool, min(pool, 3), 4)
+
+        check(f"v5_odds[{pool}]", cold, baseline)
+
+    @pytest.mark.parametrize("pool", POOLS)
+    def test_v20_odds(self, pool, baseline):
+        def cold():
+            v20_odds_module.count_table.cache_clear()
+            v20_odds_module.v20_odds.__wrapped__(pool, 6, specialty=True)
+
+        check(f"v20_odds[{pool}]", cold, baseline)
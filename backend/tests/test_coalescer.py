@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+
+from app.services.coalescer import Coalescer, merge_character_updates, merge_deltas
+
+
+class RecordingSink:
+    def __init__(self):
+        self.sent = []
+
+    async def __call__(self, chronicle_id, message, exclude=None):
+        self.sent.append((chronicle_id, message, exclude))
+
+
+class TestCoalescer:
+    """Tests for burst coalescing of typing and character updates"""
+
+    @pytest.mark.asyncio
+    async def test_typing_burst_is_last_write_wins(self):
+        """A typing burst goes out once, with its final state"""
+        sink = RecordingSink()
+        coalescer = Coalescer(sink, window=0.01)
+        for is_typing in (True, True, True, False):
+            await coalescer.submit("c1", ("u1", "typing"), {"type": "typing", "is_typing": is_typing}, exclude="conn")
+
+        assert sink.sent == []
+        await asyncio.sleep(0.03)
+
+        assert sink.sent == [("c1", {"type": "typing", "is_typing": False}, "conn")]
+        assert (coalescer.received, coalescer.flushed) == (4, 1)
+
+    @pytest.mark.asyncio
+    async def test_character_updates_merge_deltas(self):
+        """Partial sheet updates in one window are merged, per sender"""
+        sink = RecordingSink()
+        coalescer = Coalescer(sink, window=0.01)
+        updates = [
+            {"atributos": {"fisicos": {"forca": 2}}},
+            {"atributos": {"fisicos": {"forca": 3, "vigor": 2}}},
+            {"fome": 2},
+        ]
+        for data in updates:
+            await coalescer.submit("c1", ("u1", "character_update", "ch1"),
+                                   {"type": "character_update", "data": data}, merge=merge_character_updates)
+        await coalescer.submit("c1", ("u2", "character_update", "ch2"),
+                               {"type": "character_update", "data": {"fome": 1}}, merge=merge_character_updates)
+        await asyncio.sleep(0.03)
+
+        merged = {message["data"].get("fome"): message["data"] for _, message, _ in sink.sent}
+        assert merged[2] == {"atributos": {"fisicos": {"forca": 3, "vigor": 2}}, "fome": 2}
+        assert merged[1] == {"fome": 1}
+
+    @pytest.mark.asyncio
+    async def test_flush_all_sends_pending(self):
+        """Shutdown flushes pending frames instead of losing them"""
+        sink = RecordingSink()
+        coalescer = Coalescer(sink, window=60)
+        await coalescer.submit("c1", ("u1", "typing"), {"type": "typing"})
+        await coalescer.flush_all()
+
+        assert len(sink.sent) == 1
+        assert coalescer.pending_count() == 0
+
+    def test_merge_deltas_replaces_non_dicts(self):
+        assert merge_deltas({"a": {"b": 1}}, {"a": 5}) == {"a": 5}
+        assert merge_deltas(None, {"a": 1}) == {"a": 1}
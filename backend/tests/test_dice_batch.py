@@ -0,0 +1,238 @@
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.api.deps import get_current_user
+from app.core.batch import roll_v5_batch, roll_v20_batch, tally_v5
+from app.core.entropy import DiceSource, dice_sources
+from app.core.v5.dice import V5CompactRoll, V5DiceRoller
+from app.core.v20.dice import V20CompactRoll, V20DiceRoller
+from app.main import app
+from app.models.character import Character
+from app.models.chronicle import Chronicle, ChronicleMember
+from app.models.dice_roll import DiceRoll
+from app.models.user import User
+from app.services.dice_service import dice_service
+
+
+class TestV5Batch:
+    """Tests for the vectorized V5 roller"""
+
+    def test_matches_scalar_scoring(self):
+        """Every batch result is what the scalar rules give for the same dice"""
+        rng = np.random.default_rng(5)
+        pools = rng.integers(1, 15, size=500)
+        rolls = roll_v5_batch(pools, hunger=rng.integers(0, 6, size=500), difficulty=rng.integers(0, 6, size=500), rng=rng)
+
+        assert [len(r.regular_dice) + len(r.hunger_dice) for r in rolls] == pools.tolist()
+        for roll in rolls:
+            assert V5DiceRoller.from_dice(roll.regular_dice, roll.hunger_dice, roll.difficulty) == roll
+
+    def test_hunger_is_capped_by_pool(self):
+        [roll] = roll_v5_batch([2], hunger=5)
+        assert roll.regular_dice == [] and len(roll.hunger_dice) == 2
+
+    def test_seeded_runs_repeat(self):
+        first = tally_v5([5, 8], rng=np.random.default_rng(42))
+        second = tally_v5([5, 8], rng=np.random.default_rng(42))
+        assert first.faces.tolist() == second.faces.tolist()
+
+
+class TestV20Batch:
+    """Tests for the vectorized V20 roller"""
+
+    def test_matches_scalar_scoring(self):
+        rng = np.random.default_rng(7)
+        count = 500
+        rolls = roll_v20_batch(
+            rng.integers(1, 15, size=count),
+            difficulty=rng.integers(2, 11, size=count),
+            specialty=rng.integers(0, 2, size=count).astype(bool),
+            willpower=[n % 3 == 0 for n in range(count)],
+            rng=rng,
+        )
+
+        assert any(r.specialty_rerolls for r in rolls)
+        for n, roll in enumerate(rolls):
+            assert V20DiceRoller.from_dice(roll.dice, roll.difficulty, roll.specialty_rerolls, n % 3 == 0) == roll
+
+    def test_only_specialty_rolls_reroll_tens(self):
+        rolls = roll_v20_batch([20] * 50, specialty=False, rng=np.random.default_rng(1))
+        assert all(r.specialty_rerolls == [] for r in rolls)
+        assert roll_v20_batch([]) == []
+
+
+class TestCompactRolls:
+    """Tests for the face-count form of roll results"""
+
+    def test_compact_batch_matches_full_rolls(self):
+        pools = [1, 4, 12, 30]
+        full = roll_v5_batch(pools, hunger=[0, 2, 5, 3], difficulty=3, rng=np.random.default_rng(9))
+        compact = roll_v5_batch(pools, hunger=[0, 2, 5, 3], difficulty=3, rng=np.random.default_rng(9), compact=True)
+        assert compact == [V5CompactRoll.from_roll(roll) for roll in full]
+        assert [roll.pool for roll in compact] == pools
+
+        full = roll_v20_batch(pools, specialty=True, rng=np.random.default_rng(9))
+        compact = roll_v20_batch(pools, specialty=True, rng=np.random.default_rng(9), compact=True)
+        assert compact == [V20CompactRoll.from_roll(roll) for roll in full]
+
+    def test_compact_roll_counts_faces(self):
+        roll = V5CompactRoll.from_roll(V5DiceRoller.from_dice([10, 6, 1], [10, 1], difficulty=2))
+        assert roll.regular_counts == (1, 0, 0, 0, 0, 1, 0, 0, 0, 1)
+        assert roll.hunger_counts == (1, 0, 0, 0, 0, 0, 0, 0, 0, 1)
+        assert (roll.pool, roll.hunger, roll.successes) == (5, 2, 5)
+        assert not hasattr(roll, "__dict__")
+
+    def test_compact_result_has_no_dice(self):
+        outcome = dice_service.roll_v5(20, hunger=3, compact=True)
+        assert (outcome.pool, outcome.hunger) == (20, 3)
+        assert outcome.result["compact"] and "regular_dice" not in outcome.result
+        assert sum(outcome.result["hunger_counts"]) == 3
+
+        outcome = dice_service.roll_v20(8, specialty=True, compact=True)
+        assert outcome.pool == 8 and sum(outcome.result["counts"]) == 8
+        assert sum(outcome.result["reroll_counts"]) == outcome.result["counts"][9]
+
+
+class TestBatchEndpoint:
+    """Tests for POST /api/dice/batch"""
+
+    def test_roll_many_keeps_spec_order(self):
+        specs = [
+            {"game_version": "v20", "pool": 4, "difficulty": 7},
+            {"game_version": "v5", "pool": 6, "hunger": 2},
+            {"game_version": "v20", "pool": 9, "specialty": True},
+        ]
+        outcomes = dice_service.roll_many(specs)
+
+        assert [(o.game_version, o.pool) for o in outcomes] == [("v20", 4), ("v5", 6), ("v20", 9)]
+        assert outcomes[0].difficulty == 7 and outcomes[2].difficulty == 6
+        assert outcomes[1].hunger == 2 and outcomes[1].difficulty == 1
+
+    def test_roll_many_draws_from_the_given_source(self):
+        specs = [{"game_version": "v5", "pool": 6, "hunger": 2}, {"game_version": "v20", "pool": 5, "specialty": True}]
+        first = dice_service.roll_many(specs, source=DiceSource(seed=9))
+        second = dice_service.roll_many(specs, source=DiceSource(seed=9))
+        assert [o.result for o in first] == [o.result for o in second]
+
+        replay = DiceSource(seed=9)
+        assert first[0].result["regular_dice"] + first[0].result["hunger_dice"] == replay.roll(6)
+        assert first[1].result["dice"] == replay.roll(5)
+
+    @pytest.mark.asyncio
+    async def test_seeded_chronicle_replays_batches(self, client, db_session):
+        db_session.add_all([
+            User(id="st", username="Narradora"),
+            Chronicle(id="c1", name="Noites de Sao Paulo", storyteller_id="st"),
+        ])
+        await db_session.commit()
+
+        body = {"chronicle_id": "c1", "rolls": [{"game_version": "v5", "pool": 7, "hunger": 3}] * 4}
+        app.dependency_overrides[get_current_user] = lambda: User(id="st", username="Narradora")
+        try:
+            dice_sources.seed("c1", 11)
+            first = await client.post("/api/dice/batch", json=body)
+            dice_sources.seed("c1", 11)
+            second = await client.post("/api/dice/batch", json=body)
+        finally:
+            dice_sources.release("c1")
+            app.dependency_overrides.pop(get_current_user, None)
+
+        def dice(response):
+            return [(r["regular_dice"], r["hunger_dice"]) for r in response.json()["rolls"]]
+
+        assert first.status_code == second.status_code == 200
+        assert dice(first) == dice(second)
+
+    @pytest.mark.asyncio
+    async def test_storyteller_batch_is_persisted(self, client, db_session):
+        db_session.add_all([
+            User(id="st", username="Narradora"),
+            User(id="p1", username="Ana"),
+            Chronicle(id="c1", name="Noites de Sao Paulo", storyteller_id="st"),
+            ChronicleMember(chronicle_id="c1", user_id="p1"),
+            Character(
+                id="ch1", name="Lucita", owner_id="p1", chronicle_id="c1", game_version="v5",
+                sheet={"atributos": {"fisicos": {"forca": 3}}, "habilidades": {"briga": 2}, "fome": 1},
+            ),
+        ])
+        await db_session.commit()
+
+        ghouls = [{"game_version": "v20", "pool": 5, "description": f"Carnical {n}"} for n in range(15)]
+        body = {
+            "chronicle_id": "c1",
+            "persist": True,
+            "compact": True,
+            "rolls": ghouls + [{"expression": "forca+briga, fome", "character_id": "ch1"}],
+        }
+        app.dependency_overrides[get_current_user] = lambda: User(id="st", username="Narradora")
+        try:
+            response = await client.post("/api/dice/batch", json=body)
+            missing = await client.post("/api/dice/batch", json={"persist": True, "rolls": [{"pool": 3}]})
+        finally:
+            app.dependency_overrides.pop(get_current_user, None)
+
+        assert response.status_code == 200
+        rolls = response.json()["rolls"]
+        assert [r["description"] for r in rolls[:15]] == [f"Carnical {n}" for n in range(15)]
+        assert (rolls[15]["game_version"], rolls[15]["pool"], rolls[15]["hunger"]) == ("v5", 5, 1)
+        assert sum(rolls[0]["counts"]) == 5 and "dice" not in rolls[0]
+        assert missing.status_code == 400
+
+        saved = (await db_session.execute(select(DiceRoll).where(DiceRoll.chronicle_id == "c1"))).scalars().all()
+        assert sorted(r.id for r in saved) == sorted(r["id"] for r in rolls)
+        assert all(r.result["compact"] for r in saved)
+
+    @pytest.mark.asyncio
+    async def test_players_only_save_rolls_of_their_own_characters(self, client, db_session):
+        db_session.add_all([
+            User(id="p1", username="Ana"),
+            User(id="p2", username="Bruno"),
+            Chronicle(id="c1", name="Noites de Sao Paulo", storyteller_id="st"),
+            Chronicle(id="c2", name="Outra", storyteller_id="st"),
+            ChronicleMember(chronicle_id="c1", user_id="p1"),
+            ChronicleMember(chronicle_id="c1", user_id="p2"),
+            Character(id="ch1", name="Lucita", owner_id="p1", chronicle_id="c1", game_version="v5", sheet={}),
+            Character(id="ch2", name="Beckett", owner_id="p2", chronicle_id="c1", game_version="v5", sheet={}),
+            Character(id="ch3", name="Theo", owner_id="p1", chronicle_id="c2", game_version="v5", sheet={}),
+        ])
+        await db_session.commit()
+
+        def batch(character_id=None):
+            return {"chronicle_id": "c1", "persist": True, "rolls": [{"pool": 3, "character_id": character_id}]}
+
+        def peek(character_id):
+            return {"chronicle_id": "c1", "rolls": [{"expression": "forca", "character_id": character_id}]}
+
+        app.dependency_overrides[get_current_user] = lambda: User(id="p1", username="Ana")
+        try:
+            own = await client.post("/api/dice/batch", json=batch("ch1"))
+            other_player = await client.post("/api/dice/batch", json=batch("ch2"))
+            npc = await client.post("/api/dice/batch", json=batch())
+            other_chronicle = await client.post("/api/dice/batch", json=batch("ch3"))
+            unknown = await client.post("/api/dice/batch", json=batch("fantasma"))
+            # Without persist, an expression would still show the other player's sheet
+            own_expression = await client.post("/api/dice/batch", json=peek("ch1"))
+            other_expression = await client.post("/api/dice/batch", json=peek("ch2"))
+        finally:
+            app.dependency_overrides.pop(get_current_user, None)
+
+        assert own.status_code == 200
+        assert (other_player.status_code, npc.status_code) == (403, 403)
+        assert (other_chronicle.status_code, unknown.status_code) == (404, 404)
+        assert (own_expression.status_code, other_expression.status_code) == (200, 403)
+        saved = (await db_session.execute(select(DiceRoll))).scalars().all()
+        assert [r.character_id for r in saved] == ["ch1"]
+
+    @pytest.mark.asyncio
+    async def test_outsiders_cannot_roll_into_a_chronicle(self, client, db_session):
+        db_session.add_all([User(id="x", username="Intrusa"), Chronicle(id="c2", name="Outra", storyteller_id="st")])
+        await db_session.commit()
+
+        app.dependency_overrides[get_current_user] = lambda: User(id="x", username="Intrusa")
+        try:
+            response = await client.post("/api/dice/batch", json={"chronicle_id": "c2", "rolls": [{"pool": 3}]})
+        finally:
+            app.dependency_overrides.pop(get_current_user, None)
+
+        assert response.status_code == 403
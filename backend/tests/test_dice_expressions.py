@@ -0,0 +1,118 @@
+import pytest
+
+from app.api.deps import get_current_user
+from app.core.expressions import ExpressionError, compile_expression
+from app.main import app
+from app.models.character import Character
+from app.models.chronicle import Chronicle, ChronicleMember
+from app.models.user import User
+
+V5_SHEET = {
+    "atributos": {"fisicos": {"forca": 3, "destreza": 2, "vigor": 2}},
+    "habilidades": {"briga": 2, "armasDeFogo": 1},
+    "disciplinas": {"disciplina1": {"nome": "Potência", "nivel": 2}},
+    "fome": 3,
+}
+
+V20_SHEET = {
+    "atributos": {"fisicos": {"forca": 4}, "mentais": {"percepcao": 3}},
+    "habilidades": {"talentos": {"briga": 3, "prontidao": 2, "consciencia": 1}},
+    "virtudes": {"consciencia": 4},
+    "disciplinas": {"rapidez": 2},
+}
+
+
+class TestCompileExpression:
+    """Tests for the dice expression compiler"""
+
+    def test_resolves_traits_constants_and_hunger(self):
+        resolved = compile_expression("Força + briga + 2, fome").resolve(V5_SHEET)
+        assert (resolved.pool, resolved.hunger) == (7, 3)
+        assert resolved.breakdown == (("forca", 3), ("briga", 2), ("modificador", 2), ("fome", 3))
+
+    def test_subtraction_disciplines_and_camel_case(self):
+        assert compile_expression("destreza+armasdefogo-1").resolve(V5_SHEET).pool == 2
+        assert compile_expression("forca + potencia").resolve(V5_SHEET).pool == 5
+        assert compile_expression("percepcao + prontidao + rapidez", "v20").resolve(V20_SHEET).pool == 7
+
+    def test_dotted_paths_and_missing_traits(self):
+        # Consciencia is a talent by name; the virtue needs its path
+        assert compile_expression("consciencia", "v20").resolve(V20_SHEET).pool == 1
+        assert compile_expression("virtudes.consciencia", "v20").resolve(V20_SHEET).pool == 4
+        # Unlearned traits count as 0, but the pool never drops below 1
+        assert compile_expression("ocultismo + medicina").resolve(V5_SHEET).pool == 1
+
+    @pytest.mark.parametrize("expression, version", [
+        ("forca + auspicios", "v5"), ("forca+brga", "v5"), ("atributos.fisicos.forca + habilidades.brga", "v5"),
+        ("forca + potencia", "v20"), ("virtudes.coragem", "v20"),
+    ])
+    def test_unknown_names_fail_to_resolve(self, expression, version):
+        """Typos are errors, not silent zeros"""
+        plan = compile_expression(expression, version)
+        with pytest.raises(ExpressionError):
+            plan.resolve(V5_SHEET if version == "v5" else V20_SHEET)
+
+    def test_renamed_v5_keys(self):
+        migrated = {"atributos": {"sociais": {"autocontrole": 3}}, "habilidades": {"ladroagem": 2}}
+        legacy = {"atributos": {"sociais": {"compostura": 3}}, "habilidades": {"furto": 2}}
+        for expression in ("autocontrole + ladroagem", "compostura + furto"):
+            plan = compile_expression(expression)
+            assert plan.resolve(migrated).pool == plan.resolve(legacy).pool == 5
+
+    def test_hunger_is_capped(self):
+        resolved = compile_expression("forca, fome + 9").resolve(V5_SHEET)
+        assert (resolved.pool, resolved.hunger) == (3, 3)
+
+    def test_plans_are_cached(self):
+        assert compile_expression("forca+briga", "v5") is compile_expression("forca+briga", "v5")
+        assert compile_expression("forca+briga", "v5") is not compile_expression("forca+briga", "v20")
+
+    @pytest.mark.parametrize("expression, version", [
+        ("", "v5"), ("forca +", "v5"), ("+ forca", "v5"), ("forca briga", "v5"),
+        ("forca * 2", "v5"), ("forca, fome, 1", "v5"), ("forca, fome", "v20"),
+    ])
+    def test_rejects_invalid_expressions(self, expression, version):
+        with pytest.raises(ExpressionError):
+            compile_expression(expression, version)
+
+
+class TestExpressionEndpoint:
+    """Tests for GET /api/dice/expression"""
+
+    @pytest.mark.asyncio
+    async def test_resolves_for_owner_only(self, client, db_session):
+        db_session.add_all([
+            User(id="u1", username="Ana"),
+            User(id="u2", username="Bruno"),
+            User(id="u3", username="Carla"),
+            User(id="st", username="Narradora"),
+            Chronicle(id="c1", name="Noites de Sao Paulo", storyteller_id="st"),
+            ChronicleMember(chronicle_id="c1", user_id="u1"),
+            ChronicleMember(chronicle_id="c1", user_id="u3"),
+            Character(id="ch1", name="Lucita", owner_id="u1", game_version="v5", sheet=V5_SHEET),
+            Character(id="ch2", name="Beckett", owner_id="u1", chronicle_id="c1", game_version="v5", sheet=V5_SHEET),
+        ])
+        await db_session.commit()
+
+        try:
+            app.dependency_overrides[get_current_user] = lambda: User(id="u1", username="Ana")
+            ok = await client.get("/api/dice/expression", params={"expression": "forca+briga, fome", "character_id": "ch1"})
+            invalid = await client.get("/api/dice/expression", params={"expression": "forca+", "character_id": "ch1"})
+            typo = await client.get("/api/dice/expression", params={"expression": "forca+brga", "character_id": "ch1"})
+            app.dependency_overrides[get_current_user] = lambda: User(id="u2", username="Bruno")
+            denied = await client.get("/api/dice/expression", params={"expression": "forca", "character_id": "ch1"})
+            app.dependency_overrides[get_current_user] = lambda: User(id="u3", username="Carla")
+            other_sheet = {"expression": "forca", "character_id": "ch2"}
+            member = await client.get("/api/dice/expression", params=other_sheet)
+            app.dependency_overrides[get_current_user] = lambda: User(id="st", username="Narradora")
+            storyteller = await client.get("/api/dice/expression", params=other_sheet)
+        finally:
+            app.dependency_overrides.pop(get_current_user, None)
+
+        assert ok.status_code == 200
+        assert (ok.json()["pool"], ok.json()["hunger"]) == (5, 3)
+        assert invalid.status_code == typo.status_code == 400
+        assert denied.status_code == 403
+        # Sharing a chronicle does not give access to another player's sheet
+        assert member.status_code == 403
+        assert storyteller.status_code == 200
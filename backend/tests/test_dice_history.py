@@ -0,0 +1,96 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+
+from app.api.deps import get_current_user
+from app.main import app
+from app.models.chronicle import Chronicle, ChronicleMember
+from app.models.dice_roll import DiceRoll
+from app.models.user import User
+
+
+@pytest.fixture
+async def table(db_session):
+    """A chronicle with a storyteller, a player and 25 rolls (every fifth one secret, by the storyteller)"""
+    storyteller = User(id="st", username="Narradora")
+    player = User(id="p1", username="Ana")
+    chronicle = Chronicle(id="c1", name="Noites de Sao Paulo", storyteller_id="st")
+    db_session.add_all([storyteller, player, chronicle, ChronicleMember(chronicle_id="c1", user_id="p1")])
+
+    start = datetime(2026, 1, 1, 20, 0)
+    for n in range(25):
+        secret = n % 5 == 0
+        db_session.add(DiceRoll(
+            id=str(uuid.uuid4()),
+            chronicle_id="c1",
+            roller_id="st" if secret else "p1",
+            character_id="ch1" if n % 2 else None,
+            game_version="v5",
+            roll_type="rouse" if n % 3 == 0 else "standard",
+            pool=5,
+            successes=n,
+            is_secret=secret,
+            # Pairs of rolls share a timestamp to exercise the id tie-breaker
+            created_at=start + timedelta(seconds=n // 2),
+        ))
+    await db_session.commit()
+    yield {"st": storyteller, "p1": player}
+    app.dependency_overrides.pop(get_current_user, None)
+
+
+def login(user: User):
+    app.dependency_overrides[get_current_user] = lambda: user
+
+
+async def read_all(client: AsyncClient, **params) -> list:
+    rolls, cursor = [], None
+    while True:
+        query = dict(params, limit=4, **({"cursor": cursor} if cursor else {}))
+        response = await client.get("/api/dice/history/c1", params=query)
+        assert response.status_code == 200
+        page = response.json()
+        rolls.extend(page["rolls"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return rolls
+
+
+class TestRollHistory:
+    """Tests for keyset-paginated roll history"""
+
+    @pytest.mark.asyncio
+    async def test_pages_cover_every_roll_once_newest_first(self, client: AsyncClient, table):
+        login(table["st"])
+        rolls = await read_all(client)
+
+        assert [r["successes"] // 2 for r in rolls] == sorted((n // 2 for n in range(25)), reverse=True)
+        assert len({r["id"] for r in rolls}) == 25
+        keys = [(r["created_at"], r["id"]) for r in rolls]
+        assert keys == sorted(keys, reverse=True)
+
+    @pytest.mark.asyncio
+    async def test_players_do_not_see_others_secret_rolls(self, client: AsyncClient, table):
+        login(table["p1"])
+        rolls = await read_all(client)
+
+        assert len(rolls) == 20
+        assert not any(r["is_secret"] for r in rolls)
+
+    @pytest.mark.asyncio
+    async def test_filters(self, client: AsyncClient, table):
+        login(table["st"])
+
+        by_character = await read_all(client, character_id="ch1")
+        assert len(by_character) == 12 and all(r["character_id"] == "ch1" for r in by_character)
+        rouse = await read_all(client, roll_type="rouse", roller_id="p1")
+        assert {r["successes"] for r in rouse} == {3, 6, 9, 12, 18, 21, 24}
+
+    @pytest.mark.asyncio
+    async def test_bad_cursor_and_outsiders_are_rejected(self, client: AsyncClient, table):
+        login(table["p1"])
+        assert (await client.get("/api/dice/history/c1", params={"cursor": "lixo"})).status_code == 400
+
+        login(User(id="intruso", username="Intruso"))
+        assert (await client.get("/api/dice/history/c1")).status_code == 403
@@ -0,0 +1,102 @@
+import itertools
+from collections import Counter
+
+import pytest
+
+from app.api.deps import get_current_user
+from app.core.v5.dice import V5DiceRoller
+from app.core.v5.odds import v5_odds
+from app.core.v20.dice import V20DiceRoller
+from app.core.v20.odds import v20_odds
+from app.main import app
+from app.models.user import User
+
+
+def brute_force(pool: int, hunger: int, difficulty: int):
+    """Score every one of the 10^pool outcomes with the real roller"""
+    results, successes = Counter(), Counter()
+    for faces in itertools.product(range(1, 11), repeat=pool):
+        roll = V5DiceRoller.from_dice(list(faces[:pool - hunger]), list(faces[pool - hunger:]), difficulty)
+        results[roll.result_type.value] += 1
+        successes[roll.successes] += 1
+    total = 10 ** pool
+    return {k: n / total for k, n in results.items()}, {k: n / total for k, n in successes.items()}
+
+
+class TestV5Odds:
+    """Tests for the exact V5 odds calculator"""
+
+    @pytest.mark.parametrize("pool, hunger, difficulty", [(1, 1, 1), (3, 0, 2), (4, 2, 3), (4, 4, 5)])
+    def test_matches_exhaustive_enumeration(self, pool, hunger, difficulty):
+        odds = v5_odds(pool, hunger, difficulty)
+        results, successes = brute_force(pool, hunger, difficulty)
+
+        for name, probability in odds.results.items():
+            assert probability == pytest.approx(results.get(name, 0), abs=1e-12)
+        assert odds.to_dict()["successes"] == pytest.approx(successes, abs=1e-12)
+
+    def test_distributions_sum_to_one(self):
+        odds = v5_odds(20, 5, 6)
+        assert sum(odds.successes) == pytest.approx(1)
+        assert sum(odds.results.values()) == pytest.approx(1)
+        assert odds.success_chance == pytest.approx(
+            odds.results["success"] + odds.results["critical"] + odds.results["messy_critical"]
+        )
+
+    def test_memoized_and_hunger_capped(self):
+        assert v5_odds(7, 2, 3) is v5_odds(7, 2, 3)
+        assert v5_odds(2, 5, 1).hunger == 2
+
+
+class TestV5OddsAPI:
+    """Tests for /api/dice/v5/odds"""
+
+    @pytest.mark.asyncio
+    async def test_odds_endpoint(self, client):
+        app.dependency_overrides[get_current_user] = lambda: User(id="u1", username="Ana")
+        try:
+            response = await client.get("/api/dice/v5/odds", params={"pool": 6, "hunger": 2, "difficulty": 3})
+            invalid = await client.get("/api/dice/v5/odds", params={"pool": 0})
+            v20 = await client.get("/api/dice/v20/odds", params={"pool": 5, "difficulty": 7, "specialty": True})
+        finally:
+            app.dependency_overrides.pop(get_current_user, None)
+
+        assert response.status_code == 200
+        assert response.json()["success_chance"] == pytest.approx(v5_odds(6, 2, 3).success_chance)
+        assert invalid.status_code == 422
+        assert v20.json()["botch_chance"] == pytest.approx(v20_odds(5, 7, True).results["botch"])
+
+
+def brute_force_v20(pool: int, difficulty: int, specialty: bool, willpower: bool):
+    """Score every outcome, rerolls of 10s included, with the real roller"""
+    results = Counter()
+    for faces in itertools.product(range(1, 11), repeat=pool):
+        tens = faces.count(10) if specialty else 0
+        weight = 10 ** (3 - tens)  # Common denominator 10^(pool + 3) for up to 3 rerolls
+        for rerolls in itertools.product(range(1, 11), repeat=tens):
+            roll = V20DiceRoller.from_dice(list(faces), difficulty, list(rerolls), willpower)
+            results[roll.result_type.value] += weight
+    total = 10 ** (pool + 3)
+    return {k: n / total for k, n in results.items()}
+
+
+class TestV20Odds:
+    """Tests for the exact V20 odds engine"""
+
+    @pytest.mark.parametrize("pool, difficulty, specialty, willpower", [
+        (1, 6, False, False), (3, 2, True, False), (3, 10, True, True), (3, 7, False, True), (2, 8, True, False),
+    ])
+    def test_matches_exhaustive_enumeration(self, pool, difficulty, specialty, willpower):
+        odds = v20_odds(pool, difficulty, specialty, willpower)
+        expected = brute_force_v20(pool, difficulty, specialty, willpower)
+
+        for name, probability in odds.results.items():
+            assert probability == pytest.approx(expected.get(name, 0), abs=1e-12)
+
+    def test_willpower_prevents_botch(self):
+        assert v20_odds(5, 8, willpower=True).results["botch"] == 0
+        assert v20_odds(1, 6).results["botch"] == pytest.approx(0.1)
+
+    def test_difficulty_is_clamped_and_cached(self):
+        assert v20_odds(4, 12) is v20_odds(4, 12)
+        assert v20_odds(4, 12).difficulty == 10
@@ -0,0 +1,117 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.api.deps import get_current_user
+from app.main import app
+from app.models.chronicle import Chronicle, ChronicleMember
+from app.models.user import User
+from app.services.dice_service import RollOutcome, dice_service
+from app.services.dice_stats import dice_stats
+from app.services.write_behind import DiceRollWriter
+from tests.conftest import test_async_session as session_factory
+
+
+def roll_row(result_type: str, successes: int, character_id=None, session_id=None, **overrides) -> dict:
+    outcome = RollOutcome(
+        game_version="v5", roll_type="standard", pool=5, difficulty=1, hunger=2,
+        result={"result_type": result_type}, successes=successes,
+    )
+    row = dice_service.to_row(
+        outcome, str(uuid.uuid4()), "c1", "p1", character_id=character_id, session_id=session_id,
+    )
+    row.update(overrides)
+    return row
+
+
+async def write(rows):
+    writer = DiceRollWriter(session_factory=session_factory)
+    for row in rows:
+        await writer.submit(row)
+    await writer.stop()
+
+
+class TestDiceStats:
+    """Tests for the incrementally maintained dice statistics"""
+
+    @pytest.mark.asyncio
+    async def test_rolls_update_every_scope(self, db_session):
+        await write([
+            roll_row("messy_critical", 4, "ch1", "s1"),
+            roll_row("bestial_failure", 0, "ch1", "s1"),
+            roll_row("success", 2, "ch2", "s1"),
+        ])
+        await write([roll_row("success", 3, "ch1", "s2")])
+
+        chronicle = await dice_stats.get(db_session, "c1")
+        assert chronicle["rolls"] == 4
+        assert chronicle["histogram"] == {4: 1, 0: 1, 2: 1, 3: 1}
+
+        lucita = await dice_stats.get(db_session, "c1", character_id="ch1")
+        assert lucita["rolls"] == 3
+        assert lucita["messy_critical_rate"] == pytest.approx(1 / 3)
+        assert lucita["average_successes"] == pytest.approx(7 / 3)
+        assert lucita["hunger_dice"] == 6
+
+        first_night = await dice_stats.get(db_session, "c1", character_id="ch1", session_id="s1")
+        assert first_night["results"] == {"messy_critical": 1, "bestial_failure": 1}
+        assert (await dice_stats.get(db_session, "c1", session_id="s1"))["rolls"] == 3
+
+    @pytest.mark.asyncio
+    async def test_secret_rolls_and_rouse_checks_are_not_counted(self, db_session):
+        rouse = dice_service.to_row(dice_service.rouse_check(), str(uuid.uuid4()), "c1", "p1")
+        await write([roll_row("critical", 4, is_secret=True), rouse, roll_row("failure", 0)])
+
+        stats = await dice_stats.get(db_session, "c1")
+        assert stats["rolls"] == 1 and stats["results"] == {"failure": 1}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_writers_create_the_same_rows(self, db_session):
+        """Two workers folding in the first rolls of a scope both land, without a duplicate key"""
+        async with session_factory() as first, session_factory() as second:
+            await dice_stats.apply(first, [roll_row("success", 2, "ch1")])
+            # The second writer waits on the first one's uncommitted rows, then adds to them
+            pending = asyncio.create_task(dice_stats.apply(second, [roll_row("critical", 4, "ch1")]))
+            await asyncio.sleep(0.05)
+            await first.commit()
+            await pending
+            await second.commit()
+
+        stats = await dice_stats.get(db_session, "c1", character_id="ch1")
+        assert (stats["rolls"], stats["successes"]) == (2, 6)
+        assert stats["results"] == {"success": 1, "critical": 1}
+        assert stats["histogram"] == {2: 1, 4: 1}
+
+    @pytest.mark.asyncio
+    async def test_rebuild_matches_incremental(self, db_session):
+        await write([roll_row("success", n % 4, f"ch{n % 3}", "s1") for n in range(30)])
+        before = await dice_stats.get(db_session, "c1", character_id="ch1")
+
+        async with session_factory() as db:
+            assert await dice_stats.rebuild(db, "c1") == 30
+            await db.commit()
+
+        async with session_factory() as db:
+            assert await dice_stats.get(db, "c1", character_id="ch1") == before
+
+    @pytest.mark.asyncio
+    async def test_stats_endpoint(self, client, db_session):
+        db_session.add_all([
+            User(id="p1", username="Ana"),
+            Chronicle(id="c1", name="Noites de Sao Paulo", storyteller_id="st"),
+            ChronicleMember(chronicle_id="c1", user_id="p1"),
+        ])
+        await db_session.commit()
+        await write([roll_row("messy_critical", 4, "ch1"), roll_row("success", 1, "ch1")])
+
+        app.dependency_overrides[get_current_user] = lambda: User(id="p1", username="Ana")
+        try:
+            response = await client.get("/api/dice/stats/c1", params={"character_id": "ch1"})
+            empty = await client.get("/api/dice/stats/c1", params={"session_id": "nenhuma"})
+        finally:
+            app.dependency_overrides.pop(get_current_user, None)
+
+        assert response.status_code == 200
+        assert response.json()["messy_critical_rate"] == 0.5
+        assert empty.json()["rolls"] == 0
@@ -0,0 +1,114 @@
+from collections import Counter
+
+import pytest
+
+from app.api.deps import get_current_user
+from app.core.entropy import DiceSource, DiceSources, _csprng_faces, dice_sources
+from app.core.v5.dice import V5DiceRoller
+from app.core.v20.dice import V20DiceRoller
+from app.main import app
+from app.models.chronicle import Chronicle, ChronicleMember
+from app.models.user import User
+from app.utils.helpers import roll_dice
+
+
+class TestDiceSource:
+    """Tests for the buffered d10 source"""
+
+    def test_faces_are_d10(self):
+        faces = DiceSource().roll(20_000)
+        counts = Counter(faces)
+        assert set(counts) == set(range(1, 11))
+        # Each face within ~10% of its expected 2000
+        assert all(1800 < n < 2200 for n in counts.values())
+
+    def test_csprng_faces_have_requested_length(self):
+        assert len(_csprng_faces(1)) == 1
+        assert len(_csprng_faces(10_000)) == 10_000
+
+    def test_seeded_stream_survives_buffer_refills(self):
+        small = DiceSource(seed=42, buffer_size=7)
+        large = DiceSource(seed=42, buffer_size=7)
+        # The same stream read as single dice and as pools of various sizes
+        singles = [small.d10() for _ in range(40)]
+        pools = large.roll(3) + large.roll(12) + [large.d10()] + large.roll(24)
+        assert singles == pools
+
+    def test_bulk_faces_read_the_same_stream(self):
+        singles = DiceSource(seed=42, buffer_size=7)
+        bulk = DiceSource(seed=42, buffer_size=7)
+        expected = singles.roll(60)
+        faces = bulk.roll(2) + bulk.faces(3).tolist() + bulk.faces(20).tolist() + bulk.roll(5) + bulk.faces(30).tolist()
+        assert faces == expected
+        assert bulk.faces(0).tolist() == []
+
+    def test_unseeded_sources_differ(self):
+        assert DiceSource().roll(50) != DiceSource().roll(50)
+
+
+class TestDiceSources:
+    """Tests for the per-chronicle source registry"""
+
+    def test_unseeded_chronicles_share_the_default(self):
+        sources = DiceSources()
+        assert sources.for_chronicle("c1") is sources.default
+        assert sources.for_chronicle(None) is sources.default
+
+    def test_seeded_chronicle_replays_rolls(self):
+        sources = DiceSources()
+        sources.seed("c1", 7)
+        first = [V5DiceRoller.roll(6, 2, source=sources.for_chronicle("c1")) for _ in range(5)]
+        sources.seed("c1", 7)
+        second = [V5DiceRoller.roll(6, 2, source=sources.for_chronicle("c1")) for _ in range(5)]
+        assert first == second
+
+        sources.release("c1")
+        assert sources.for_chronicle("c1") is sources.default
+
+    def test_all_rollers_draw_from_the_source(self):
+        source, replay = DiceSource(seed=3), DiceSource(seed=3)
+        roll = V20DiceRoller.roll(8, 6, specialty=True, source=source)
+        _, rouse = V5DiceRoller.rouse_check(reroll=True, source=source)
+
+        expected = replay.roll(8)
+        assert roll.dice == expected
+        assert roll.specialty_rerolls == replay.roll(expected.count(10))
+        assert rouse[0] == replay.d10()
+
+    def test_helpers_use_the_shared_source(self):
+        faces = roll_dice(30)
+        assert len(faces) == 30 and all(1 <= f <= 10 for f in faces)
+
+
+class TestChronicleSourceAccess:
+    """Tests for which requests may draw from a chronicle's stream"""
+
+    @pytest.mark.asyncio
+    async def test_only_members_draw_from_a_chronicle_stream(self, client, db_session):
+        db_session.add_all([
+            User(id="p1", username="Ana"),
+            User(id="x", username="Intrusa"),
+            Chronicle(id="c1", name="Noites de Sao Paulo", storyteller_id="st"),
+            ChronicleMember(chronicle_id="c1", user_id="p1"),
+        ])
+        await db_session.commit()
+
+        dice_sources.seed("c1", 5)
+        replay = DiceSource(seed=5)
+        try:
+            app.dependency_overrides[get_current_user] = lambda: User(id="x", username="Intrusa")
+            denied = [
+                await client.post("/api/dice/v5/roll", json={"pool": 5, "chronicle_id": "c1"}),
+                await client.post("/api/dice/v20/roll", json={"pool": 5, "chronicle_id": "c1"}),
+                await client.post("/api/dice/v5/rouse", json={"chronicle_id": "c1"}),
+            ]
+            app.dependency_overrides[get_current_user] = lambda: User(id="p1", username="Ana")
+            member = await client.post("/api/dice/v5/roll", json={"pool": 5, "chronicle_id": "c1"})
+        finally:
+            dice_sources.release("c1")
+            app.dependency_overrides.pop(get_current_user, None)
+
+        assert [r.status_code for r in denied] == [403, 403, 403]
+        # The outsider did not consume the seeded stream
+        assert member.status_code == 200
+        assert member.json()["regular_dice"] == replay.roll(5)
@@ -0,0 +1,53 @@
+import pytest
+
+from app.models.game_session import GameSession
+from app.services.backplane import InMemoryBackplane, InMemoryBroker
+from app.services.session_registry import SessionRegistry
+
+
+class TestSessionRegistry:
+    """Tests for the in-process active session registry"""
+
+    @pytest.mark.asyncio
+    async def test_warm_loads_active_sessions(self, db_session):
+        """Only active sessions are loaded at startup"""
+        db_session.add_all([
+            GameSession(id="s1", chronicle_id="c1", is_active=True, active_scene_id="sc1", started_by_id="u1"),
+            GameSession(id="s0", chronicle_id="c2", is_active=False, started_by_id="u1"),
+        ])
+        await db_session.commit()
+
+        registry = SessionRegistry()
+        await registry.warm(db_session)
+
+        assert registry.session_id("c1") == "s1"
+        assert registry.get("c1").scene_id == "sc1"
+        assert registry.session_id("c2") is None
+
+    @pytest.mark.asyncio
+    async def test_start_scene_and_end(self):
+        """Scene changes only apply to the session that is still active"""
+        registry = SessionRegistry()
+        await registry.activate("c1", "s1")
+        await registry.set_scene("c1", "s1", "sc1")
+        await registry.set_scene("c1", "old", "sc2")
+        assert registry.get("c1").scene_id == "sc1"
+
+        await registry.deactivate("c1", "old")
+        assert registry.session_id("c1") == "s1"
+        await registry.deactivate("c1", "s1")
+        assert registry.get("c1") is None
+
+    @pytest.mark.asyncio
+    async def test_changes_reach_other_workers(self):
+        """A session started on one worker is visible on every worker"""
+        broker = InMemoryBroker()
+        registry_a, registry_b = SessionRegistry(), SessionRegistry()
+        registry_a.attach(InMemoryBackplane(broker))
+        registry_b.attach(InMemoryBackplane(broker))
+
+        await registry_a.activate("c1", "s1")
+        assert registry_b.session_id("c1") == "s1"
+
+        await registry_b.deactivate("c1", "s1")
+        assert registry_a.session_id("c1") is None
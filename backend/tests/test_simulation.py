@@ -0,0 +1,110 @@
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from app.api.deps import get_current_user
+from app.core.v20.odds import v20_odds
+from app.main import app
+from app.models.user import User
+from app.services.simulation import SimulationService, simulation_service, wilson_interval
+
+
+async def collect(service, *args, **kwargs):
+    return [update async for update in service.run(*args, **kwargs)]
+
+
+@pytest.fixture
+def service():
+    executor = ThreadPoolExecutor(max_workers=2)
+    yield SimulationService(executor=executor, cache_size=2)
+    executor.shutdown()
+
+
+class TestSimulationService:
+    """Tests for the Monte Carlo simulation service"""
+
+    @pytest.mark.asyncio
+    async def test_resisted_matches_exact_odds(self, service):
+        updates = await collect(service, "v20_resisted", {"attacker_pool": 4, "defender_pool": 3}, 200_000, seed=7)
+        attacker, defender = v20_odds(4, 6).successes, v20_odds(3, 6).successes
+        exact = sum(pa * pd for a, pa in enumerate(attacker) for d, pd in enumerate(defender) if a > d)
+
+        win = updates[-1]["estimates"]["attacker_wins"]
+        assert win["ci_low"] - 0.005 <= exact <= win["ci_high"] + 0.005
+        assert updates[-1]["trials_done"] == 200_000
+
+    @pytest.mark.asyncio
+    async def test_streams_progress_before_result(self, service):
+        # 30 dice per trial -> several chunks
+        updates = await collect(service, "v20_extended", {"pool": 3, "max_rolls": 10}, 200_000, seed=1)
+
+        assert [u["type"] for u in updates[:-1]] == ["progress"] * (len(updates) - 1)
+        assert len(updates) > 1
+        assert updates[-1]["type"] == "result"
+        done = [u["trials_done"] for u in updates]
+        assert done == sorted(done)
+
+    @pytest.mark.asyncio
+    async def test_extended_outcomes_are_consistent(self, service):
+        params = {"pool": 6, "difficulty": 6, "target_successes": 4, "max_rolls": 5}
+        result = (await collect(service, "v20_extended", params, 20_000, seed=3))[-1]["estimates"]
+
+        assert result["success"]["estimate"] + result["botch"]["estimate"] <= 1
+        assert 1 <= result["rolls_taken"]["estimate"] <= 5
+        # Six dice at difficulty 6 average ~2.5 successes, so four usually take two rolls
+        assert result["success"]["estimate"] > 0.9
+
+    @pytest.mark.asyncio
+    async def test_same_seed_is_reproducible_and_cached(self, service):
+        first = await collect(service, "v5_contested", {"attacker_pool": 5, "attacker_hunger": 2}, 5000, seed=11)
+        second = await collect(service, "v5_contested", {"attacker_pool": 5, "attacker_hunger": 2}, 5000, seed=11)
+
+        assert first[-1]["cached"] is False
+        assert second == [{**first[-1], "cached": True}]
+
+    @pytest.mark.asyncio
+    async def test_cache_is_bounded(self, service):
+        for seed in range(3):
+            await collect(service, "v5_contested", {}, 1000, seed=seed)
+        assert len(service._cache) == 2
+
+    @pytest.mark.asyncio
+    async def test_runs_in_worker_processes(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            updates = await collect(SimulationService(executor=executor), "v5_contested", {}, 2000, seed=5)
+        estimates = updates[-1]["estimates"]
+        total = sum(estimates[k]["estimate"] for k in ("attacker_wins", "ties", "defender_wins"))
+        assert total == pytest.approx(1)
+
+    def test_wilson_interval(self):
+        low, high = wilson_interval(50, 100)
+        assert low < 0.5 < high
+        assert wilson_interval(0, 100)[0] == pytest.approx(0)
+
+
+class TestSimulationEndpoint:
+    """Tests for POST /api/dice/simulate"""
+
+    @pytest.mark.asyncio
+    async def test_streams_ndjson(self, client, monkeypatch):
+        executor = ThreadPoolExecutor(max_workers=2)
+        monkeypatch.setattr(simulation_service, "_executor", executor)
+        app.dependency_overrides[get_current_user] = lambda: User(id="u1", username="Ana")
+        try:
+            response = await client.post("/api/dice/simulate", json={
+                "scenario": "v20_resisted", "attacker_pool": 6, "defender_pool": 2, "trials": 2000, "seed": 2,
+            })
+            too_many = await client.post("/api/dice/simulate", json={"scenario": "v5_contested", "trials": 10 ** 9})
+        finally:
+            app.dependency_overrides.pop(get_current_user, None)
+            monkeypatch.setattr(simulation_service, "_executor", None)
+            executor.shutdown()
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines[-1]["type"] == "result"
+        assert lines[-1]["params"]["attacker_pool"] == 6
+        assert lines[-1]["estimates"]["attacker_wins"]["estimate"] > 0.5
+        assert too_many.status_code == 400
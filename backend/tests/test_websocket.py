@@ -0,0 +1,647 @@
+import asyncio
+import json
+from datetime import datetime
+import msgpack
+import pytest
+
+from app.api import websocket as ws_module
+from app.api.auth import create_access_token
+from app.api.deps import get_current_user
+from app.api.websocket import ConnectionManager, WireProtocol, negotiate_protocol, parse_topics
+from app.main import app
+from app.models.character import Character
+from app.models.chronicle import Chronicle, ChronicleMember
+from app.models.user import User
+from app.services.backplane import InMemoryBackplane, InMemoryBroker
+from tests.conftest import test_async_session as session_factory
+
+
+class FakeWebSocket:
+    """Minimal stand-in for a Starlette WebSocket"""
+
+    def __init__(self, stalled: bool = False):
+        self.sent = []
+        self.closed_with = None
+        self._gate = asyncio.Event()
+        if not stalled:
+            self._gate.set()
+
+    async def accept(self, subprotocol: str = None):
+        pass
+
+    async def send_text(self, data: str):
+        await self._gate.wait()
+        self.sent.append(json.loads(data))
+
+    async def send_bytes(self, data: bytes):
+        await self._gate.wait()
+        self.sent.append(msgpack.unpackb(data))
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+@pytest.fixture(autouse=True)
+def no_replay_grace(monkeypatch):
+    """Unsubscribe right away so tests leave no pending timers behind"""
+    monkeypatch.setattr(ws_module.settings, "WS_REPLAY_GRACE_SECONDS", 0)
+
+
+async def settle():
+    """Let writer tasks drain their queues"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestConnectionManagerFanOut:
+    """Tests for queued, per-connection fan-out"""
+
+    @pytest.mark.asyncio
+    async def test_stalled_client_does_not_block_others(self):
+        """A stalled socket must not delay delivery to the rest of the table"""
+        manager = ConnectionManager(queue_size=4)
+        slow_ws, fast_ws = FakeWebSocket(stalled=True), FakeWebSocket()
+        slow = await manager.connect(slow_ws, "c1", "u1", "Slow")
+        fast = await manager.connect(fast_ws, "c1", "u2", "Fast")
+
+        await manager.broadcast("c1", {"type": "ping", "n": 1})
+        await settle()
+
+        assert fast_ws.sent == [{"type": "ping", "n": 1, "seq": 1, "prev_seq": 0}]
+        assert slow_ws.sent == []
+        await manager.disconnect(slow, "c1")
+        await manager.disconnect(fast, "c1")
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest_keeps_latest_messages(self):
+        """Full queues discard the oldest pending frame"""
+        manager = ConnectionManager(queue_size=2, overflow_policy="drop_oldest")
+        ws = FakeWebSocket(stalled=True)
+        conn = await manager.connect(ws, "c1", "u1", "Slow")
+        await settle()
+
+        for n in range(4):
+            await manager.broadcast("c1", {"type": "tick", "n": n})
+
+        assert [json.loads(frame)["n"] for _, frame in conn.outbox] == [2, 3]
+        assert conn.dropped == 2
+        await manager.disconnect(conn, "c1")
+
+    @pytest.mark.asyncio
+    async def test_coalesce_replaces_same_type(self):
+        """Coalesce policy keeps one pending frame per (type, user)"""
+        manager = ConnectionManager(queue_size=2, overflow_policy="coalesce")
+        ws = FakeWebSocket(stalled=True)
+        conn = await manager.connect(ws, "c1", "u1", "Slow")
+        await settle()
+
+        await manager.broadcast("c1", {"type": "typing", "user_id": "u2", "is_typing": True})
+        await manager.broadcast("c1", {"type": "chat_message", "user_id": "u2"})
+        await manager.broadcast("c1", {"type": "typing", "user_id": "u2", "is_typing": False})
+
+        pending = [json.loads(frame) for _, frame in conn.outbox]
+        assert [m["type"] for m in pending] == ["chat_message", "typing"]
+        assert pending[-1]["is_typing"] is False
+        await manager.disconnect(conn, "c1")
+
+    @pytest.mark.asyncio
+    async def test_disconnect_policy_drops_slow_client(self):
+        """Disconnect policy removes and closes a client whose queue is full"""
+        manager = ConnectionManager(queue_size=1, overflow_policy="disconnect")
+        ws = FakeWebSocket(stalled=True)
+        await manager.connect(ws, "c1", "u1", "Slow")
+        await settle()
+
+        await manager.broadcast("c1", {"type": "tick", "n": 0})
+        await manager.broadcast("c1", {"type": "tick", "n": 1})
+        await settle()
+
+        assert await manager.get_online_users("c1") == []
+        assert ws.closed_with == 1013
+
+    @pytest.mark.asyncio
+    async def test_broadcast_encodes_once(self, monkeypatch):
+        """The payload is serialized once, not once per recipient"""
+        calls = []
+
+        def counting_dumps(message):
+            calls.append(message)
+            return json.dumps(message)
+
+        manager = ConnectionManager()
+        sockets = [FakeWebSocket() for _ in range(3)]
+        conns = [await manager.connect(ws, "c1", f"u{i}", "Player") for i, ws in enumerate(sockets)]
+        await settle()
+        for ws in sockets:
+            ws.sent.clear()
+        monkeypatch.setattr(ws_module, "dumps_json", counting_dumps)
+
+        await manager.broadcast("c1", {"type": "scene_updated", "data": {}})
+        await settle()
+
+        assert len(calls) == 1
+        assert all(ws.sent == [{"type": "scene_updated", "data": {}, "seq": 1, "prev_seq": 0}] for ws in sockets)
+        for conn in conns:
+            await manager.disconnect(conn, "c1")
+
+
+class TestBackplane:
+    """Tests for cross-worker delivery through a shared broker"""
+
+    @staticmethod
+    def make_workers(count: int = 2):
+        broker = InMemoryBroker()
+        return [ConnectionManager(backplane=InMemoryBackplane(broker)) for _ in range(count)]
+
+    @pytest.mark.asyncio
+    async def test_broadcast_reaches_other_worker(self):
+        """A broadcast on one worker is delivered to sockets held by another"""
+        worker_a, worker_b = self.make_workers()
+        ws_a, ws_b = FakeWebSocket(), FakeWebSocket()
+        conn_a = await worker_a.connect(ws_a, "c1", "u1", "Ana")
+        conn_b = await worker_b.connect(ws_b, "c1", "u2", "Bruno")
+        await settle()
+        ws_a.sent.clear()
+
+        await worker_a.broadcast("c1", {"type": "scene_change", "scene_id": "s1"}, exclude=conn_a)
+        await settle()
+
+        assert ws_a.sent == []
+        assert ws_b.sent == [{"type": "scene_change", "scene_id": "s1", "seq": 1, "prev_seq": 0}]
+        await worker_a.disconnect(conn_a, "c1")
+        await worker_b.disconnect(conn_b, "c1")
+
+    @pytest.mark.asyncio
+    async def test_send_to_user_across_workers(self):
+        """Targeted messages find the user on whichever worker holds them"""
+        worker_a, worker_b = self.make_workers()
+        ws_a, ws_b = FakeWebSocket(), FakeWebSocket()
+        conn_a = await worker_a.connect(ws_a, "c1", "u1", "Ana")
+        conn_b = await worker_b.connect(ws_b, "c1", "u2", "Bruno")
+        await settle()
+        ws_a.sent.clear()
+
+        await worker_a.send_to_user("c1", "u2", {"type": "xp_request_updated"})
+        await settle()
+
+        assert ws_a.sent == []
+        assert ws_b.sent == [{"type": "xp_request_updated"}]
+        await worker_a.disconnect(conn_a, "c1")
+        await worker_b.disconnect(conn_b, "c1")
+
+    @pytest.mark.asyncio
+    async def test_presence_is_shared(self):
+        """Both workers report the full roster"""
+        worker_a, worker_b = self.make_workers()
+        conn_a = await worker_a.connect(FakeWebSocket(), "c1", "u1", "Ana")
+        conn_b = await worker_b.connect(FakeWebSocket(), "c1", "u2", "Bruno")
+
+        users = await worker_a.get_online_users("c1")
+        assert sorted(u["user_id"] for u in users) == ["u1", "u2"]
+
+        await worker_b.disconnect(conn_b, "c1")
+        users = await worker_a.get_online_users("c1")
+        assert [u["user_id"] for u in users] == ["u1"]
+        await worker_a.disconnect(conn_a, "c1")
+
+
+class TestPresenceDeltas:
+    """Tests for versioned presence deltas"""
+
+    @pytest.mark.asyncio
+    async def test_join_update_leave_deltas(self):
+        """Each roster change is sent as one versioned delta, without the full roster"""
+        manager = ConnectionManager()
+        ws_a = FakeWebSocket()
+        conn_a = await manager.connect(ws_a, "c1", "u1", "Ana")
+        conn_b = await manager.connect(FakeWebSocket(), "c1", "u2", "Bruno")
+
+        conn_b.character_name = "Lucita"
+        await manager.update_presence(conn_b, "c1")
+        await manager.disconnect(conn_b, "c1")
+        await settle()
+
+        assert [m["type"] for m in ws_a.sent] == ["user_joined", "user_character_changed", "user_left"]
+        assert [m["presence_version"] for m in ws_a.sent] == [2, 3, 4]
+        assert ws_a.sent[1]["character_name"] == "Lucita"
+        assert all("online_users" not in m for m in ws_a.sent)
+        await manager.disconnect(conn_a, "c1")
+
+    @pytest.mark.asyncio
+    async def test_snapshot_matches_latest_version(self):
+        """A snapshot carries the roster and the version of the last delta"""
+        manager = ConnectionManager()
+        conn_a = await manager.connect(FakeWebSocket(), "c1", "u1", "Ana")
+        conn_b = await manager.connect(FakeWebSocket(), "c1", "u2", "Bruno")
+
+        snapshot = await manager.presence_snapshot("c1")
+        assert snapshot["presence_version"] == 2
+        assert sorted(u["user_id"] for u in snapshot["online_users"]) == ["u1", "u2"]
+        await manager.disconnect(conn_a, "c1")
+        await manager.disconnect(conn_b, "c1")
+
+
+class TestMultiDevice:
+    """Tests for the per-user connection index"""
+
+    @pytest.mark.asyncio
+    async def test_send_to_user_reaches_every_device(self):
+        """A user's second tab or device receives targeted messages too"""
+        manager = ConnectionManager()
+        phone, laptop, other = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        conns = [
+            await manager.connect(phone, "c1", "u1", "Ana"),
+            await manager.connect(laptop, "c1", "u1", "Ana"),
+            await manager.connect(other, "c1", "u2", "Bruno"),
+        ]
+        await settle()
+        for ws in (phone, laptop, other):
+            ws.sent.clear()
+
+        await manager.send_to_user("c1", "u1", {"type": "whisper"})
+        await settle()
+
+        assert phone.sent == laptop.sent == [{"type": "whisper"}]
+        assert other.sent == []
+        assert manager.connection_counts() == {"c1": {"connections": 3, "users": 2}}
+
+        await manager.disconnect(conns[0], "c1")
+        assert manager.get_user_connections("c1", "u1") == {conns[1]}
+        for conn in conns[1:]:
+            await manager.disconnect(conn, "c1")
+        assert manager.connection_counts() == {}
+
+
+class TestMetrics:
+    """Tests for GET /ws/metrics"""
+
+    @pytest.mark.asyncio
+    async def test_metrics_need_auth_and_hide_other_chronicles(self, client, db_session, monkeypatch):
+        db_session.add_all([
+            User(id="st", username="Narradora"),
+            Chronicle(id="c-own", name="Minha", storyteller_id="st"),
+            Chronicle(id="c-other", name="Outra", storyteller_id="x"),
+        ])
+        await db_session.commit()
+        monkeypatch.setattr(ws_module.manager, "replay_grace", 0)
+        conns = [
+            await ws_module.manager.connect(FakeWebSocket(), "c-own", "st", "Narradora"),
+            await ws_module.manager.connect(FakeWebSocket(), "c-other", "u2", "Bruno"),
+        ]
+
+        anonymous = await client.get("/ws/metrics")
+        app.dependency_overrides[get_current_user] = lambda: User(id="st", username="Narradora")
+        try:
+            response = await client.get("/ws/metrics")
+        finally:
+            app.dependency_overrides.pop(get_current_user, None)
+            for conn, chronicle_id in zip(conns, ("c-own", "c-other")):
+                await ws_module.manager.disconnect(conn, chronicle_id)
+
+        assert anonymous.status_code == 401
+        body = response.json()
+        assert body["chronicles"] == {"c-own": {"connections": 1, "users": 1}}
+        assert body["totals"] == {"chronicles": 2, "connections": 2, "users": 2}
+
+
+class TestEventReplay:
+    """Tests for sequenced broadcasts and reconnect replay"""
+
+    @pytest.mark.asyncio
+    async def test_reconnect_replays_missed_events(self):
+        """A client that drops and comes back gets exactly what it missed, in order"""
+        broker = InMemoryBroker()
+        worker_a = ConnectionManager(backplane=InMemoryBackplane(broker), replay_grace=60)
+        worker_b = ConnectionManager(backplane=InMemoryBackplane(broker), replay_grace=60)
+        conn_a = await worker_a.connect(FakeWebSocket(), "c1", "u1", "Ana")
+        conn_b = await worker_b.connect(FakeWebSocket(), "c1", "u2", "Bruno")
+
+        await worker_b.broadcast("c1", {"type": "scene_updated", "n": 1})
+        await worker_a.disconnect(conn_a, "c1")
+        # Nobody is connected to worker_a now, but it keeps listening during the grace period
+        await worker_b.broadcast("c1", {"type": "scene_updated", "n": 2})
+        await worker_b.broadcast("c1", {"type": "typing", "user_id": "u2"})
+        await worker_b.broadcast("c1", {"type": "scene_updated", "n": 3})
+
+        ws = FakeWebSocket()
+        conn_a = await worker_a.connect(ws, "c1", "u1", "Ana")
+        await worker_a.replay(conn_a, "c1", 1)
+        await settle()
+
+        assert [(m["type"], m.get("n")) for m in ws.sent] == [
+            ("scene_updated", 2), ("scene_updated", 3), ("resumed", None),
+        ]
+        assert ws.sent[-1]["seq"] == 3
+        await worker_a.disconnect(conn_a, "c1")
+        await worker_b.disconnect(conn_b, "c1")
+        await worker_a.stop()
+        await worker_b.stop()
+
+    @pytest.mark.asyncio
+    async def test_resync_when_gap_was_evicted(self):
+        """A gap older than the buffer asks the client for a full resync"""
+        manager = ConnectionManager(replay_buffer=2)
+        ws = FakeWebSocket()
+        conn = await manager.connect(ws, "c1", "u1", "Ana")
+        for n in range(4):
+            await manager.broadcast("c1", {"type": "scene_updated", "n": n})
+        await settle()
+        ws.sent.clear()
+
+        await manager.replay(conn, "c1", 1)
+        await settle()
+
+        assert ws.sent == [{"type": "resync_required", "chronicle_id": "c1", "seq": 4}]
+        await manager.disconnect(conn, "c1")
+
+    @pytest.mark.asyncio
+    async def test_resync_when_client_is_ahead_of_server(self):
+        """After a restart the sequence starts over; a client with a higher last_seq must resync"""
+        manager = ConnectionManager()
+        ws = FakeWebSocket()
+        conn = await manager.connect(ws, "c1", "u1", "Ana")
+        await manager.broadcast("c1", {"type": "scene_updated", "n": 1})
+        await settle()
+        ws.sent.clear()
+
+        await manager.replay(conn, "c1", 500)
+        await settle()
+
+        assert ws.sent == [{"type": "resync_required", "chronicle_id": "c1", "seq": 1}]
+        await manager.disconnect(conn, "c1")
+
+
+class TestTopicSubscriptions:
+    """Tests for per-topic routing"""
+
+    @pytest.mark.asyncio
+    async def test_only_subscribed_topics_are_delivered(self):
+        """A client that hides panels stops receiving their events, but keeps table state"""
+        manager = ConnectionManager()
+        chat_only, everything = FakeWebSocket(), FakeWebSocket()
+        conn_a = await manager.connect(chat_only, "c1", "u1", "Ana", topics={"chat"})
+        conn_b = await manager.connect(everything, "c1", "u2", "Bruno")
+        await settle()
+        everything.sent.clear()
+        skipped = manager.frames_skipped
+
+        for message_type in ("typing", "initiative_updated", "chat_message", "scene_updated"):
+            await manager.broadcast("c1", {"type": message_type})
+        await settle()
+
+        assert [m["type"] for m in chat_only.sent] == ["chat_message", "scene_updated"]
+        assert len(everything.sent) == 4
+        assert manager.frames_skipped - skipped == 2
+        await manager.disconnect(conn_a, "c1")
+        await manager.disconnect(conn_b, "c1")
+
+    @pytest.mark.asyncio
+    async def test_prev_seq_tells_filtered_frames_from_lost_ones(self):
+        """Skipped topics leave no gap in prev_seq; frames dropped from the queue do, and resume fills it"""
+        manager = ConnectionManager(queue_size=1, overflow_policy="drop_oldest")
+        ws = FakeWebSocket(stalled=True)
+        conn = await manager.connect(ws, "c1", "u1", "Ana", topics={"chat"})
+        ws._gate.set()
+        await settle()
+
+        for message_type in ("chat_message", "dice_roll", "chat_message"):
+            await manager.broadcast("c1", {"type": message_type})
+            await settle()
+        assert [(m["seq"], m["prev_seq"]) for m in ws.sent] == [(1, 0), (3, 1)]
+
+        ws._gate.clear()
+        for n in range(2):
+            await manager.broadcast("c1", {"type": "chat_message", "n": n})
+        ws._gate.set()
+        await settle()
+        applied = 3
+        [latest] = ws.sent[2:]
+        assert latest["prev_seq"] > applied  # seq 4 was dropped from the full queue
+
+        ws.sent.clear()
+        conn.queue_size = 8
+        await manager.replay(conn, "c1", applied)
+        await manager.broadcast("c1", {"type": "dice_roll"})
+        await manager.broadcast("c1", {"type": "chat_message", "n": 2})
+        await settle()
+        assert [(m["type"], m.get("seq"), m.get("prev_seq")) for m in ws.sent] == [
+            ("chat_message", 4, 3), ("chat_message", 5, 4), ("resumed", 5, None), ("chat_message", 7, 5),
+        ]
+        await manager.disconnect(conn, "c1")
+
+    @pytest.mark.asyncio
+    async def test_prev_seq_never_moves_back(self):
+        """A seq arriving late from the backplane does not rewind the next frame's prev_seq"""
+        manager = ConnectionManager()
+        ws = FakeWebSocket()
+        conn = await manager.connect(ws, "c1", "u1", "Ana")
+        await settle()
+        ws.sent.clear()
+
+        for seq in (2, 1, 3):
+            await manager._deliver("c1", {"message": {"type": "chat_message", "seq": seq}})
+        await settle()
+
+        assert [(m["seq"], m["prev_seq"]) for m in ws.sent] == [(2, 0), (1, 2), (3, 2)]
+        await manager.disconnect(conn, "c1")
+
+    def test_parse_topics_ignores_unknown(self):
+        """Topic lists accept commas or lists and drop names the server does not know"""
+        assert parse_topics("chat, dice,mapa") == {"chat", "dice"}
+        assert parse_topics(["xp", 3]) == {"xp"}
+        assert parse_topics(None) == set()
+
+
+class TestWireProtocols:
+    """Tests for the MessagePack subprotocol"""
+
+    def test_negotiation_follows_client_preference(self):
+        assert negotiate_protocol(["msgpack", "json"]) == WireProtocol.MSGPACK
+        assert negotiate_protocol(["v2.vtt", "json"]) == WireProtocol.JSON
+        assert negotiate_protocol([]) is None
+
+    @pytest.mark.asyncio
+    async def test_broadcast_encodes_once_per_protocol(self, monkeypatch):
+        """Mixed tables get the same message, encoded once for each protocol in use"""
+        calls = []
+
+        def counting(encoder):
+            def encode(message):
+                calls.append(encoder.__name__)
+                return encoder(message)
+            return encode
+
+        manager = ConnectionManager()
+        sockets = [FakeWebSocket() for _ in range(4)]
+        protocols = [WireProtocol.MSGPACK, WireProtocol.MSGPACK, WireProtocol.JSON, None]
+        conns = [
+            await manager.connect(ws, "c1", f"u{i}", "Player", protocol=protocol)
+            for i, (ws, protocol) in enumerate(zip(sockets, protocols))
+        ]
+        await settle()
+        for ws in sockets:
+            ws.sent.clear()
+        monkeypatch.setattr(ws_module, "dumps_json", counting(ws_module.dumps_json))
+        monkeypatch.setattr(ws_module, "dumps_msgpack", counting(ws_module.dumps_msgpack))
+
+        await manager.broadcast("c1", {"type": "initiative_updated", "data": {"ordem": [3, 1]}})
+        await settle()
+
+        assert sorted(calls) == ["dumps_json", "dumps_msgpack"]
+        assert all(ws.sent == [{"type": "initiative_updated", "data": {"ordem": [3, 1]}, "seq": 1, "prev_seq": 0}] for ws in sockets)
+        for conn in conns:
+            await manager.disconnect(conn, "c1")
+
+    @pytest.mark.asyncio
+    async def test_binary_values_are_rejected_before_broadcast(self, monkeypatch):
+        """MessagePack bin values cannot reach JSON clients or the replay buffer"""
+        monkeypatch.setattr(ws_module.manager, "replay_grace", 0)
+        sender_ws, json_ws = FakeWebSocket(), FakeWebSocket()
+        sender = await ws_module.manager.connect(sender_ws, "c-bin", "u1", "Ana", protocol=WireProtocol.MSGPACK)
+        reader = await ws_module.manager.connect(json_ws, "c-bin", "u2", "Bruno", protocol=WireProtocol.JSON)
+        await settle()
+        json_ws.sent.clear()
+
+        ctx = ws_module.WSContext("c-bin", sender, "u1", "Ana", None, None, now=datetime.utcnow())
+        frame = msgpack.packb({"type": "dice_roll", "data": {"blob": b"\x00\x01"}})
+        error = await ws_module.dispatcher.dispatch(ctx, frame)
+        await ws_module.manager.replay(reader, "c-bin", 0)
+        await settle()
+
+        assert error["code"] == "malformed_frame"
+        assert [m["type"] for m in json_ws.sent] == ["resumed"]
+        await ws_module.manager.disconnect(sender, "c-bin")
+        await ws_module.manager.disconnect(reader, "c-bin")
+
+
+class TestRollRequest:
+    """Tests for server-side rolls over the WebSocket"""
+
+    @pytest.mark.asyncio
+    async def test_roll_is_broadcast_and_queued(self, monkeypatch):
+        """The server rolls, broadcasts the result and hands the row to the dice writer"""
+        queued = []
+
+        async def submit(row):
+            queued.append(row)
+
+        monkeypatch.setattr(ws_module.dice_writer, "submit", submit)
+        monkeypatch.setattr(ws_module.manager, "replay_grace", 0)
+        roller_ws, other_ws = FakeWebSocket(), FakeWebSocket()
+        roller = await ws_module.manager.connect(roller_ws, "c-roll", "u1", "Ana")
+        other = await ws_module.manager.connect(other_ws, "c-roll", "u2", "Bruno")
+        await settle()
+        other_ws.sent.clear()
+
+        ctx = ws_module.WSContext(
+            "c-roll", roller, "u1", "Ana", "ch1", "Lucita", now=datetime.utcnow(), authenticated=True,
+        )
+        frame = '{"type": "roll_request", "request_id": "r1", "pool": 7, "hunger": 2, "difficulty": 3}'
+        assert await ws_module.dispatcher.dispatch(ctx, frame) is None
+        await settle()
+
+        [message] = other_ws.sent
+        assert message["type"] == "dice_roll"
+        assert message["request_id"] == "r1"
+        assert len(message["data"]["regular_dice"]) == 5 and len(message["data"]["hunger_dice"]) == 2
+        [row] = queued
+        assert row["id"] == message["data"]["id"]
+        assert (row["roller_id"], row["character_id"], row["successes"]) == ("u1", "ch1", message["data"]["successes"])
+        await ws_module.manager.disconnect(roller, "c-roll")
+        await ws_module.manager.disconnect(other, "c-roll")
+
+    @pytest.mark.asyncio
+    async def test_rolls_of_unauthenticated_connections_are_not_saved(self, monkeypatch):
+        """A user_id from the query string is only a claim; those rolls are shown but not persisted"""
+        queued = []
+
+        async def submit(row):
+            queued.append(row)
+
+        monkeypatch.setattr(ws_module.dice_writer, "submit", submit)
+        roller_ws = FakeWebSocket()
+        roller = await ws_module.manager.connect(roller_ws, "c-roll", "u2", "Bruno")
+        await settle()
+        roller_ws.sent.clear()
+
+        ctx = ws_module.WSContext("c-roll", roller, "u2", "Bruno", None, None, now=datetime.utcnow())
+        await ws_module.dispatcher.dispatch(ctx, '{"type": "roll_request", "pool": 4}')
+        await settle()
+
+        assert [m["type"] for m in roller_ws.sent] == ["dice_roll"]
+        assert queued == []
+        await ws_module.manager.disconnect(roller, "c-roll")
+
+    @pytest.mark.asyncio
+    async def test_socket_token_must_belong_to_a_chronicle_member(self, monkeypatch, db_session):
+        db_session.add_all([
+            User(id="st", username="Narradora"),
+            User(id="p1", username="Ana"),
+            User(id="x", username="Intrusa"),
+            Chronicle(id="c-auth", name="Noites de Sao Paulo", storyteller_id="st"),
+            ChronicleMember(chronicle_id="c-auth", user_id="p1"),
+        ])
+        await db_session.commit()
+        monkeypatch.setattr(ws_module, "async_session_maker", session_factory)
+
+        def token(user_id):
+            return create_access_token({"sub": user_id})
+
+        assert (await ws_module.authenticate_socket(token("st"), "c-auth")).id == "st"
+        assert (await ws_module.authenticate_socket(token("p1"), "c-auth")).username == "Ana"
+        assert await ws_module.authenticate_socket(token("x"), "c-auth") is None
+        assert await ws_module.authenticate_socket(token("p1"), "c-outra") is None
+        assert await ws_module.authenticate_socket("nao-e-um-token", "c-auth") is None
+        assert await ws_module.authenticate_socket(None, "c-auth") is None
+
+    @pytest.mark.asyncio
+    async def test_expression_is_resolved_from_the_sheet(self, monkeypatch, db_session):
+        """Pool and Hunger come from the character sheet when an expression is sent"""
+        db_session.add_all([
+            User(id="u1", username="Ana"),
+            User(id="u2", username="Bruno"),
+            User(id="st", username="Narradora"),
+            Chronicle(id="c-expr", name="Noites de Sao Paulo", storyteller_id="st"),
+            Character(
+                id="ch1", name="Lucita", owner_id="u1", chronicle_id="c-expr", game_version="v5",
+                sheet={"atributos": {"fisicos": {"forca": 4}}, "habilidades": {"briga": 3}, "fome": 2},
+            ),
+        ])
+        await db_session.commit()
+
+        async def submit(row):
+            pass
+
+        monkeypatch.setattr(ws_module, "async_session_maker", session_factory)
+        monkeypatch.setattr(ws_module.dice_writer, "submit", submit)
+        monkeypatch.setattr(ws_module.manager, "replay_grace", 0)
+        roller_ws = FakeWebSocket()
+        roller = await ws_module.manager.connect(roller_ws, "c-expr", "u1", "Ana")
+        await settle()
+        roller_ws.sent.clear()
+
+        def context(user_id, authenticated=True):
+            return ws_module.WSContext(
+                "c-expr", roller, user_id, "Ana", "ch1", None, now=datetime.utcnow(), authenticated=authenticated,
+            )
+
+        frame = '{"type": "roll_request", "expression": "forca+briga+1, fome"}'
+        await ws_module.dispatcher.dispatch(context("u1"), frame)
+        await ws_module.dispatcher.dispatch(context("u1"), '{"type": "roll_request", "expression": "forca+"}')
+        await settle()
+
+        roll, error = roller_ws.sent
+        assert (roll["data"]["pool"], roll["data"]["hunger"]) == (8, 2)
+        assert roll["character_name"] == "Lucita"
+        assert roll["data"]["breakdown"] == [["forca", 4], ["briga", 3], ["modificador", 1], ["fome", 2]]
+        assert error["code"] == "invalid_expression"
+
+        # Another player, or an unverified claim to be the owner, cannot read the sheet; the storyteller can
+        roller_ws.sent.clear()
+        await ws_module.dispatcher.dispatch(context("u2"), frame)
+        await ws_module.dispatcher.dispatch(context("u1", authenticated=False), frame)
+        await ws_module.dispatcher.dispatch(context("st"), frame)
+        await settle()
+        assert [m["type"] for m in roller_ws.sent] == ["error", "error", "dice_roll"]
+        assert roller_ws.sent[2]["data"]["pool"] == 8
+        await ws_module.manager.disconnect(roller, "c-expr")
@@ -0,0 +1,85 @@
+import itertools
+import random
+
+import pytest
+
+from app.api.deps import get_current_user
+from app.core.v5.dice import V5DiceRoller, V5RollResult
+from app.core.v5.willpower import best_reroll
+from app.main import app
+from app.models.user import User
+
+
+def brute_force(regular, hunger, difficulty, reroll):
+    """(success, critical) chances of rerolling the given regular dice, by enumerating every outcome"""
+    outcomes = succeed = critical = 0
+    for faces in itertools.product(range(1, 11), repeat=len(reroll)):
+        dice = list(regular)
+        for index, face in zip(reroll, faces):
+            dice[index] = face
+        roll = V5DiceRoller.from_dice(dice, hunger, difficulty)
+        outcomes += 1
+        succeed += roll.margin >= 0
+        critical += roll.result_type in (V5RollResult.CRITICAL, V5RollResult.MESSY_CRITICAL)
+    return succeed / outcomes, critical / outcomes
+
+
+class TestBestReroll:
+    """Tests for the Willpower reroll optimizer"""
+
+    @pytest.mark.parametrize("goal", ["success", "critical"])
+    def test_matches_brute_force_over_every_subset(self, goal):
+        rng = random.Random(7)
+        for _ in range(40):
+            pool = rng.randint(1, 7)
+            hunger = [rng.randint(1, 10) for _ in range(rng.randint(0, min(pool, 5)))]
+            regular = [rng.randint(1, 10) for _ in range(pool - len(hunger))]
+            difficulty = rng.randint(0, 7)
+
+            advice = best_reroll(regular, hunger, difficulty, goal)
+            success, critical = brute_force(regular, hunger, difficulty, advice.reroll)
+            assert (advice.success_chance, advice.critical_chance) == pytest.approx((success, critical), abs=1e-12)
+
+            pick = 0 if goal == "success" else 1
+            best = max(
+                brute_force(regular, hunger, difficulty, subset)[pick]
+                for size in range(min(3, len(regular)) + 1)
+                for subset in itertools.combinations(range(len(regular)), size)
+            )
+            assert (success, critical)[pick] == pytest.approx(best, abs=1e-12)
+
+    def test_rerolls_failures_and_never_hunger_dice(self):
+        advice = best_reroll([2, 7, 4, 1, 5], [3, 1], difficulty=3)
+        assert advice.reroll == (0, 2, 3)
+        assert advice.bestial_failure_chance == pytest.approx(1 - advice.success_chance)
+
+    def test_no_reroll_when_success_is_certain(self):
+        assert best_reroll([1, 3, 7, 10, 2], [6], difficulty=2).reroll == ()
+        chasing = best_reroll([1, 3, 7, 2, 5], [10], difficulty=2, goal="critical")
+        assert chasing.reroll == (0, 1, 3)
+        assert chasing.messy_critical_chance == chasing.critical_chance == pytest.approx(1 - 0.9 ** 3)
+
+
+class TestWillpowerAPI:
+    """Tests for /api/dice/v5/willpower"""
+
+    @pytest.mark.asyncio
+    async def test_takes_a_roll_result(self, client):
+        roll = V5DiceRoller.from_dice([2, 7, 4, 1, 5], [3, 1], difficulty=3)
+        payload = {
+            "regular_dice": roll.regular_dice,
+            "hunger_dice": roll.hunger_dice,
+            "difficulty": roll.difficulty,
+            "successes": roll.successes,
+            "result_type": roll.result_type.value,
+        }
+        app.dependency_overrides[get_current_user] = lambda: User(id="u1", username="Ana")
+        try:
+            response = await client.post("/api/dice/v5/willpower", json=payload)
+            invalid = await client.post("/api/dice/v5/willpower", json={"regular_dice": [11]})
+        finally:
+            app.dependency_overrides.pop(get_current_user, None)
+
+        assert response.status_code == 200
+        assert response.json() == best_reroll([2, 7, 4, 1, 5], [3, 1], 3).to_dict()
+        assert invalid.status_code == 422
@@ -0,0 +1,74 @@
+import uuid
+import pytest
+from sqlalchemy import select, func
+
+from app.models.chat_message import ChatMessage
+from app.models.dice_roll import DiceRoll
+from app.services.dice_service import dice_service
+from app.services.write_behind import ChatMessageWriter, DiceRollWriter
+from tests.conftest import test_async_session as session_factory
+
+
+def chat_row(chronicle_id: str = "c1", content: str = "Boa noite") -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "chronicle_id": chronicle_id,
+        "user_id": "u1",
+        "message_type": "chat",
+        "content": content,
+        "sender_name": "Ana",
+    }
+
+
+class TestChatMessageWriter:
+    """Tests for write-behind chat persistence"""
+
+    @pytest.mark.asyncio
+    async def test_batches_by_size_and_flushes_on_stop(self, db_session):
+        """Rows are inserted in size-bounded batches and nothing is lost on stop"""
+        writer = ChatMessageWriter(batch_size=10, flush_interval=5, session_factory=session_factory)
+        for n in range(25):
+            await writer.submit(chat_row(content=f"linha {n}"))
+        await writer.stop()
+
+        count = await db_session.scalar(select(func.count()).select_from(ChatMessage))
+        assert count == 25
+        assert writer.flushed_batches == 3
+
+    @pytest.mark.asyncio
+    async def test_zero_interval_flushes_right_away(self, db_session):
+        """An explicit flush_interval of 0 is kept, not replaced by the default"""
+        writer = ChatMessageWriter(flush_interval=0, session_factory=session_factory)
+        assert writer.flush_interval == 0
+        for n in range(3):
+            await writer.submit(chat_row(content=f"linha {n}"))
+        await writer.stop()
+
+        assert writer.flushed_rows == 3
+        assert ChatMessageWriter(session_factory=session_factory).flush_interval > 0
+
+    @pytest.mark.asyncio
+    async def test_bad_row_does_not_sink_batch(self, db_session):
+        """A row that fails to insert is dropped without losing its batch"""
+        writer = ChatMessageWriter(session_factory=session_factory)
+        await writer.submit(chat_row(content="ok"))
+        await writer.submit(chat_row(content=None))
+        await writer.stop()
+
+        contents = (await db_session.execute(select(ChatMessage.content))).scalars().all()
+        assert contents == ["ok"]
+
+
+class TestDiceRollWriter:
+    """Tests for write-behind persistence of server-side rolls"""
+
+    @pytest.mark.asyncio
+    async def test_rolls_are_bulk_inserted(self, db_session):
+        writer = DiceRollWriter(session_factory=session_factory)
+        await writer.submit(dice_service.to_row(dice_service.roll_v5(6, hunger=2, difficulty=3), str(uuid.uuid4()), "c1", "u1"))
+        await writer.submit(dice_service.to_row(dice_service.roll_v20(5, difficulty=7), str(uuid.uuid4()), "c1", "u1"))
+        await writer.stop()
+
+        rolls = (await db_session.execute(select(DiceRoll).order_by(DiceRoll.game_version))).scalars().all()
+        assert [(r.game_version, r.pool, r.hunger, r.difficulty) for r in rolls] == [("v20", 5, 0, 7), ("v5", 6, 2, 3)]
+        assert rolls[1].result["successes"] == rolls[1].successes
@@ -0,0 +1,81 @@
+import msgpack
+import pytest
+
+from app.api.websocket import dispatcher as chronicle_dispatcher
+from app.schemas.websocket import WSMessage, WSResume
+from app.services.ws_dispatch import MessageDispatcher
+
+
+def make_dispatcher():
+    dispatcher = MessageDispatcher(max_frame_size=256)
+    handled = []
+
+    @dispatcher.register("resume", schema=WSResume)
+    async def resume(ctx, payload):
+        handled.append(payload.last_seq)
+
+    @dispatcher.register("boom", schema=WSMessage)
+    async def boom(ctx, payload):
+        raise RuntimeError("falhou")
+
+    return dispatcher, handled
+
+
+class TestMessageDispatcher:
+    """Tests for the WebSocket dispatch table"""
+
+    @pytest.mark.asyncio
+    async def test_valid_frame_reaches_handler_and_is_timed(self):
+        dispatcher, handled = make_dispatcher()
+        assert await dispatcher.dispatch(None, '{"type": "resume", "last_seq": 7}') is None
+
+        assert handled == [7]
+        assert dispatcher.metrics()["handlers"]["resume"]["calls"] == 1
+
+    @pytest.mark.asyncio
+    async def test_msgpack_frame_is_decoded(self):
+        """Binary frames are MessagePack and go through the same handlers"""
+        dispatcher, handled = make_dispatcher()
+        assert await dispatcher.dispatch(None, msgpack.packb({"type": "resume", "last_seq": 3})) is None
+        assert handled == [3]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("frame, code", [
+        ('{"type": "resume", "pad": "' + "x" * 300 + '"}', "frame_too_large"),
+        ("{nao e json", "malformed_frame"),
+        ("[1, 2]", "malformed_frame"),
+        (b"\xc1", "malformed_frame"),
+        (msgpack.packb({"type": "dice_roll", "data": {"blob": b"\x00\x01"}}), "malformed_frame"),
+        (msgpack.packb({"type": "dice_roll", "data": {"x": msgpack.ExtType(5, b"?")}}), "malformed_frame"),
+        (msgpack.packb({"type": "dice_roll", "data": {1: "chave"}}), "malformed_frame"),
+        ('{"type": "teleport"}', "unknown_type"),
+        ('{"type": "resume", "last_seq": "ontem"}', "invalid_payload"),
+    ])
+    async def test_bad_frames_get_error_reply(self, frame, code):
+        """Malformed frames are answered with an error instead of raising"""
+        dispatcher, handled = make_dispatcher()
+        error = await dispatcher.dispatch(None, frame)
+
+        assert error["type"] == "error"
+        assert error["code"] == code
+        assert handled == []
+        assert dispatcher.metrics()["rejected"] == {code: 1}
+
+    @pytest.mark.asyncio
+    async def test_handler_failure_is_contained(self):
+        dispatcher, _ = make_dispatcher()
+        error = await dispatcher.dispatch(None, '{"type": "boom"}')
+
+        assert error["code"] == "handler_failed"
+        assert dispatcher.stats["boom"].errors == 1
+
+    def test_chronicle_handlers_are_registered(self):
+        """Every message type the old endpoint understood has a handler"""
+        expected = {
+            "chat_message", "dice_roll", "session_started", "session_ended", "participant_joined",
+            "participant_left", "xp_request_created", "xp_request_updated", "xp_awarded",
+            "combat_started", "combat_ended", "initiative_updated", "turn_advanced", "scene_change",
+            "scene_updated", "character_update", "typing", "ping", "update_character",
+            "subscribe", "unsubscribe", "resume", "presence_sync",
+        }
+        assert expected <= set(chronicle_dispatcher.stats)